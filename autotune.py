@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""Benchmark model/thread configurations on this host and write an autotune profile"""
+
+import os
+import gc
+import sys
+import time
+import argparse
+import difflib
+import platform
+import threading
+from pathlib import Path
+
+import numpy as np
+from faster_whisper import decode_audio
+
+from model_profile import PROFILE_PATH, ModelPool, save_profile
+
+SAMPLE_RATE = 16000
+
+
+def percentile(values, pct):
+    return float(np.percentile(values, pct)) if values else 0.0
+
+
+def word_agreement(reference: str, text: str) -> float:
+    """Fraction of reference words recovered, order-aware."""
+    ref = reference.lower().split()
+    hyp = text.lower().split()
+    if not ref and not hyp:
+        return 1.0
+    return difflib.SequenceMatcher(None, ref, hyp).ratio()
+
+
+def transcribe_text(pool, audio, chunk_length):
+    options = {'beam_size': 1, 'vad_filter': True}
+    if chunk_length:
+        options['chunk_length'] = chunk_length
+    segments, _ = pool.transcribe(audio, **options)
+    return " ".join(seg.text for seg in segments).strip()
+
+
+def run_concurrently(count, fn):
+    """Runs fn(i) on `count` threads and returns per-call results and wall time."""
+    results = [None] * count
+    errors = []
+
+    def worker(i):
+        try:
+            results[i] = fn(i)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.time() - start
+
+    if errors:
+        raise errors[0]
+    return results, wall
+
+
+def bench_live(pool, clip, chunk_length, streams, rounds):
+    """Latency of transcribing one live window with `streams` users at once."""
+    latencies = []
+    text = ''
+
+    def one_stream(_):
+        times = []
+        last = ''
+        for _ in range(rounds):
+            start = time.time()
+            last = transcribe_text(pool, clip, chunk_length)
+            times.append(time.time() - start)
+        return times, last
+
+    results, _ = run_concurrently(streams, one_stream)
+    for times, last in results:
+        latencies.extend(times)
+        text = last
+
+    return {
+        'p50_latency': percentile(latencies, 50),
+        'p95_latency': percentile(latencies, 95),
+        'text': text
+    }
+
+
+def bench_file(pool, audio, chunk_length, jobs):
+    """Audio seconds transcribed per wall-clock second with `jobs` files in flight."""
+    results, wall = run_concurrently(jobs, lambda _: transcribe_text(pool, audio, chunk_length))
+    audio_seconds = jobs * len(audio) / SAMPLE_RATE
+    return {
+        'throughput': audio_seconds / wall if wall > 0 else 0.0,
+        'rtf': wall / audio_seconds if audio_seconds > 0 else 0.0,
+        'text': results[0]
+    }
+
+
+def candidate_configs(cpu_count, compute_types, max_replicas):
+    """
+    Model configurations whose total thread count fits on this host.
+    Concurrency comes from replicas only: ModelPool hands each caller a
+    replica of its own, so a replica never sees the concurrent calls
+    WhisperModel's num_workers would serve.
+    """
+    configs = []
+    for compute_type in compute_types:
+        replicas = 1
+        while replicas <= min(max_replicas, cpu_count):
+            threads_per_replica = cpu_count // replicas
+            thread_options = sorted({t for t in (1, 2, 4, 8, 16, threads_per_replica) if t <= threads_per_replica})
+            for cpu_threads in thread_options:
+                configs.append({
+                    'compute_type': compute_type,
+                    'cpu_threads': cpu_threads,
+                    'replicas': replicas
+                })
+            replicas *= 2
+    return configs
+
+
+def autotune(args):
+    cpu_count = os.cpu_count() or 1
+    audio = decode_audio(args.audio, sampling_rate=SAMPLE_RATE)
+    if len(audio) == 0:
+        print(f"Error: could not decode audio from {args.audio}")
+        return False
+
+    clip = audio[:int(args.live_window * SAMPLE_RATE)]
+    repeats = int(np.ceil(args.file_seconds * SAMPLE_RATE / len(audio)))
+    file_audio = np.tile(audio, repeats)[:int(args.file_seconds * SAMPLE_RATE)]
+
+    configs = candidate_configs(cpu_count, args.compute_types, args.max_replicas)
+    print(f"Autotuning {args.model} on {cpu_count} CPUs: {len(configs)} model configs x "
+          f"chunk lengths {args.chunk_lengths}")
+
+    reference = None
+    best_live = None
+    best_file = None
+
+    for config in configs:
+        label = f"{config['compute_type']} threads={config['cpu_threads']} replicas={config['replicas']}"
+        print(f"\nLoading {label}...")
+        try:
+            pool = ModelPool(args.model, {**config, 'chunk_length': None})
+            transcribe_text(pool, clip, None)
+        except Exception as e:
+            print(f"  skipped: {e}")
+            continue
+
+        if reference is None:
+            reference = {
+                'live': transcribe_text(pool, clip, None),
+                'file': transcribe_text(pool, file_audio, None)
+            }
+
+        for chunk_length in args.chunk_lengths:
+            candidate = {**config, 'chunk_length': chunk_length}
+
+            live = bench_live(pool, clip, chunk_length, args.live_streams, args.rounds)
+            live_agreement = word_agreement(reference['live'], live.pop('text'))
+            print(f"  chunk={chunk_length}s live p50={live['p50_latency']:.2f}s "
+                  f"p95={live['p95_latency']:.2f}s agreement={live_agreement:.2f}")
+            if live_agreement >= args.min_agreement and (
+                    best_live is None or live['p95_latency'] < best_live[1]['p95_latency']):
+                best_live = (candidate, live)
+
+            jobs = max(2, config['replicas'])
+            file_result = bench_file(pool, file_audio, chunk_length, jobs)
+            file_agreement = word_agreement(reference['file'], file_result.pop('text'))
+            print(f"  chunk={chunk_length}s file throughput={file_result['throughput']:.2f}x "
+                  f"realtime agreement={file_agreement:.2f}")
+            if file_agreement >= args.min_agreement and (
+                    best_file is None or file_result['throughput'] > best_file[1]['throughput']):
+                best_file = (candidate, file_result)
+
+        del pool
+        gc.collect()
+
+    if best_live is None or best_file is None:
+        print("Error: no configuration completed the benchmark")
+        return False
+
+    profile = {
+        'model': args.model,
+        'live': best_live[0],
+        'file': best_file[0],
+        'results': {'live': best_live[1], 'file': best_file[1]},
+        'host': {
+            'cpu_count': cpu_count,
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'system': platform.system()
+        },
+        'created_at': time.time()
+    }
+    path = save_profile(profile, args.output)
+
+    print(f"\nLive:  {best_live[0]} (p95 {best_live[1]['p95_latency']:.2f}s)")
+    print(f"File:  {best_file[0]} ({best_file[1]['throughput']:.2f}x realtime)")
+    print(f"✅ Profile written to {path}")
+    return True
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--model', default='base')
+    parser.add_argument('--audio', default=str(Path(__file__).parent / 'test-short.mp3'))
+    parser.add_argument('--output', default=str(PROFILE_PATH))
+    parser.add_argument('--compute-types', nargs='+', default=['int8', 'int8_float32', 'float32'])
+    parser.add_argument('--max-replicas', type=int, default=4)
+    parser.add_argument('--chunk-lengths', nargs='+', type=int, default=[10, 20, 30])
+    parser.add_argument('--live-window', type=float, default=3.0,
+                        help='seconds of audio per live chunk (the frontend sends 3s)')
+    parser.add_argument('--live-streams', type=int, default=2,
+                        help='simultaneous live users to tune for')
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--file-seconds', type=float, default=60.0)
+    parser.add_argument('--min-agreement', type=float, default=0.85,
+                        help='minimum word agreement with the default config')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    success = autotune(parse_args(sys.argv[1:]))
+    sys.exit(0 if success else 1)
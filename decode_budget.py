@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""Compute budgets for decoding and guards against runaway windows"""
+
+import json
+import time
+from collections import Counter
+from typing import Dict, Iterable, Iterator, Optional
+
+# Temperatures faster-whisper falls back through when a window fails its checks
+FALLBACK_TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+
+DEFAULT_BUDGET = {
+    # Whole-request deadline: audio seconds x max_rtf, but never below min_deadline_seconds (None: no deadline)
+    'max_rtf': None,
+    'min_deadline_seconds': 10.0,
+    # Per window: temperature retries and generated tokens
+    'max_fallbacks': len(FALLBACK_TEMPERATURES) - 1,
+    'max_new_tokens': None,
+    # Window output is dropped when it looks like a hallucination loop
+    'compression_ratio_limit': 3.0,
+    'max_repeats': 6,
+    # This many flagged windows in a row aborts the rest of the request (None: never)
+    'abort_after_bad_windows': None
+}
+
+# Interactive (live) requests are answered while someone waits and nothing is
+# stored from them, so they also get a deadline and give up on looping audio
+INTERACTIVE_BUDGET = {'max_rtf': 1.5, 'abort_after_bad_windows': 2}
+
+# (backlog per replica at or above which the level applies, level, per-window
+# limits for every request, further limits for interactive requests). Stored
+# requests keep room for dense speech in a window; live ones give it up first
+LOAD_LEVELS = (
+    (0.0, 'normal', {}, {}),
+    (1.0, 'busy', {'max_fallbacks': 2, 'max_new_tokens': 160}, {'max_rtf': 1.0}),
+    (2.0, 'overloaded', {'max_fallbacks': 0, 'max_new_tokens': 160},
+     {'max_rtf': 0.5, 'max_new_tokens': 96, 'abort_after_bad_windows': 1})
+)
+
+
+def parse_budget(value) -> Optional[Dict]:
+    """
+    Per-request budget overrides from a request body: a dict or a JSON
+    object string, restricted to the DEFAULT_BUDGET keys with numeric (or
+    null) values. Raises ValueError for anything else.
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            raise ValueError('budget must be a JSON object')
+    if not isinstance(value, dict):
+        raise ValueError('budget must be a JSON object')
+
+    budget = {}
+    for key, limit in value.items():
+        if key not in DEFAULT_BUDGET:
+            raise ValueError(f'Unknown budget limit: {key}')
+        if limit is not None and (isinstance(limit, bool) or not isinstance(limit, (int, float)) or limit < 0):
+            raise ValueError(f'Budget limit {key} must be a non-negative number')
+        budget[key] = limit
+    return budget
+
+
+def budget_for_load(backlog: int, capacity: int, overrides: Optional[Dict] = None) -> Dict:
+    """
+    The budget for a request that found `backlog` requests waiting for
+    `capacity` replicas. Per-request overrides can only tighten the limits;
+    overrides['interactive'] marks a live request.
+
+    Every request gets fewer temperature retries and fewer tokens per window
+    as the backlog grows, so no single window can hold a replica for long
+    while others wait. Only interactive requests also get a deadline and
+    abort on looping output: they are short, so the backlog they found is
+    the load they run under. Requests whose text is stored (files, uploads,
+    word timings, re-decodes) run to the end of their audio unless their
+    overrides set max_rtf or abort_after_bad_windows; a backlog seen at the
+    start of a five-minute segment says little about the rest of it.
+    """
+    overrides = overrides or {}
+    interactive = bool(overrides.get('interactive'))
+    ratio = backlog / max(1, capacity)
+    level, level_overrides = 'normal', {}
+    for threshold, name, window_limits, interactive_limits in LOAD_LEVELS:
+        if ratio >= threshold:
+            level = name
+            level_overrides = {**window_limits, **(interactive_limits if interactive else {})}
+
+    budget = {**DEFAULT_BUDGET, **(INTERACTIVE_BUDGET if interactive else {}), **level_overrides}
+    for key, value in overrides.items():
+        if key not in DEFAULT_BUDGET or value is None:
+            continue
+        current = budget[key]
+        budget[key] = value if current is None else min(current, value)
+    budget['level'] = level
+    budget['interactive'] = interactive
+    return budget
+
+
+def apply_to_options(budget: Dict, options: Dict) -> Dict:
+    """Maps the per-window limits onto faster-whisper transcribe() options."""
+    options = dict(options)
+    temperature = options.get('temperature', FALLBACK_TEMPERATURES)
+    if not isinstance(temperature, (list, tuple)):
+        temperature = [temperature]
+    options['temperature'] = list(temperature)[:budget['max_fallbacks'] + 1]
+    if budget['max_new_tokens'] is not None:
+        options['max_new_tokens'] = min(options.get('max_new_tokens') or budget['max_new_tokens'],
+                                        budget['max_new_tokens'])
+    return options
+
+
+def repeated_ngrams(text: str, n: int = 3) -> int:
+    """How often the most common word n-gram occurs in text."""
+    words = text.lower().split()
+    if len(words) < n:
+        return 0
+    counts = Counter(tuple(words[i:i + n]) for i in range(len(words) - n + 1))
+    return counts.most_common(1)[0][1]
+
+
+class BudgetGuard:
+    """
+    Wraps a lazily decoded segment iterator and enforces a budget on it.
+
+    Stopping iteration stops decoding, so a request past its deadline, or
+    one producing looping output window after window, releases the model
+    instead of finishing the file. Looping windows are always dropped; the
+    deadline and aborting only apply when the budget sets max_rtf and
+    abort_after_bad_windows. Checks run as segments are produced, kept or
+    dropped, i.e. at window boundaries: a window's compute is spent before
+    it can be judged, so a single window is bounded by max_new_tokens and
+    max_fallbacks instead. Every limit that was hit, including windows cut
+    off at max_new_tokens, is recorded in `report['hits']`.
+    """
+
+    def __init__(self, budget: Dict, audio_duration: float):
+        self.budget = budget
+        self.deadline = None
+        if budget['max_rtf'] is not None:
+            self.deadline = time.time() + max(budget['min_deadline_seconds'], audio_duration * budget['max_rtf'])
+        self.report = {'level': budget['level'], 'hits': [], 'aborted': False}
+
+    def _hit(self, reason: str, segment=None, **details) -> None:
+        hit = {'reason': reason, **details}
+        if segment is not None:
+            hit.update({'start': segment.start, 'end': segment.end})
+        self.report['hits'].append(hit)
+
+    def check_tokens(self, tokens: int, segment) -> None:
+        """Records a window whose `tokens` generated tokens reached max_new_tokens (it was cut off)."""
+        limit = self.budget['max_new_tokens']
+        if limit is not None and tokens >= limit:
+            self._hit('max_new_tokens', segment, tokens=tokens)
+
+    def _flag(self, segment) -> Optional[str]:
+        ratio = getattr(segment, 'compression_ratio', None)
+        if ratio is not None and ratio > self.budget['compression_ratio_limit']:
+            return 'compression_ratio'
+        if repeated_ngrams(segment.text) >= self.budget['max_repeats']:
+            return 'repetition'
+        return None
+
+    def guard(self, segments: Iterable) -> Iterator:
+        bad_windows = 0
+        last_seek = None
+        window_flagged = False
+        window_tokens = 0
+        window_start = None
+        max_temperature = FALLBACK_TEMPERATURES[min(self.budget['max_fallbacks'], len(FALLBACK_TEMPERATURES) - 1)]
+        abort_after = self.budget['abort_after_bad_windows']
+
+        for segment in segments:
+            seek = getattr(segment, 'seek', None)
+            if seek != last_seek:
+                if window_start is not None:
+                    self.check_tokens(window_tokens, window_start)
+                bad_windows = bad_windows + 1 if window_flagged else 0
+                window_flagged = False
+                window_tokens = 0
+                window_start = segment
+                last_seek = seek
+
+                # The window used every retry it was allowed
+                temperature = getattr(segment, 'temperature', None)
+                if temperature is not None and 0 < max_temperature <= temperature:
+                    self._hit('max_fallbacks', segment, temperature=temperature)
+
+            tokens = getattr(segment, 'tokens', None)
+            if tokens is not None:
+                window_tokens += len(tokens)
+
+            reason = self._flag(segment)
+            if reason:
+                window_flagged = True
+                self._hit(reason, segment)
+                if abort_after is not None and bad_windows + 1 >= abort_after:
+                    self.report['aborted'] = True
+                    return
+            else:
+                yield segment
+
+            # Dropped windows count too: a file that loops throughout must still hit its deadline
+            if self.deadline is not None and time.time() > self.deadline:
+                self._hit('deadline', segment)
+                self.report['aborted'] = True
+                return
+
+        if window_start is not None:
+            self.check_tokens(window_tokens, window_start)
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""Per-session cache of log-mel features and Whisper encoder outputs"""
+
+import os
+import re
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+FEATURES_DIR = 'features'
+
+# Cached re-decodes run on fixed windows of this length from the start of the audio
+WINDOW_SECONDS = 30
+
+
+def digest(array: np.ndarray) -> str:
+    return hashlib.blake2b(np.ascontiguousarray(array).data, digest_size=16).hexdigest()
+
+
+class _CachedFeatureExtractor:
+    """Stands in for WhisperModel.feature_extractor while a transcription runs."""
+
+    def __init__(self, extractor, cache: 'FeatureCache', session_dir: Path):
+        self._extractor = extractor
+        self._cache = cache
+        self._session_dir = session_dir
+
+    def __getattr__(self, name):
+        return getattr(self._extractor, name)
+
+    def __call__(self, waveform: np.ndarray, *args, **kwargs) -> np.ndarray:
+        options = hashlib.blake2b(repr((args, sorted(kwargs.items()))).encode(), digest_size=4).hexdigest()
+        name = f"mel_{self._extractor.mel_filters.shape[0]}_{options}_{digest(waveform)}"
+        features = self._cache.load(self._session_dir, name)
+        if features is None:
+            features = self._extractor(waveform, *args, **kwargs)
+            self._cache.store(self._session_dir, name, features)
+        return features
+
+
+class FeatureCache:
+    """
+    Memory-mapped log-mel features and encoder outputs under each session's
+    features/ directory.
+
+    Re-decoding stored audio (lazy word timings, /retranscribe, retries
+    with another language or decode options) reuses the encoder output of
+    each window instead of running the encoder again; only the decoder
+    runs. Hits rely on the engine decoding the audio in fixed
+    WINDOW_SECONDS windows (see FasterWhisperEngine._transcribe_windows):
+    a window's features and encoder output then depend only on its PCM,
+    not on the decode options or where the previous window's decoding
+    stopped. Entries are keyed by content hash, so a changed waveform or
+    model simply misses.
+
+    The size cap is kept per process: the least recently used files this
+    process knows about are evicted first. Under prefork.py only the
+    inference process transcribes, so it is the only one using the cache.
+    """
+
+    def __init__(self, sessions_dir: Path, max_bytes: int):
+        self.sessions_dir = sessions_dir
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._entries: Dict[Path, Tuple[int, float]] = {}
+        self._total = 0
+        self.stats = {'hits': 0, 'misses': 0, 'evicted': 0}
+
+        for path in sessions_dir.glob(f'*/{FEATURES_DIR}/*.npy'):
+            stat = path.stat()
+            self._entries[path] = (stat.st_size, stat.st_mtime)
+            self._total += stat.st_size
+
+    def load(self, session_dir: Path, name: str) -> Optional[np.ndarray]:
+        path = session_dir / FEATURES_DIR / f'{name}.npy'
+        try:
+            # Copy-on-write: CTranslate2 refuses read-only buffers
+            array = np.load(path, mmap_mode='c')
+        except (OSError, ValueError):
+            with self._lock:
+                self.stats['misses'] += 1
+                entry = self._entries.pop(path, None)
+                if entry:
+                    self._total -= entry[0]
+            return None
+
+        now = time.time()
+        with self._lock:
+            self.stats['hits'] += 1
+            self._entries[path] = (path.stat().st_size, now)
+        os.utime(path, (now, now))
+        return array
+
+    def store(self, session_dir: Path, name: str, array: np.ndarray) -> None:
+        if not session_dir.exists():
+            return
+        directory = session_dir / FEATURES_DIR
+        directory.mkdir(exist_ok=True)
+        path = directory / f'{name}.npy'
+        tmp_path = directory / f'{name}.tmp.npy'
+        np.save(tmp_path, np.ascontiguousarray(array))
+        tmp_path.replace(path)
+
+        size = path.stat().st_size
+        with self._lock:
+            previous = self._entries.get(path)
+            self._total += size - (previous[0] if previous else 0)
+            self._entries[path] = (size, time.time())
+        self._evict()
+
+    def _evict(self) -> None:
+        with self._lock:
+            if self._total <= self.max_bytes:
+                return
+            victims = []
+            for path, (size, _) in sorted(self._entries.items(), key=lambda item: item[1][1]):
+                if self._total <= self.max_bytes:
+                    break
+                victims.append(path)
+                self._total -= size
+                del self._entries[path]
+            self.stats['evicted'] += len(victims)
+
+        for path in victims:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    @contextmanager
+    def attach(self, model, model_key: str, session_dir: Path):
+        """
+        Routes a WhisperModel replica's feature extraction and encoder calls
+        through the cache for the duration of one transcription. The caller
+        must hold the replica exclusively (see ModelPool).
+        """
+        model_key = re.sub(r'[^A-Za-z0-9_.-]', '_', model_key)
+        extractor = model.feature_extractor
+        encode = model.encode
+        # StorageViews built from cached arrays don't own their memory
+        keep_alive = []
+
+        def cached_encode(features: np.ndarray):
+            import ctranslate2
+            name = f"enc_{model_key}_{digest(features)}"
+            output = self.load(session_dir, name)
+            if output is not None:
+                array = np.ascontiguousarray(output)
+                keep_alive.append(array)
+                return ctranslate2.StorageView.from_array(array)
+
+            output = encode(features)
+            self.store(session_dir, name, np.array(output))
+            return output
+
+        model.feature_extractor = _CachedFeatureExtractor(extractor, self, session_dir)
+        model.encode = cached_encode
+        try:
+            yield model
+        finally:
+            model.feature_extractor = extractor
+            del model.encode
+
+
+def feature_cache_from_env(sessions_dir: Path) -> Optional[FeatureCache]:
+    """
+    FEATURE_CACHE_MB caps the cache per process (default 1024; 0 turns it
+    off). Only re-decodes of stored audio write to it, about 3-9 MB per
+    30 s window depending on the model size.
+    """
+    max_mb = float(os.environ.get('FEATURE_CACHE_MB', 1024))
+    if max_mb <= 0:
+        return None
+    return FeatureCache(sessions_dir, int(max_mb * 1024 ** 2))
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""One process holding the models, called by pre-fork workers over a Unix socket"""
+
+import os
+import pickle
+import socket
+import struct
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+
+from transcription_engine import TranscriptionEngine, decode_audio
+
+# Path of the inference process's socket; set by prefork.py for its workers
+SOCKET_ENV = 'INFERENCE_SOCKET'
+
+_HEADER = struct.Struct('!I')
+
+
+def send_message(sock: socket.socket, message) -> None:
+    data = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError('inference process closed the connection')
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv_message(sock: socket.socket):
+    size, = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))
+    return pickle.loads(_recv_exactly(sock, size))
+
+
+def _portable_error(error: Exception) -> Exception:
+    """The error itself if it survives pickling, else a RuntimeError carrying its repr."""
+    try:
+        pickle.loads(pickle.dumps(error))
+        return error
+    except Exception:
+        return RuntimeError(repr(error))
+
+
+class InferenceServer:
+    """
+    Serves this process's engines to RemoteEngine clients.
+
+    Every call arrives on its own connection and runs on its own thread, so
+    the engines' replica pools queue calls from all workers together (and
+    the decode budget sees the whole server's backlog). transcribe() replies
+    with the info, then one message per segment as it is decoded, then the
+    final budget report; a client that closes the connection early stops
+    the decode and frees the replica, as closing the segments would locally.
+    """
+
+    def __init__(self, engines: Dict[str, Optional[TranscriptionEngine]], path: str):
+        self.engines = engines
+        self.path = path
+        if os.path.exists(path):
+            os.unlink(path)
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(path)
+        self.listener.listen(128)
+
+    def serve_forever(self) -> None:
+        while True:
+            conn, _ = self.listener.accept()
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _describe(self) -> Dict:
+        return {
+            tier: None if engine is None else {'name': engine.name, 'cache_window_seconds': engine.cache_window_seconds}
+            for tier, engine in self.engines.items()
+        }
+
+    def _handle(self, conn: socket.socket) -> None:
+        segments = None
+        try:
+            request = recv_message(conn)
+            if request['method'] == 'describe':
+                send_message(conn, ('result', self._describe()))
+                return
+
+            engine = self.engines[request['tier']]
+            if request['method'] == 'backlog':
+                send_message(conn, ('result', engine.backlog()))
+            elif request['method'] == 'transcribe_batch':
+                send_message(conn, ('result', engine.transcribe_batch(request['audio'], **request['options'])))
+            else:
+                segments, info = engine.transcribe(request['audio'], **request['options'])
+                send_message(conn, ('info', info))
+                for segment in segments:
+                    send_message(conn, ('segment', segment))
+                send_message(conn, ('end', getattr(info, 'budget', None)))
+        except (ConnectionError, BrokenPipeError):
+            pass  # The worker went away or stopped reading
+        except Exception as e:
+            try:
+                send_message(conn, ('error', _portable_error(e)))
+            except OSError:
+                pass
+        finally:
+            if segments is not None and hasattr(segments, 'close'):
+                segments.close()
+            conn.close()
+
+
+class RemoteEngine(TranscriptionEngine):
+    """
+    Stands in for an engine running in the inference process (see
+    InferenceServer). Audio is sent as a path or PCM array; other sources
+    are decoded here first. Segments arrive as they are decoded, and
+    info.budget is completed in place when the last one has been read, as
+    with a local engine.
+    """
+
+    def __init__(self, path: str, tier: str, name: str, cache_window_seconds: Optional[float] = None):
+        self.path = path
+        self.tier = tier
+        self.name = name
+        self.cache_window_seconds = cache_window_seconds
+
+    def _connect(self, method: str, **request) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.path)
+            send_message(sock, {'method': method, 'tier': self.tier, **request})
+        except BaseException:
+            sock.close()
+            raise
+        return sock
+
+    def _call(self, method: str, **request):
+        sock = self._connect(method, **request)
+        try:
+            kind, payload = recv_message(sock)
+        finally:
+            sock.close()
+        if kind == 'error':
+            raise payload
+        return payload
+
+    @staticmethod
+    def _portable_audio(audio):
+        return audio if isinstance(audio, (str, np.ndarray)) else decode_audio(audio)
+
+    def backlog(self) -> int:
+        return self._call('backlog')
+
+    def transcribe_batch(self, audios, **options):
+        return self._call('transcribe_batch', audio=[self._portable_audio(a) for a in audios], options=options)
+
+    def transcribe(self, audio, **options):
+        sock = self._connect('transcribe', audio=self._portable_audio(audio), options=options)
+        try:
+            kind, info = recv_message(sock)
+        except BaseException:
+            sock.close()
+            raise
+        if kind == 'error':
+            sock.close()
+            raise info
+
+        def segments():
+            try:
+                while True:
+                    kind, payload = recv_message(sock)
+                    if kind == 'segment':
+                        yield payload
+                    elif kind == 'end':
+                        if isinstance(getattr(info, 'budget', None), dict) and payload is not None:
+                            info.budget.update(payload)
+                        return
+                    else:
+                        raise payload
+            finally:
+                sock.close()
+
+        return segments(), info
+
+
+def remote_engines(path: str) -> Dict[str, Optional[RemoteEngine]]:
+    """The inference process's engines by tier, as load_engines() returns them."""
+    described = RemoteEngine(path, None, 'remote')._call('describe')
+    return {
+        tier: None if info is None else RemoteEngine(path, tier, info['name'], info['cache_window_seconds'])
+        for tier, info in described.items()
+    }
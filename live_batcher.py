@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+import time
+import queue
+import threading
+from typing import Dict, List
+
+from transcription_engine import TranscriptionEngine
+
+
+class LiveBatcher(TranscriptionEngine):
+    """
+    Micro-batches live windows from concurrent sessions.
+
+    transcribe() blocks the calling request thread while its window waits
+    up to `window_ms` for windows from other sessions; the batch then runs
+    as one engine.transcribe_batch() call and each caller gets back its own
+    segments, so results stream to the session that sent them. Windows are
+    only batched with others that use the same decode options. A window
+    that finds no partner goes through engine.transcribe() as if unbatched,
+    keeping its VAD trimming and temperature fallback.
+    """
+
+    def __init__(self, engine: TranscriptionEngine, window_ms: float = 30.0, max_batch: int = 8, workers: int = 1):
+        self.engine = engine
+        self.name = engine.name
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+
+        self._requests: "queue.Queue" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self.stats = {'batches': 0, 'windows': 0, 'largest_batch': 0}
+
+        for _ in range(max(1, workers)):
+            threading.Thread(target=self._batch_loop, daemon=True).start()
+
+    def transcribe(self, audio, **options):
+        request = {'audio': audio, 'options': options, 'done': threading.Event(), 'result': None, 'error': None}
+        self._requests.put(request)
+        request['done'].wait()
+        if request['error'] is not None:
+            raise request['error']
+        segments, info = request['result']
+        return iter(segments), info
+
+    def _collect(self) -> List[Dict]:
+        batch = [self._requests.get()]
+        deadline = time.time() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self, group: List[Dict]) -> None:
+        try:
+            if len(group) == 1:
+                segments, info = self.engine.transcribe(group[0]['audio'], **group[0]['options'])
+                results = [(list(segments), info)]
+            else:
+                results = self.engine.transcribe_batch([r['audio'] for r in group], **group[0]['options'])
+            for request, result in zip(group, results):
+                request['result'] = result
+        except Exception as e:
+            for request in group:
+                request['error'] = e
+        finally:
+            for request in group:
+                request['done'].set()
+
+    def _batch_loop(self) -> None:
+        while True:
+            batch = self._collect()
+
+            groups: Dict[tuple, List[Dict]] = {}
+            for request in batch:
+                key = tuple(sorted((k, repr(v)) for k, v in request['options'].items()))
+                groups.setdefault(key, []).append(request)
+
+            for group in groups.values():
+                self._run(group)
+                with self._stats_lock:
+                    self.stats['batches'] += 1
+                    self.stats['windows'] += len(group)
+                    self.stats['largest_batch'] = max(self.stats['largest_batch'], len(group))
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+import os
+import time
+import queue
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+
+class LiveRefiner:
+    """
+    Background second pass for live transcription.
+
+    Live chunks are answered immediately by a small draft model. Each chunk is
+    also queued here and re-transcribed by a larger model whenever there is
+    headroom: by default, when a replica of the refining engine is free with
+    nobody waiting for it and the load average is below the CPU count, so
+    steady live traffic on the draft model doesn't hold refinement off. The
+    result is published as a 'refined' event on the session's event stream
+    so the client can replace the draft text for that chunk's time range.
+    Queued chunks and buffered events outlive a dropped event stream, so a
+    reconnecting client picks up where it left off; sessions nobody is
+    subscribed to are forgotten after IDLE_SESSION_SECONDS without activity.
+    """
+
+    HEADROOM_POLL_SECONDS = 0.25
+    MAX_PENDING_PER_SESSION = 20
+    MAX_BUFFERED_EVENTS = 100
+    IDLE_SESSION_SECONDS = 600
+
+    def __init__(self, engine, has_headroom: Optional[Callable[[], bool]] = None):
+        self.engine = engine
+        self.has_headroom = has_headroom or self._engine_has_headroom
+        self.cpu_count = os.cpu_count() or 1
+
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, deque] = {}
+        self._order: deque = deque()
+        self._wakeup = threading.Event()
+        self._subscribers: Dict[str, "queue.Queue[Dict]"] = {}
+        # Open event streams per session; a reconnect briefly overlaps the old one
+        self._subscribed: Dict[str, int] = {}
+        self._seen: Dict[str, float] = {}
+        self._worker: Optional[threading.Thread] = None
+
+        self.stats = {'refined': 0, 'dropped': 0}
+
+    def _engine_has_headroom(self) -> bool:
+        if self.engine.backlog() > 0:
+            return False
+        try:
+            return os.getloadavg()[0] < self.cpu_count
+        except OSError:
+            return True
+
+    def start(self) -> None:
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._refine_loop, daemon=True)
+            self._worker.start()
+
+    def subscribe(self, session_id: str) -> "queue.Queue[Dict]":
+        """Event queue for a session; events published before subscribing are buffered."""
+        with self._lock:
+            self._expire(time.time())
+            self._subscribed[session_id] = self._subscribed.get(session_id, 0) + 1
+            return self._events_for(session_id)
+
+    def _events_for(self, session_id: str) -> "queue.Queue[Dict]":
+        self._seen[session_id] = time.time()
+        events = self._subscribers.get(session_id)
+        if events is None:
+            events = queue.Queue(maxsize=self.MAX_BUFFERED_EVENTS)
+            self._subscribers[session_id] = events
+        return events
+
+    def unsubscribe(self, session_id: str) -> None:
+        """
+        Ends one event stream. Queued chunks and buffered events are kept for
+        a reconnect; the session expires once it stays idle and unsubscribed.
+        """
+        with self._lock:
+            remaining = self._subscribed.get(session_id, 0) - 1
+            if remaining > 0:
+                self._subscribed[session_id] = remaining
+            else:
+                self._subscribed.pop(session_id, None)
+            if session_id in self._seen:
+                self._seen[session_id] = time.time()
+
+    def _forget(self, session_id: str) -> None:
+        self._subscribers.pop(session_id, None)
+        self._subscribed.pop(session_id, None)
+        self._seen.pop(session_id, None)
+        dropped = self._jobs.pop(session_id, None)
+        if dropped:
+            self.stats['dropped'] += len(dropped)
+
+    def _expire(self, now: float) -> None:
+        """Forgets sessions that nobody subscribed to and that have gone quiet."""
+        for session_id, seen in list(self._seen.items()):
+            if session_id not in self._subscribed and now - seen > self.IDLE_SESSION_SECONDS:
+                self._forget(session_id)
+
+    def submit(self, session_id: str, chunk_index: int, audio_path: str,
+               draft_segments: List[Dict], language: Optional[str] = None) -> None:
+        """Queue a chunk for refinement. Oldest chunks are dropped if a session falls behind."""
+        job = {
+            'chunk_index': chunk_index,
+            'audio_path': audio_path,
+            'draft_segments': draft_segments,
+            'language': language,
+            'submitted_at': time.time()
+        }
+        with self._lock:
+            self._expire(job['submitted_at'])
+            self._events_for(session_id)
+            jobs = self._jobs.setdefault(session_id, deque())
+            jobs.append(job)
+            if len(jobs) > self.MAX_PENDING_PER_SESSION:
+                jobs.popleft()
+                self.stats['dropped'] += 1
+            self._order.append(session_id)
+        self._wakeup.set()
+
+    def _publish(self, session_id: str, event: Dict) -> None:
+        with self._lock:
+            events = self._subscribers.get(session_id)
+        if events is not None:
+            try:
+                events.put_nowait(event)
+            except queue.Full:
+                self.stats['dropped'] += 1
+
+    def _next_job(self):
+        with self._lock:
+            while self._order:
+                session_id = self._order.popleft()
+                jobs = self._jobs.get(session_id)
+                if jobs:
+                    return session_id, jobs.popleft()
+            self._wakeup.clear()
+        return None
+
+    def _refine_loop(self) -> None:
+        while True:
+            self._wakeup.wait()
+
+            while not self.has_headroom():
+                time.sleep(self.HEADROOM_POLL_SECONDS)
+
+            next_job = self._next_job()
+            if next_job is None:
+                continue
+
+            session_id, job = next_job
+            try:
+                self._publish(session_id, self._refine(job))
+            except Exception as e:
+                print(f"[Refiner] Error refining chunk {job['chunk_index']} of session {session_id}: {e}")
+
+    def _refine(self, job: Dict) -> Dict:
+        start_time = time.time()
+        segments, info = self.engine.transcribe(
+            job['audio_path'],
+            beam_size=1,
+            vad_filter=True,
+            language=job['language'],
+            budget={'interactive': True}
+        )
+        refined = [{'start': seg.start, 'end': seg.end, 'text': seg.text} for seg in segments]
+        self.stats['refined'] += 1
+
+        drafts = job['draft_segments']
+        spans = drafts + refined
+        range_start = min((s['start'] for s in spans), default=0.0)
+        range_end = max((s['end'] for s in spans), default=getattr(info, 'duration', 0.0))
+
+        print(f"[Refiner] Chunk {job['chunk_index']}: refined in {time.time() - start_time:.2f}s "
+              f"({time.time() - job['submitted_at']:.2f}s after draft)")
+
+        return {
+            'type': 'refined',
+            'chunk_index': job['chunk_index'],
+            'start': range_start,
+            'end': range_end,
+            'text': " ".join(seg['text'].strip() for seg in refined).strip(),
+            'segments': refined
+        }
@@ -1,13 +1,21 @@
 #!/usr/bin/env python3
 import os
 import re
-from typing import List, Dict, Optional, Tuple
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Iterator, Optional, Tuple
 from anthropic import Anthropic
 from dotenv import load_dotenv
 
 load_dotenv('.env.local')
 
 class LLMService:
+    # Streamed corrections of longer segments run as overlapping windows in parallel
+    STREAM_WINDOW_WORDS = 200
+    STREAM_OVERLAP_WORDS = 20
+    STREAM_MAX_PARALLEL = 4
+
     def __init__(self):
         self.api_key = os.getenv('ANTHROPIC_API_KEY')
         self.client = None
@@ -23,15 +31,8 @@ class LLMService:
         else:
             print("Warning: ANTHROPIC_API_KEY not found in .env.local - LLM correction disabled")
 
-    def correct_transcript(self, transcript: str) -> str:
-        """
-        Improves transcript readability while minimizing word changes.
-        Returns corrected transcript or original if API fails.
-        """
-        if not self.client or not transcript.strip():
-            return transcript
-
-        prompt = f"""You are improving a speech-to-text transcript for readability.
+    def _correction_prompt(self, transcript: str) -> str:
+        return f"""You are improving a speech-to-text transcript for readability.
 
 CRITICAL RULES:
 1. Keep 90%+ of the original words unchanged
@@ -48,6 +49,16 @@ Original transcript:
 
 Return ONLY the corrected transcript with no explanation, commentary, or markdown formatting."""
 
+    def correct_transcript(self, transcript: str) -> str:
+        """
+        Improves transcript readability while minimizing word changes.
+        Returns corrected transcript or original if API fails.
+        """
+        if not self.client or not transcript.strip():
+            return transcript
+
+        prompt = self._correction_prompt(transcript)
+
         try:
             response = self.client.messages.create(
                 model=self.model,
@@ -71,9 +82,46 @@ Return ONLY the corrected transcript with no explanation, commentary, or markdow
             print(f"Error during LLM correction: {e}")
             return transcript
 
+    def stream_correction(self, transcript: str) -> Iterator[str]:
+        """
+        Like correct_transcript(), but yields the corrected transcript as text
+        deltas while the model generates it. Yields the original transcript in
+        one piece if the API is unavailable or fails before producing any
+        text; a failure after that is raised so the caller can keep what it has.
+        """
+        if not self.client or not transcript.strip():
+            yield transcript
+            return
+
+        produced = False
+        try:
+            with self.client.messages.stream(
+                model=self.model,
+                max_tokens=4096,
+                temperature=0.3,
+                messages=[{
+                    "role": "user",
+                    "content": self._correction_prompt(transcript)
+                }]
+            ) as stream:
+                for text in stream.text_stream:
+                    if text:
+                        produced = True
+                        yield text
+        except Exception as e:
+            if produced:
+                raise
+            print(f"Error during streaming LLM correction: {e}")
+            yield transcript
+            return
+
+        if not produced:
+            print("Warning: LLM returned empty response, using original transcript")
+            yield transcript
+
     def normalize_word(self, word: str) -> str:
-        """Normalize word for comparison by removing punctuation and lowercasing."""
-        return re.sub(r'[^\w\s]', '', word.lower())
+        """Normalize word for comparison by removing punctuation, whitespace and lowercasing."""
+        return re.sub(r'[^\w]', '', word.lower())
 
     def split_into_words(self, text: str) -> List[Dict[str, str]]:
         """
@@ -129,11 +177,27 @@ Return ONLY the corrected transcript with no explanation, commentary, or markdow
         if not corrected_words:
             return []
 
+        aligned_words, _ = self._align(original_words, corrected_words)
+        return aligned_words
+
+    def _align(
+        self,
+        original_words: List[Dict],
+        corrected_words: List[Dict[str, str]],
+        open_end: bool = False
+    ) -> Tuple[List[Dict], List[Optional[int]]]:
+        """
+        Aligns split corrected words (see split_into_words) to original words.
+        Returns the timestamped corrected words and, for each of them, the
+        index of the original word it matched (None for insertions). With
+        open_end the corrected words only need to cover a prefix of the
+        original words.
+        """
         orig_normalized = [self.normalize_word(w['word']) for w in original_words]
         corr_normalized = [w['normalized'] for w in corrected_words]
 
         # Build alignment mapping using edit distance
-        alignment = self._build_alignment(orig_normalized, corr_normalized)
+        alignment = self._build_alignment(orig_normalized, corr_normalized, open_end)
 
         # Apply alignment to create timestamped words
         aligned_words = []
@@ -163,7 +227,7 @@ Return ONLY the corrected transcript with no explanation, commentary, or markdow
         # Post-process to fix duplicate timestamps from Whisper
         aligned_words = self._fix_duplicate_timestamps(aligned_words)
 
-        return aligned_words
+        return aligned_words, alignment
 
     def _fix_duplicate_timestamps(self, words: List[Dict]) -> List[Dict]:
         """
@@ -212,12 +276,14 @@ Return ONLY the corrected transcript with no explanation, commentary, or markdow
     def _build_alignment(
         self,
         orig_words: List[str],
-        corr_words: List[str]
+        corr_words: List[str],
+        open_end: bool = False
     ) -> List[Optional[int]]:
         """
         Build word alignment using edit distance.
         Returns a list where alignment[i] = j means corrected word i aligns to original word j,
-        or None if it's an insertion.
+        or None if it's an insertion. With open_end, original words after the
+        best-matching prefix are left unaligned at no cost.
         """
         n, m = len(orig_words), len(corr_words)
 
@@ -267,6 +333,8 @@ Return ONLY the corrected transcript with no explanation, commentary, or markdow
         # Backtrack to build alignment
         alignment = [None] * m
         i, j = n, m
+        if open_end:
+            i = min(range(n + 1), key=lambda k: dp[k][m][0])
 
         while i > 0 or j > 0:
             if dp[i][j][1] is None:
@@ -354,4 +422,225 @@ Return ONLY the corrected transcript with no explanation, commentary, or markdow
 
         return corrected_text, aligned_words
 
+    def _windows(self, count: int, window_words: int, overlap_words: int) -> List[Tuple[int, int]]:
+        """Splits `count` words into [start, end) windows overlapping by overlap_words."""
+        if count <= window_words:
+            return [(0, count)]
+        step = max(1, window_words - overlap_words)
+        windows = []
+        start = 0
+        while True:
+            end = min(count, start + window_words)
+            windows.append((start, end))
+            if end >= count:
+                return windows
+            start += step
+
+    def _correct_window(self, text: str, words: List[Dict], events: "queue.Queue",
+                        stop: Optional[threading.Event] = None) -> str:
+        """
+        Streams the correction of one window into `events` as batches of
+        (word, position, token) triples followed by None (see
+        IncrementalAligner). Returns the corrected text.
+        Setting `stop` ends the API stream early.
+        """
+        aligner = IncrementalAligner(self, words)
+        deltas = self.stream_correction(text)
+        try:
+            for delta in deltas:
+                if stop is not None and stop.is_set():
+                    break
+                committed = aligner.feed(delta)
+                if committed:
+                    events.put(committed)
+            else:
+                events.put(aligner.finish())
+        except Exception as e:
+            print(f"Error during streaming LLM correction, keeping the rest uncorrected: {e}")
+            events.put(aligner.finish(keep_original_tail=True))
+        finally:
+            # Closing the generator closes the API stream
+            deltas.close()
+            events.put(None)
+        return aligner.text.strip()
+
+    def stream_correct_and_align(
+        self,
+        original_text: str,
+        original_words: List[Dict],
+        window_words: Optional[int] = None,
+        overlap_words: Optional[int] = None,
+        max_parallel: Optional[int] = None
+    ) -> Iterator[Dict]:
+        """
+        Streaming version of correct_and_align().
+
+        Yields {'type': 'words', 'words': [...]} with timestamped corrected
+        words as soon as they are stable in the model's output, then one
+        {'type': 'done', 'corrected_text': ..., 'words': [...]} with the
+        complete result. Segments longer than window_words are split into
+        windows overlapping by overlap_words that are corrected in parallel;
+        words are still yielded in order, and each overlap is taken from the
+        window in which it lies further from the edge. The corrected text is
+        stitched from the same stretch of each window's output, so it keeps
+        the model's layout and punctuation rather than being rebuilt from
+        the words.
+        """
+        window_words = window_words or self.STREAM_WINDOW_WORDS
+        overlap_words = self.STREAM_OVERLAP_WORDS if overlap_words is None else overlap_words
+        max_parallel = max_parallel or self.STREAM_MAX_PARALLEL
+
+        if not original_words:
+            corrected_text = ''.join(self.stream_correction(original_text)).strip() or original_text
+            yield {'type': 'done', 'corrected_text': corrected_text, 'words': []}
+            return
+
+        windows = self._windows(len(original_words), window_words, overlap_words)
+        queues = [queue.Queue() for _ in windows]
+        stop = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=min(max_parallel, len(windows)))
+        try:
+            futures = []
+            for (start, end), events in zip(windows, queues):
+                words = original_words[start:end]
+                text = original_text if len(windows) == 1 else ''.join(w['word'] for w in words).strip()
+                futures.append(executor.submit(self._correct_window, text, words, events, stop))
+
+            all_words = []
+            pieces = []
+            half = overlap_words / 2
+            for k, ((start, end), events) in enumerate(zip(windows, queues)):
+                low = start + half if k > 0 else float('-inf')
+                high = end - half if k < len(windows) - 1 else float('inf')
+                tokens = []
+                tail = []
+                while True:
+                    committed = events.get()
+                    if committed is None:
+                        break
+                    kept = []
+                    for word, position, token in committed:
+                        if low <= start + position < high:
+                            kept.append(word)
+                            if token is None:
+                                tail.append(word['word'])
+                            else:
+                                tokens.append(token)
+                    if kept:
+                        all_words.extend(kept)
+                        yield {'type': 'words', 'words': kept}
+                pieces.append(self._text_span(futures[k].result(), tokens))
+                pieces.extend(tail)
+        finally:
+            # If the caller stopped reading, drop queued windows and end the running streams
+            stop.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        all_words = self._fix_duplicate_timestamps(all_words)
+        corrected_text = ' '.join(piece for piece in pieces if piece) or original_text
+        yield {'type': 'done', 'corrected_text': corrected_text, 'words': all_words}
+
+    def _text_span(self, text: str, tokens: List[int]) -> str:
+        """The stretch of `text` from its tokens[0]-th to its tokens[-1]-th word, layout included."""
+        if not tokens:
+            return ''
+        spans = [match.span() for match in re.finditer(r'\S+', text)]
+        return text[spans[min(tokens)][0]:spans[max(tokens)][1]]
+
+
+class IncrementalAligner:
+    """
+    Aligns a corrected transcript to the original word timings while the
+    corrected text is still arriving.
+
+    The last HOLDBACK_WORDS corrected words are held back until more text
+    arrives (the final one may be cut mid-token, and the alignment needs a
+    little right context). Each stable chunk is aligned against the next
+    stretch of original words, and committed up to its last matched word;
+    the original words up to that match are consumed. Each committed word
+    comes with its position in the original words (fractional for inserted
+    words), which the windowed merge uses to trim overlaps, and its index
+    among the words of the corrected text (None for original words kept
+    after the stream broke off), which it uses to cut the matching text.
+    """
+
+    HOLDBACK_WORDS = 3
+
+    def __init__(self, service: LLMService, original_words: List[Dict]):
+        self.service = service
+        self.original_words = original_words
+        self.text = ''
+        self.original_pos = 0
+        self.corrected_pos = 0
+
+    def feed(self, delta: str) -> List[Tuple[Dict, float, Optional[int]]]:
+        self.text += delta
+        words = self.service.split_into_words(self.text)
+        return self._commit(words, len(words) - self.HOLDBACK_WORDS, final=False)
+
+    def finish(self, keep_original_tail: bool = False) -> List[Tuple[Dict, float, Optional[int]]]:
+        """
+        Commits everything that's left. With keep_original_tail (the stream
+        broke off) the original words not covered yet are appended as-is.
+        """
+        words = self.service.split_into_words(self.text)
+        if keep_original_tail:
+            committed = self._commit(words, len(words), final=False)
+            tail = self.original_words[self.original_pos:]
+            committed += [
+                ({**word, 'word': word['word'].strip()}, self.original_pos + i, None)
+                for i, word in enumerate(tail)
+            ]
+            self.original_pos = len(self.original_words)
+            return committed
+        return self._commit(words, len(words), final=True)
+
+    def _commit(self, words: List[Dict[str, str]], stable_end: int,
+                final: bool) -> List[Tuple[Dict, float, Optional[int]]]:
+        chunk = words[self.corrected_pos:stable_end]
+        if not chunk:
+            return []
+
+        if final:
+            window = self.original_words[self.original_pos:]
+        else:
+            # Room for the model to have dropped some words (fillers) in this chunk
+            size = len(chunk) + len(chunk) // 4 + 5
+            window = self.original_words[self.original_pos:self.original_pos + size]
+
+        if not window:
+            # Everything original is consumed; place extra words after the last one
+            last_end = self.original_words[-1]['end'] if self.original_words else 0.0
+            position = len(self.original_words) - 0.5
+            committed = [
+                ({'word': word['word'], 'start': last_end, 'end': last_end + 0.3, 'probability': 0.0},
+                 position, self.corrected_pos + i)
+                for i, word in enumerate(chunk)
+            ]
+            self.corrected_pos += len(chunk)
+            return committed
+
+        aligned, alignment = self.service._align(window, chunk, open_end=not final)
+        if final:
+            keep = len(chunk)
+        else:
+            matched = [i for i, orig_idx in enumerate(alignment) if orig_idx is not None]
+            if not matched:
+                return []
+            keep = matched[-1] + 1
+
+        committed = []
+        last = self.original_pos - 1
+        for i in range(keep):
+            if alignment[i] is not None:
+                last = self.original_pos + alignment[i]
+                committed.append((aligned[i], last, self.corrected_pos + i))
+            else:
+                committed.append((aligned[i], last + 0.5, self.corrected_pos + i))
+
+        self.original_pos = max(self.original_pos, last + 1)
+        self.corrected_pos += keep
+        return committed
+
+
 llm_service = LLMService()
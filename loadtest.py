@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""Simulate concurrent live-transcription clients and find the sustainable stream count"""
+
+import io
+import os
+import sys
+import json
+import time
+import wave
+import uuid
+import argparse
+import threading
+import subprocess
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+SAMPLE_RATE = 16000
+CLK_TCK = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+
+def to_wav(pcm: np.ndarray) -> bytes:
+    """16-bit mono WAV bytes; the server decodes uploads by content, not extension."""
+    buf = io.BytesIO()
+    with wave.open(buf, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes((np.clip(pcm, -1, 1) * 32767).astype(np.int16).tobytes())
+    return buf.getvalue()
+
+
+def synthesize(seconds: float) -> np.ndarray:
+    """Speech-like test signal: gated harmonic tones with noise."""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    pitch = 140 + 40 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 6))
+    gate = (np.sin(2 * np.pi * 2.5 * t) > -0.3).astype(np.float32)
+    noise = np.random.default_rng(0).normal(0, 0.02, len(t))
+    return (0.3 * voiced * gate + noise).astype(np.float32)
+
+
+def load_chunks(audio_path, chunk_seconds, synthetic_seconds):
+    if audio_path:
+        from faster_whisper import decode_audio
+        pcm = decode_audio(audio_path, sampling_rate=SAMPLE_RATE)
+    else:
+        pcm = synthesize(synthetic_seconds)
+
+    size = int(chunk_seconds * SAMPLE_RATE)
+    return [to_wav(pcm[i:i + size]) for i in range(0, len(pcm), size) if len(pcm[i:i + size]) > SAMPLE_RATE // 2]
+
+
+def percentile(values, pct):
+    return float(np.percentile(values, pct)) if values else None
+
+
+class CpuSampler:
+    """Server CPU use from /proc/<pid>/stat, in cores."""
+
+    def __init__(self, pid):
+        self.pid = pid
+
+    def _ticks(self):
+        try:
+            with open(f'/proc/{self.pid}/stat', 'r') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            return int(fields[11]) + int(fields[12])
+        except (OSError, IndexError, ValueError):
+            return None
+
+    def start(self):
+        self._start = (self._ticks(), time.time())
+
+    def stop(self):
+        ticks, wall = self._ticks(), time.time()
+        if ticks is None or self._start[0] is None:
+            return None
+        return (ticks - self._start[0]) / CLK_TCK / (wall - self._start[1])
+
+
+def send_chunk(url, session_id, chunk_index, chunk, timeout):
+    """Posts one chunk and times the first segment and chunk_complete events."""
+    sent = time.time()
+    result = {'first_segment': None, 'complete': None, 'error': None}
+    try:
+        response = requests.post(
+            f'{url}/transcribe-live',
+            params={'session_id': session_id},
+            files={'audio': ('chunk.webm', chunk, 'audio/webm')},
+            data={'chunk_index': chunk_index, 'session_id': session_id},
+            stream=True,
+            timeout=timeout
+        )
+        if response.status_code != 200:
+            result['error'] = f'HTTP {response.status_code}'
+            return result
+
+        for line in response.iter_lines():
+            if not line.startswith(b'data: '):
+                continue
+            event = json.loads(line[6:])
+            if event['type'] == 'segment' and result['first_segment'] is None:
+                result['first_segment'] = time.time() - sent
+            elif event['type'] == 'chunk_complete':
+                result['complete'] = time.time() - sent
+            elif event['type'] == 'error':
+                result['error'] = event.get('message', 'error')
+        if result['complete'] is None and result['error'] is None:
+            result['error'] = 'stream ended without chunk_complete'
+    except Exception as e:
+        result['error'] = str(e)
+    return result
+
+
+def run_stage(url, streams, chunks, duration, interval, timeout, cpu):
+    """N clients each sending a chunk every `interval` seconds for `duration` seconds."""
+    run_id = uuid.uuid4().hex[:8]
+    session_ids = [f'loadtest-{run_id}-{i}' for i in range(streams)]
+    chunks_per_stream = max(1, int(duration / interval))
+    results = []
+    lock = threading.Lock()
+
+    def client(stream_index, executor):
+        # Stagger clients across one interval, like independent users
+        time.sleep(interval * stream_index / streams)
+        start = time.time()
+        futures = []
+        for chunk_index in range(chunks_per_stream):
+            delay = start + chunk_index * interval - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            chunk = chunks[(stream_index + chunk_index) % len(chunks)]
+            futures.append(executor.submit(send_chunk, url, session_ids[stream_index], chunk_index, chunk, timeout))
+        for future in futures:
+            outcome = future.result()
+            with lock:
+                results.append(outcome)
+
+    if cpu:
+        cpu.start()
+    with ThreadPoolExecutor(max_workers=streams * 4) as executor:
+        clients = [threading.Thread(target=client, args=(i, executor)) for i in range(streams)]
+        for t in clients:
+            t.start()
+        for t in clients:
+            t.join()
+    cpu_cores = cpu.stop() if cpu else None
+
+    for session_id in session_ids:
+        try:
+            requests.delete(f'{url}/session/{session_id}', timeout=timeout)
+        except Exception:
+            pass
+
+    first = [r['first_segment'] for r in results if r['first_segment'] is not None]
+    complete = [r['complete'] for r in results if r['complete'] is not None]
+    errors = sum(1 for r in results if r['error'])
+    return {
+        'streams': streams,
+        'chunks': len(results),
+        'error_rate': errors / len(results) if results else 1.0,
+        'first_segment': {p: percentile(first, p) for p in (50, 95, 99)},
+        'chunk_complete': {p: percentile(complete, p) for p in (50, 95, 99)},
+        'server_cpu_cores': cpu_cores
+    }
+
+
+def sustainable(stage, max_p95, max_error_rate):
+    p95 = stage['chunk_complete'][95]
+    return p95 is not None and p95 <= max_p95 and stage['error_rate'] <= max_error_rate
+
+
+def print_stage(stage):
+    fmt = lambda v: f'{v:.2f}s' if v is not None else '-'
+    first, complete = stage['first_segment'], stage['chunk_complete']
+    cpu = f"{stage['server_cpu_cores']:.2f}" if stage['server_cpu_cores'] is not None else '-'
+    print(f"  streams={stage['streams']:<3} chunks={stage['chunks']:<4} errors={stage['error_rate']:.1%}  "
+          f"first segment p50/p95/p99={fmt(first[50])}/{fmt(first[95])}/{fmt(first[99])}  "
+          f"complete p50/p95/p99={fmt(complete[50])}/{fmt(complete[95])}/{fmt(complete[99])}  cpu={cpu}")
+
+
+def find_max_streams(args, chunks, cpu):
+    """Doubles the stream count until it breaks, then bisects between the last good and first bad."""
+    stages = []
+
+    def measure(streams):
+        print(f"\nRunning {streams} concurrent stream(s) for {args.duration:.0f}s...")
+        stage = run_stage(args.url, streams, chunks, args.duration, args.interval, args.timeout, cpu)
+        print_stage(stage)
+        stages.append(stage)
+        return sustainable(stage, args.max_p95, args.max_error_rate)
+
+    good, bad = 0, None
+    streams = args.start_streams
+    while streams <= args.max_streams:
+        if measure(streams):
+            good = streams
+            streams *= 2
+        else:
+            bad = streams
+            break
+
+    if bad is None:
+        bad = args.max_streams + 1
+    while bad - good > 1:
+        mid = (good + bad) // 2
+        if measure(mid):
+            good = mid
+        else:
+            bad = mid
+
+    return good, stages
+
+
+def wait_for_server(url, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=2)
+            return True
+        except requests.RequestException:
+            time.sleep(1)
+    return False
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--url', default='http://localhost:10000')
+    parser.add_argument('--audio', default=str(Path(__file__).parent / 'test-short.mp3'),
+                        help="audio to replay; pass '' to use a synthesized signal")
+    parser.add_argument('--synthetic-seconds', type=float, default=30.0)
+    parser.add_argument('--interval', type=float, default=3.0, help='seconds between chunks per client')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds per load stage')
+    parser.add_argument('--streams', type=int, help='run a single stage with this many streams')
+    parser.add_argument('--start-streams', type=int, default=1)
+    parser.add_argument('--max-streams', type=int, default=64)
+    parser.add_argument('--max-p95', type=float, help='p95 chunk_complete limit (default: the chunk interval)')
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--server-pid', type=int, help='server process to sample CPU from')
+    parser.add_argument('--spawn', action='store_true', help='start server.py locally for the run')
+    parser.add_argument('--output', help='write results as JSON')
+    args = parser.parse_args(argv)
+    args.max_p95 = args.max_p95 or args.interval
+
+    chunks = load_chunks(args.audio or None, args.interval, args.synthetic_seconds)
+    print(f"Prepared {len(chunks)} chunk(s) of {args.interval:.1f}s")
+
+    server = None
+    pid = args.server_pid
+    if args.spawn:
+        server = subprocess.Popen(
+            [sys.executable, str(Path(__file__).parent / 'server.py')],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        pid = server.pid
+        if not wait_for_server(args.url, 300):
+            print("Error: server did not start")
+            server.terminate()
+            return False
+
+    cpu = CpuSampler(pid) if pid else None
+    try:
+        if args.streams:
+            stage = run_stage(args.url, args.streams, chunks, args.duration, args.interval, args.timeout, cpu)
+            print_stage(stage)
+            report = {'stages': [stage], 'sustainable': sustainable(stage, args.max_p95, args.max_error_rate)}
+        else:
+            max_streams, stages = find_max_streams(args, chunks, cpu)
+            print(f"\n✅ Max sustainable live streams: {max_streams} "
+                  f"(p95 chunk_complete <= {args.max_p95:.1f}s, errors <= {args.max_error_rate:.0%})")
+            report = {'max_streams': max_streams, 'stages': stages}
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main(sys.argv[1:]) else 1)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""Host-tuned model configuration written by autotune.py and loaded by server.py"""
+
+import os
+import json
+import queue
+import threading
+import weakref
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+PROFILE_PATH = Path(__file__).parent / "data" / "autotune_profile.json"
+
+DEFAULT_CONFIG = {
+    'compute_type': 'int8',
+    'cpu_threads': 0,
+    'replicas': 1,
+    'chunk_length': None
+}
+
+DEFAULT_PROFILE = {
+    'engine': 'faster-whisper',
+    'mock_rtf': 0.05,
+    'model': 'base',
+    'live_draft_model': None,
+    'live_batch_window_ms': 30,
+    'live_max_batch': 8,
+    'live': dict(DEFAULT_CONFIG),
+    'file': dict(DEFAULT_CONFIG)
+}
+
+
+def load_profile(path: Optional[Path] = None) -> Dict:
+    """
+    Loads the autotune profile, falling back to the built-in defaults for
+    anything missing. WHISPER_PROFILE overrides the default location,
+    LIVE_DRAFT_MODEL enables two-pass live transcription and
+    WHISPER_CPU_THREADS caps the threads each workload's replicas share.
+    """
+    path = Path(path or os.environ.get('WHISPER_PROFILE', PROFILE_PATH))
+    profile = _read_profile(path)
+
+    cpu_threads = int(os.environ.get('WHISPER_CPU_THREADS', 0))
+    if cpu_threads > 0:
+        for workload in ('live', 'file'):
+            config = profile[workload]
+            per_replica = max(1, cpu_threads // max(1, config['replicas']))
+            if config['cpu_threads'] <= 0 or config['cpu_threads'] > per_replica:
+                config['cpu_threads'] = per_replica
+    return profile
+
+
+def _read_profile(path: Path) -> Dict:
+    profile = json.loads(json.dumps(DEFAULT_PROFILE))
+    profile['live_draft_model'] = os.environ.get('LIVE_DRAFT_MODEL') or None
+
+    if not path.exists():
+        return profile
+
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    except Exception as e:
+        print(f"Warning: Could not read autotune profile {path}: {e}")
+        return profile
+
+    for key in ('engine', 'mock_rtf', 'model', 'live_batch_window_ms', 'live_max_batch'):
+        profile[key] = data.get(key, profile[key])
+    profile['live_draft_model'] = profile['live_draft_model'] or data.get('live_draft_model')
+    for workload in ('live', 'file'):
+        for key in DEFAULT_CONFIG:
+            if key in data.get(workload, {}):
+                profile[workload][key] = data[workload][key]
+    profile['path'] = str(path)
+    return profile
+
+
+def save_profile(profile: Dict, path: Optional[Path] = None) -> Path:
+    path = Path(path or PROFILE_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(profile, f, indent=2)
+    return path
+
+
+class ModelPool:
+    """
+    A fixed set of WhisperModel replicas behind the WhisperModel.transcribe API.
+
+    A replica is checked out for as long as its segment generator is being
+    consumed, so at most `replicas` transcriptions run at once per pool.
+    Each replica is built with num_workers=1: it never serves two callers at
+    once, so more workers would only hold more copies of the model.
+    """
+
+    def __init__(self, model_name: str, config: Dict, model_factory=None):
+        if model_factory is None:
+            from faster_whisper import WhisperModel
+            model_factory = WhisperModel
+
+        self.model_name = model_name
+        self.config = config
+        self.decode_options = {}
+        if config.get('chunk_length'):
+            self.decode_options['chunk_length'] = config['chunk_length']
+
+        self.capacity = max(1, config.get('replicas', 1))
+        self._waiting = 0
+        self._waiting_lock = threading.Lock()
+        self._replicas: "queue.Queue" = queue.Queue()
+        for _ in range(self.capacity):
+            self._replicas.put(model_factory(
+                model_name,
+                device="cpu",
+                compute_type=config.get('compute_type', 'int8'),
+                cpu_threads=config.get('cpu_threads', 0),
+                num_workers=1
+            ))
+
+    def backlog(self) -> int:
+        """Requests a new request would queue behind (or with, if every replica is busy)."""
+        with self._waiting_lock:
+            return self._waiting + (0 if self._replicas.qsize() else 1)
+
+    def _acquire(self):
+        with self._waiting_lock:
+            self._waiting += 1
+        try:
+            return self._replicas.get()
+        finally:
+            with self._waiting_lock:
+                self._waiting -= 1
+
+    @contextmanager
+    def checkout(self):
+        """Holds one replica for direct use of the lower-level WhisperModel API."""
+        model = self._acquire()
+        try:
+            yield model
+        finally:
+            self._replicas.put(model)
+
+    def transcribe(self, audio, replica_context=None, **kwargs):
+        """
+        replica_context, if given, is called with the checked-out replica and
+        must return a context manager; it stays entered until the segment
+        generator is consumed, closed or dropped (even if it was never started).
+        """
+        model = self._acquire()
+        stack = ExitStack()
+        stack.callback(self._replicas.put, model)
+        try:
+            if replica_context is not None:
+                stack.enter_context(replica_context(model))
+            segments, info = model.transcribe(audio, **{**self.decode_options, **kwargs})
+        except Exception:
+            stack.close()
+            raise
+
+        def consume():
+            with stack:
+                yield from segments
+
+        generator = consume()
+        # An unstarted generator never enters `with stack`; release the replica when it is collected
+        weakref.finalize(generator, stack.close)
+        return generator, info
@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""Serve with one supervisor process and pre-forked server workers"""
+
+import os
+import gc
+import sys
+import json
+import time
+import uuid
+import zlib
+import signal
+import socket
+import argparse
+import importlib
+import shutil
+import selectors
+import tempfile
+import traceback
+from functools import partial
+from itertools import count
+from pathlib import Path
+from typing import List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from inference_service import SOCKET_ENV
+
+# Imported once by the supervisor; workers inherit them copy-on-write
+PRELOAD_MODULES = (
+    'numpy', 'av', 'ctranslate2', 'tokenizers', 'faster_whisper', 'flask', 'flask_cors', 'anthropic',
+    'llm_service', 'search_index', 'session_store', 'transcription_engine', 'inference_service',
+    'word_timing_service'
+)
+
+# Routes whose second path component is a session id
+SESSION_ROUTES = ('upload', 'session', 'transcribe-status', 'download-transcription', 'audio-segment', 'live-events')
+
+REQUEST_LINE_LIMIT = 8192
+REQUEST_LINE_TIMEOUT = 10.0
+
+
+def session_worker(session_id: str, workers: int) -> int:
+    return zlib.crc32(session_id.encode()) % workers
+
+
+def owns_session(session_id: str) -> bool:
+    """Whether this process serves `session_id` (always true outside pre-fork mode)."""
+    workers = int(os.environ.get('PREFORK_WORKERS', 1))
+    return workers <= 1 or session_worker(session_id, workers) == int(os.environ.get('PREFORK_WORKER_INDEX', 0))
+
+
+def new_session_id() -> str:
+    """
+    A new session id. In a pre-fork worker the id hashes to that worker, so
+    later requests for the session reach the process holding its in-memory
+    state (uploads in progress, live refinement subscribers).
+    """
+    while True:
+        session_id = str(uuid.uuid4())
+        if owns_session(session_id):
+            return session_id
+
+
+def request_session_id(request_line: bytes) -> Optional[str]:
+    """The session a request belongs to, from its path or a session_id query parameter."""
+    parts = request_line.decode('latin-1').split(' ')
+    if len(parts) < 2:
+        return None
+    url = urlsplit(parts[1])
+    query = parse_qs(url.query)
+    if query.get('session_id'):
+        return query['session_id'][0]
+    path = url.path.strip('/').split('/')
+    if len(path) >= 2 and path[0] in SESSION_ROUTES:
+        return path[1]
+    return None
+
+
+def memory_mb(pid: int) -> Optional[dict]:
+    """RSS and PSS (shared pages split between the processes sharing them) in MB."""
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+    except OSError:
+        return None
+    return {key.lower(): int(fields[key].split()[0]) / 1024 for key in ('Rss', 'Pss') if key in fields}
+
+
+class _OneRequestHandler(WSGIRequestHandler):
+    # Connections are dispatched by their first request, so keep-alive must not carry another session's requests
+    protocol_version = 'HTTP/1.0'
+
+
+def run_inference(channel: socket.socket, path: str) -> int:
+    """
+    Inference process body: builds the engines from the profile, as the
+    single-process server would, and serves them on the Unix socket `path`
+    (see inference_service.InferenceServer).
+    """
+    start = time.time()
+    from feature_cache import feature_cache_from_env
+    from inference_service import InferenceServer
+    from model_profile import load_profile
+    from transcription_engine import load_engines
+
+    sessions_dir = Path(__file__).parent / 'data' / 'sessions'
+    sessions_dir.mkdir(parents=True, exist_ok=True)
+    engines = load_engines(load_profile(), feature_cache_from_env(sessions_dir))
+    inference = InferenceServer(engines, path)
+    channel.send(json.dumps({'startup_seconds': time.time() - start}).encode())
+    inference.serve_forever()
+    return 0
+
+
+def run_worker(index: int, workers: int, channel: socket.socket, listener: socket.socket) -> int:
+    """
+    Worker process body: imports the app, whose engines call the inference
+    process (INFERENCE_SOCKET is set), and then serves the connections the
+    supervisor hands over on `channel`.
+    """
+    start = time.time()
+    os.environ['PREFORK_WORKERS'] = str(workers)
+    os.environ['PREFORK_WORKER_INDEX'] = str(index)
+
+    import server
+    # Sessions are spread over the workers; only one compacts storage
+    server.start_background_services(owns=owns_session, compact_storage=index == 0)
+
+    host, port = listener.getsockname()[:2]
+    # Only used to run the handed-over connections; it never accepts on the socket itself
+    httpd = make_server(host, port, server.app, threaded=True, request_handler=_OneRequestHandler,
+                        fd=listener.fileno())
+    channel.send(json.dumps({'startup_seconds': time.time() - start}).encode())
+
+    while True:
+        try:
+            message, fds, _, _ = socket.recv_fds(channel, 64, 16)
+        except OSError:
+            break
+        if not message and not fds:
+            break  # Supervisor is gone
+        for fd in fds:
+            conn = socket.socket(fileno=fd)
+            conn.setblocking(True)
+            try:
+                address = conn.getpeername()
+            except OSError:
+                conn.close()
+                continue
+            httpd.process_request(conn, address)
+    return 0
+
+
+class Worker:
+    def __init__(self, index: int):
+        self.index = index
+        self.pid: Optional[int] = None
+        self.channel: Optional[socket.socket] = None
+        self.ready = False
+        self.started_at = 0.0
+        self.failures = 0
+        self.restart_at = 0.0
+
+
+class Supervisor:
+    """
+    Binds the listening socket, forks one inference process and the
+    workers, and hands each accepted connection to one of the workers.
+
+    The models are loaded once, in the inference process; workers run the
+    HTTP side (requests, LLM calls, storage) and send every transcription
+    to it over a Unix socket (see inference_service.RemoteEngine), so
+    adding a worker doesn't add a copy of the weights. CTranslate2 models
+    can't be loaded before forking and shared copy-on-write, because their
+    thread pools would not survive the fork. The inference process uses the
+    whole machine as the single-process server would, sized by the autotune
+    profile. Everything else that can be shared is prepared before forking:
+    the heavy libraries are imported, model names are resolved to their
+    local directories and the model files are read ahead into the page
+    cache, and the imported objects are frozen out of the garbage collector
+    so the children don't dirty the shared pages.
+
+    Requests for a session always go to the same worker (chosen by hashing
+    the session id in the request path or its session_id query parameter),
+    because uploads in progress and live refinement subscribers live in
+    that worker's memory. A worker or inference process that exits is
+    restarted, with a growing delay if it keeps failing shortly after
+    starting; workers are only started while the inference process is up.
+    """
+
+    STABLE_SECONDS = 30.0
+    MAX_RESTART_DELAY = 30.0
+    SHUTDOWN_GRACE_SECONDS = 10.0
+
+    def __init__(self, host: str, port: int, workers: int):
+        self.host = host
+        self.port = port
+        self.workers = [Worker(i) for i in range(workers)]
+        self.inference = Worker(-1)
+        # Private to this user, as the socket carries pickled requests
+        self.socket_dir = tempfile.mkdtemp(prefix='whisper-inference-')
+        self.socket_path = os.path.join(self.socket_dir, 'engines.sock')
+        self.selector = selectors.DefaultSelector()
+        self.listener: Optional[socket.socket] = None
+        self.listening = False
+        self.stopping = False
+        self._round_robin = count()
+        # Accepted connections whose request line hasn't fully arrived yet
+        self._waiting: List[tuple] = []
+
+    def preload(self) -> None:
+        start = time.time()
+        for name in PRELOAD_MODULES:
+            try:
+                importlib.import_module(name)
+            except ImportError:
+                pass
+
+        import transcription_engine
+        from model_profile import load_profile
+        profile = load_profile()
+        engine = os.environ.get('TRANSCRIPTION_ENGINE') or profile.get('engine', 'faster-whisper')
+        if engine != 'mock':
+            from faster_whisper.utils import download_model
+            for name in {profile['model'], profile['live_draft_model']} - {None}:
+                path = name if os.path.isdir(name) else download_model(name)
+                transcription_engine.MODEL_PATHS[name] = path
+                print(f"[Prefork] Model {name}: {path} ({self._read_ahead(path) / 1024 ** 2:.0f} MB read ahead)")
+        print(f"[Prefork] Preloaded in {time.time() - start:.2f}s")
+
+    def _read_ahead(self, directory: str) -> int:
+        total = 0
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if not os.path.isfile(path):
+                continue
+            total += os.path.getsize(path)
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            finally:
+                os.close(fd)
+        return total
+
+    def spawn(self, worker: Worker) -> None:
+        parent, child = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sys.stdout.flush()
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                signal.signal(signal.SIGINT, signal.SIG_IGN)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                parent.close()
+                self.selector.close()
+                for other in self.workers:
+                    if other.channel is not None:
+                        other.channel.close()
+                for conn, _ in self._waiting:
+                    conn.close()
+                if worker is self.inference:
+                    self.listener.close()
+                    code = run_inference(child, self.socket_path)
+                else:
+                    code = run_worker(worker.index, len(self.workers), child, self.listener)
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                sys.stdout.flush()
+                os._exit(code)
+
+        child.close()
+        worker.pid = pid
+        worker.channel = parent
+        worker.ready = False
+        worker.started_at = time.time()
+        self.selector.register(parent, selectors.EVENT_READ, partial(self._on_worker_message, worker))
+        print(f"[Prefork] {self._label(worker)} started (pid {pid})")
+
+    def _label(self, worker: Worker) -> str:
+        return 'Inference process' if worker is self.inference else f'Worker {worker.index}'
+
+    def memory_report(self) -> dict:
+        """RSS/PSS in MB of the inference process and of each worker."""
+        return {
+            'inference': memory_mb(self.inference.pid) if self.inference.pid else None,
+            'workers': [memory_mb(worker.pid) if worker.pid else None for worker in self.workers]
+        }
+
+    def _on_worker_message(self, worker: Worker, channel: socket.socket) -> None:
+        try:
+            message = channel.recv(4096)
+        except OSError:
+            message = b''
+        if not message:
+            self.selector.unregister(channel)
+            return
+        info = json.loads(message)
+        worker.ready = True
+        memory = memory_mb(worker.pid) or {}
+        print(f"[Prefork] {self._label(worker)} ready in {info['startup_seconds']:.2f}s "
+              f"(rss {memory.get('rss', 0):.0f} MB, pss {memory.get('pss', 0):.0f} MB)")
+        if all(w.ready for w in self.workers):
+            # The weights should only count in the inference process
+            report = self.memory_report()
+            workers = ' / '.join(f"{m['rss']:.0f}" for m in report['workers'] if m)
+            print(f"[Prefork] Memory: inference process rss {(report['inference'] or {}).get('rss', 0):.0f} MB, "
+                  f"workers rss {workers} MB")
+
+    def _accept(self, listener: socket.socket) -> None:
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            conn.setblocking(False)
+            self._waiting.append((conn, time.time() + REQUEST_LINE_TIMEOUT))
+
+    def _dispatch_waiting(self) -> None:
+        still_waiting = []
+        for conn, deadline in self._waiting:
+            try:
+                head = conn.recv(REQUEST_LINE_LIMIT, socket.MSG_PEEK)
+            except BlockingIOError:
+                head = None
+            except OSError:
+                conn.close()
+                continue
+
+            if head == b'':
+                conn.close()
+            elif head and (b'\r\n' in head or len(head) >= REQUEST_LINE_LIMIT):
+                self._dispatch(conn, head.split(b'\r\n', 1)[0])
+            elif time.time() > deadline:
+                conn.close()
+            else:
+                still_waiting.append((conn, deadline))
+        self._waiting = still_waiting
+
+    def _pick(self, session_id: Optional[str]) -> Optional[Worker]:
+        ready = [worker for worker in self.workers if worker.ready]
+        if not ready:
+            return None
+        if session_id is not None:
+            target = self.workers[session_worker(session_id, len(self.workers))]
+            if target.ready:
+                return target
+            return ready[session_worker(session_id, len(ready))]
+        return ready[next(self._round_robin) % len(ready)]
+
+    def _dispatch(self, conn: socket.socket, request_line: bytes) -> None:
+        session_id = request_session_id(request_line)
+        try:
+            for _ in range(len(self.workers)):
+                worker = self._pick(session_id)
+                if worker is None:
+                    break
+                try:
+                    socket.send_fds(worker.channel, [b'c'], [conn.fileno()])
+                    return
+                except OSError:
+                    worker.ready = False
+            conn.setblocking(True)
+            conn.sendall(b'HTTP/1.0 503 Service Unavailable\r\nContent-Length: 0\r\nRetry-After: 1\r\n\r\n')
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+    def _reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            worker = next((w for w in self.workers + [self.inference] if w.pid == pid), None)
+            if worker is None:
+                continue
+
+            print(f"[Prefork] {self._label(worker)} (pid {pid}) exited with status {os.waitstatus_to_exitcode(status)}")
+            if worker.channel is not None:
+                if worker.channel in self.selector.get_map():
+                    self.selector.unregister(worker.channel)
+                worker.channel.close()
+            worker.pid = None
+            worker.channel = None
+            worker.ready = False
+
+            lived = time.time() - worker.started_at
+            worker.failures = 0 if lived > self.STABLE_SECONDS else worker.failures + 1
+            delay = min(self.MAX_RESTART_DELAY, 0.5 * 2 ** worker.failures) if worker.failures else 0.0
+            worker.restart_at = time.time() + delay
+            if not self.stopping and delay:
+                print(f"[Prefork] Restarting {self._label(worker).lower()} in {delay:.1f}s")
+
+    def _stop(self, signum, frame) -> None:
+        self.stopping = True
+
+    def serve(self) -> None:
+        self.listener = socket.create_server((self.host, self.port), backlog=1024)
+        self.listener.setblocking(False)
+        self.preload()
+        # Workers find the inference process through the environment they inherit
+        os.environ[SOCKET_ENV] = self.socket_path
+        # Keep the preloaded objects out of GC passes, which would touch (and un-share) their pages
+        gc.freeze()
+
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        self.spawn(self.inference)
+
+        while not self.stopping:
+            if not self.listening and any(worker.ready for worker in self.workers):
+                self.selector.register(self.listener, selectors.EVENT_READ, self._accept)
+                self.listening = True
+                print(f"[Prefork] Listening on http://{self.host}:{self.port} with {len(self.workers)} workers")
+
+            for key, _ in self.selector.select(timeout=0.01 if self._waiting else 0.5):
+                key.data(key.fileobj)
+            self._dispatch_waiting()
+            self._reap()
+            if self.inference.pid is None and time.time() >= self.inference.restart_at:
+                self.spawn(self.inference)
+            for worker in self.workers:
+                if worker.pid is None and self.inference.ready and time.time() >= worker.restart_at:
+                    self.spawn(worker)
+
+        self.shutdown()
+
+    def shutdown(self) -> None:
+        print("[Prefork] Stopping workers...")
+        self.listener.close()
+        for conn, _ in self._waiting:
+            conn.close()
+        processes = self.workers + [self.inference]
+        for worker in processes:
+            if worker.pid is not None:
+                os.kill(worker.pid, signal.SIGTERM)
+
+        deadline = time.time() + self.SHUTDOWN_GRACE_SECONDS
+        while any(worker.pid is not None for worker in processes) and time.time() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for worker in processes:
+            if worker.pid is not None:
+                os.kill(worker.pid, signal.SIGKILL)
+        self._reap()
+        shutil.rmtree(self.socket_dir, ignore_errors=True)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__)
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('PREFORK_WORKERS', max(1, cpus // 4))))
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    print("\n🎙️  Faster Whisper Real-time Transcription Server (pre-fork)")
+    print("=" * 50)
+    Supervisor(args.host, args.port, args.workers).serve()
+    return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main(sys.argv[1:]) else 1)
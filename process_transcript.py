@@ -5,6 +5,32 @@ import json
 import sys
 from pathlib import Path
 from llm_service import llm_service
+from search_index import search_index
+from session_store import (
+    SEGMENTS_LOG, drop_compressed, get_session_status, iter_segments, open_session_file,
+    rewrite_segments, session_file, session_lock, write_transcription_files
+)
+
+def correct_segments(segments, corrections):
+    """Runs LLM correction over segments, recording the results in `corrections` by segment index"""
+    for i, segment in enumerate(segments):
+        print(f"  Segment {i+1}...", end=' ')
+
+        original_text = segment['transcription']
+        original_words = segment.get('words', [])
+
+        # Correct and align words
+        corrected_text, aligned_words = llm_service.correct_and_align(
+            original_text,
+            original_words
+        )
+
+        corrections[segment['index']] = {
+            'transcription_corrected': corrected_text,
+            'words_corrected': aligned_words
+        }
+
+        print(f"✓ ({len(corrected_text)} chars, {len(aligned_words)} words)")
 
 def process_session(session_id: str):
     """Process a session's transcript with LLM correction"""
@@ -12,12 +38,43 @@ def process_session(session_id: str):
     session_dir = Path('data/sessions') / session_id
     transcript_file = session_dir / 'transcription.json'
 
-    if not transcript_file.exists():
+    if session_file(session_dir, 'transcription.json') is None:
         print(f"Error: Transcript file not found at {transcript_file}")
         return False
 
+    if session_file(session_dir, SEGMENTS_LOG) is None:
+        return process_legacy_transcript(session_id, session_dir)
+
+    # The segment log is the source transcription.json is rebuilt from (word
+    # passes, re-decodes), so corrections are written into it
+    print(f"Loading segments from {session_dir / SEGMENTS_LOG}...")
+    corrections = {}
+    print("\nProcessing segments with LLM...")
+    correct_segments(iter_segments(session_dir), corrections)
+
+    def transform(segment):
+        if segment['index'] in corrections:
+            segment = {**segment, **corrections[segment['index']]}
+        return segment
+
+    print(f"\nSaving corrected segments and rebuilding {transcript_file}...")
+    with session_lock(session_dir):
+        rewrite_segments(session_dir, transform)
+        status = get_session_status(session_dir) or {}
+        write_transcription_files(session_dir, status.get('total_duration', 0))
+
+    print("Updating search index...")
+    search_index.index_session(session_id, iter_segments(session_dir))
+
+    print("✅ Done!")
+    return True
+
+def process_legacy_transcript(session_id: str, session_dir: Path):
+    """Sessions from before the segment log only have transcription.json"""
+    transcript_file = session_dir / 'transcription.json'
+
     print(f"Loading transcript from {transcript_file}...")
-    with open(transcript_file, 'r') as f:
+    with open_session_file(session_dir, 'transcription.json') as f:
         data = json.load(f)
 
     print(f"Original transcript length: {len(data['full_transcription'])} chars")
@@ -25,23 +82,10 @@ def process_session(session_id: str):
 
     # Process each segment
     print("\nProcessing segments with LLM...")
-    for i, segment in enumerate(data['segments']):
-        print(f"  Segment {i+1}/{len(data['segments'])}...", end=' ')
-
-        original_text = segment['transcription']
-        original_words = segment.get('words', [])
-
-        # Correct and align words
-        corrected_text, aligned_words = llm_service.correct_and_align(
-            original_text,
-            original_words
-        )
-
-        # Update segment with corrected data
-        segment['transcription_corrected'] = corrected_text
-        segment['words_corrected'] = aligned_words
-
-        print(f"✓ ({len(corrected_text)} chars, {len(aligned_words)} words)")
+    corrections = {}
+    correct_segments(data['segments'], corrections)
+    for segment in data['segments']:
+        segment.update(corrections[segment['index']])
 
     # Rebuild full corrected transcript from segments
     full_corrected = ' '.join(
@@ -54,8 +98,13 @@ def process_session(session_id: str):
 
     # Save updated transcript
     print(f"\nSaving corrected transcript to {transcript_file}...")
-    with open(transcript_file, 'w') as f:
-        json.dump(data, f, indent=2)
+    with session_lock(session_dir):
+        with open(transcript_file, 'w') as f:
+            json.dump(data, f, indent=2)
+        drop_compressed(session_dir, 'transcription.json')
+
+    print("Updating search index...")
+    search_index.index_session(session_id, data['segments'])
 
     print("✅ Done!")
     return True
@@ -12,14 +12,20 @@ show_help() {
     echo ""
     echo "Commands:"
     echo "  start                  - Setup and launch server"
+    echo "  serve [--workers N]    - Setup and launch the pre-fork multi-process server here"
     echo "  setup                  - Create venv and install dependencies only"
     echo "  stop                   - Stop server running on port 10000"
+    echo "  autotune               - Benchmark model/thread settings for this machine"
+    echo "  loadtest               - Find how many concurrent live streams the server sustains"
     echo "  help                   - Show this help message"
     echo ""
     echo "Examples:"
     echo "  ./run.sh start        # Setup and start server"
+    echo "  ./run.sh serve --workers 4  # Four web workers sharing one model process"
     echo "  ./run.sh setup        # Only setup dependencies"
     echo "  ./run.sh stop         # Stop the server"
+    echo "  ./run.sh autotune     # Write data/autotune_profile.json"
+    echo "  ./run.sh loadtest --spawn  # Load-test a local server instance"
     echo ""
 }
 
@@ -95,8 +101,8 @@ stop_server() {
     OTHER_PIDS=""
 
     for PID in $PIDS; do
-        # Check if it's a Python/server.py process
-        if ps -p $PID -o args= 2>/dev/null | grep -q "python.*server.py"; then
+        # Check if it's a Python/server.py (or prefork.py supervisor) process
+        if ps -p $PID -o args= 2>/dev/null | grep -q "python.*\(server\|prefork\).py"; then
             SERVER_PIDS="$SERVER_PIDS $PID"
         else
             OTHER_PIDS="$OTHER_PIDS $PID"
@@ -184,6 +190,10 @@ case "$COMMAND" in
         setup_environment
         start_server
         ;;
+    serve)
+        setup_environment
+        cd "$PROJECT_DIR" && python3 prefork.py "${@:2}"
+        ;;
     setup)
         setup_environment
         echo "✅ Setup complete! Run './run.sh start' to launch the server."
@@ -191,6 +201,14 @@ case "$COMMAND" in
     stop)
         stop_server
         ;;
+    autotune)
+        setup_environment
+        cd "$PROJECT_DIR" && python3 autotune.py "${@:2}"
+        ;;
+    loadtest)
+        setup_environment
+        cd "$PROJECT_DIR" && python3 loadtest.py "${@:2}"
+        ;;
     help|--help|-h)
         show_help
         ;;
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""Full-text search over session transcripts (SQLite FTS5)"""
+
+import re
+import sys
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from session_store import SEGMENTS_LOG, iter_segments, open_session_file, session_file
+
+DATA_DIR = Path(__file__).parent / "data"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    segment_index INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    start_time REAL NOT NULL,
+    end_time REAL NOT NULL,
+    text TEXT NOT NULL,
+    words TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS segments_key ON segments (session_id, segment_index, kind);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(
+    text, content='segments', content_rowid='id'
+);
+
+CREATE TRIGGER IF NOT EXISTS segments_ai AFTER INSERT ON segments BEGIN
+    INSERT INTO segments_fts(rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS segments_ad AFTER DELETE ON segments BEGIN
+    INSERT INTO segments_fts(segments_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+# Which transcript text and word list each indexed row comes from
+KINDS = {
+    'raw': ('transcription', 'words'),
+    'corrected': ('transcription_corrected', 'words_corrected')
+}
+
+
+def _normalize(word: str) -> str:
+    return re.sub(r'[^\w]', '', word.lower())
+
+
+class SearchIndex:
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self._write_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        if not self._initialized:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            self._initialized = True
+        return conn
+
+    def index_segment(self, session_id: str, segment: Dict) -> None:
+        """Add or replace the raw and corrected rows for one segment."""
+        rows = []
+        for kind, (text_key, words_key) in KINDS.items():
+            text = segment.get(text_key)
+            if not text:
+                continue
+            words = [
+                {'n': _normalize(w['word']), 's': w['start']}
+                for w in segment.get(words_key) or []
+            ]
+            rows.append((
+                session_id, segment['index'], kind,
+                segment.get('start_time', 0.0), segment.get('end_time', 0.0),
+                text, json.dumps(words)
+            ))
+
+        with self._write_lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute(
+                        'DELETE FROM segments WHERE session_id = ? AND segment_index = ?',
+                        (session_id, segment['index'])
+                    )
+                    conn.executemany(
+                        'INSERT INTO segments (session_id, segment_index, kind, start_time, end_time, text, words) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                        rows
+                    )
+            finally:
+                conn.close()
+
+    def index_session(self, session_id: str, segments) -> int:
+        count = 0
+        for segment in segments:
+            self.index_segment(session_id, segment)
+            count += 1
+        return count
+
+    def remove_session(self, session_id: str) -> None:
+        with self._write_lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute('DELETE FROM segments WHERE session_id = ?', (session_id,))
+            finally:
+                conn.close()
+
+    @staticmethod
+    def build_query(text: str) -> Optional[str]:
+        """Turn free text into an FTS5 query that matches all terms, last one as a prefix."""
+        terms = re.findall(r'\w+', text.lower())
+        if not terms:
+            return None
+        quoted = [f'"{term}"' for term in terms]
+        quoted[-1] += '*'
+        return ' '.join(quoted)
+
+    @staticmethod
+    def _first_hit_time(words_json: str, terms: List[str]) -> Optional[float]:
+        for word in json.loads(words_json):
+            if any(word['n'].startswith(term) for term in terms):
+                return word['s']
+        return None
+
+    def search(self, text: str, page: int = 1, per_page: int = 20, kind: Optional[str] = None) -> Dict:
+        query = self.build_query(text)
+        result = {'query': text, 'page': page, 'per_page': per_page, 'total': 0, 'results': []}
+        if query is None:
+            return result
+
+        terms = re.findall(r'\w+', text.lower())
+        where = 'segments_fts MATCH ?'
+        params: list = [query]
+        if kind in KINDS:
+            where += ' AND s.kind = ?'
+            params.append(kind)
+
+        conn = self._connect()
+        try:
+            result['total'] = conn.execute(
+                f'SELECT count(*) FROM segments_fts JOIN segments s ON s.id = segments_fts.rowid WHERE {where}',
+                params
+            ).fetchone()[0]
+
+            rows = conn.execute(
+                f"SELECT s.session_id, s.segment_index, s.kind, s.start_time, s.end_time, s.words, "
+                f"snippet(segments_fts, 0, '<mark>', '</mark>', '…', 12) AS snippet "
+                f"FROM segments_fts JOIN segments s ON s.id = segments_fts.rowid "
+                f"WHERE {where} ORDER BY rank LIMIT ? OFFSET ?",
+                params + [per_page, (page - 1) * per_page]
+            ).fetchall()
+        finally:
+            conn.close()
+
+        for row in rows:
+            word_start = self._first_hit_time(row['words'], terms)
+            result['results'].append({
+                'session_id': row['session_id'],
+                'segment_index': row['segment_index'],
+                'kind': row['kind'],
+                'snippet': row['snippet'],
+                'segment_start': row['start_time'],
+                'segment_end': row['end_time'],
+                # Word times are relative to the segment audio
+                'word_start': word_start,
+                'time': row['start_time'] + (word_start or 0.0)
+            })
+        return result
+
+    def rebuild(self, sessions_dir: Path) -> int:
+        """Re-index every session on disk."""
+        total = 0
+        for session_dir in sorted(sessions_dir.iterdir()):
+            if not session_dir.is_dir():
+                continue
+            segments = iter_segments(session_dir)
+            # Sessions from before the segment log only have transcription.json
+            if session_file(session_dir, SEGMENTS_LOG) is None and session_file(session_dir, 'transcription.json') is not None:
+                with open_session_file(session_dir, 'transcription.json') as f:
+                    segments = json.load(f).get('segments', [])
+            total += self.index_session(session_dir.name, segments)
+        return total
+
+
+search_index = SearchIndex(DATA_DIR / 'search.db')
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] not in ('rebuild', 'search'):
+        print("Usage: python3 search_index.py rebuild")
+        print("       python3 search_index.py search <query>")
+        sys.exit(1)
+
+    if sys.argv[1] == 'rebuild':
+        count = search_index.rebuild(DATA_DIR / 'sessions')
+        print(f"✅ Indexed {count} segments")
+    else:
+        for hit in search_index.search(' '.join(sys.argv[2:]))['results']:
+            print(f"{hit['session_id']} #{hit['segment_index']} @ {hit['time']:.2f}s [{hit['kind']}]: {hit['snippet']}")
@@ -2,14 +2,31 @@
 import os
 import json
 import time
-import uuid
+import queue
 import shutil
 import subprocess
 from pathlib import Path
 from flask import Flask, request, jsonify, send_from_directory, Response, stream_with_context, send_file
 from flask_cors import CORS
-from faster_whisper import WhisperModel
 from llm_service import llm_service
+from model_profile import load_profile
+from transcription_engine import decode_audio, load_engines
+from decode_budget import parse_budget
+from feature_cache import feature_cache_from_env
+from inference_service import SOCKET_ENV, remote_engines
+from live_batcher import LiveBatcher
+from live_refiner import LiveRefiner
+from prefork import new_session_id
+from search_index import search_index
+from waveform_peaks import PeakWriter, read_peaks
+from session_store import (
+    append_segment, count_segments, get_session_status, iter_segments,
+    open_session_file, session_file, update_session_status, write_transcription_files
+)
+from silence_gate import SilenceGate
+from storage_compactor import StorageCompactor, quota_from_env
+from upload_ingest import UploadError, UploadIngestor
+from word_timing_service import WordTimingService, extract_words
 
 app = Flask(__name__, static_folder='.')
 CORS(app)
@@ -20,13 +37,45 @@ if 'OMP_NUM_THREADS' not in os.environ:
     os.environ['OMP_NUM_THREADS'] = str(num_cores)
     print(f"Setting OMP_NUM_THREADS to {num_cores} (detected CPU cores)")
 
-print("Loading Whisper model...")
-model = WhisperModel("base", device="cpu", compute_type="int8")
-print("Model loaded successfully!")
+profile = load_profile()
+if 'path' in profile:
+    print(f"Using autotune profile {profile['path']}")
+    print(f"  live: {profile['live']}")
+    print(f"  file: {profile['file']}")
 
 SESSIONS_DIR = Path(__file__).parent / "data" / "sessions"
 SESSIONS_DIR.mkdir(parents=True, exist_ok=True)
 
+if os.environ.get(SOCKET_ENV):
+    # Pre-fork worker: the models live in the supervisor's inference process
+    engines = remote_engines(os.environ[SOCKET_ENV])
+else:
+    print("Loading Whisper model...")
+    engines = load_engines(profile, feature_cache_from_env(SESSIONS_DIR))
+live_engine = engines['live']
+file_engine = engines['file']
+print(f"Model loaded successfully! (engine: {file_engine.name})")
+
+storage_compactor = StorageCompactor(SESSIONS_DIR, quota_from_env())
+
+word_timing_service = WordTimingService(file_engine, SESSIONS_DIR, llm_service, search_index)
+
+live_refiner = None
+if engines['draft'] is not None:
+    print(f"Two-pass live mode: drafting with {profile['live_draft_model']}, refining with {profile['model']}")
+    live_refiner = LiveRefiner(live_engine)
+    live_engine = engines['draft']
+
+# Concurrent live windows are grouped into one batched call; 0 disables batching
+live_batch_window_ms = float(os.environ.get('LIVE_BATCH_WINDOW_MS', profile['live_batch_window_ms']))
+if live_batch_window_ms > 0:
+    print(f"Live micro-batching: {live_batch_window_ms:.0f}ms window, up to {profile['live_max_batch']} windows per batch")
+    live_engine = LiveBatcher(live_engine, live_batch_window_ms, profile['live_max_batch'], profile['live']['replicas'])
+
+# Live chunks without speech are answered before reaching the model; 0 disables the gate
+silence_gate_margin_db = float(os.environ.get('SILENCE_GATE_MARGIN_DB', 10))
+silence_gate = SilenceGate(silence_gate_margin_db) if silence_gate_margin_db > 0 else None
+
 def get_audio_duration(audio_path):
     cmd = [
         'ffprobe', '-v', 'error', '-show_entries', 'format=duration',
@@ -65,32 +114,88 @@ def split_audio_into_segments(audio_path, session_dir, segment_duration_seconds=
 
     return segments, total_duration
 
-def update_session_status(session_dir, status_data):
-    status_file = session_dir / 'status.json'
-    with open(status_file, 'w') as f:
-        json.dump(status_data, f, indent=2)
-
-def get_session_status(session_dir):
-    status_file = session_dir / 'status.json'
-    if not status_file.exists():
-        return None
-    with open(status_file, 'r') as f:
-        return json.load(f)
-
-def save_transcription_files(session_dir, segments_data, total_duration):
-    full_text = " ".join([seg['transcription'] for seg in segments_data]).strip()
-
-    txt_file = session_dir / 'transcription.txt'
-    with open(txt_file, 'w', encoding='utf-8') as f:
-        f.write(full_text)
-
-    json_file = session_dir / 'transcription.json'
-    with open(json_file, 'w', encoding='utf-8') as f:
-        json.dump({
-            'total_duration': total_duration,
-            'full_transcription': full_text,
-            'segments': segments_data
-        }, f, indent=2, ensure_ascii=False)
+def save_transcription_files(session_dir, total_duration):
+    write_transcription_files(session_dir, total_duration)
+
+def transcribe_session_segment(session_id, session_dir, segment_info, audio, word_timestamps_mode, language=None,
+                               budget=None):
+    """
+    Transcribes one segment of a file session from its PCM under the
+    request's decode budget overrides, runs LLM correction when word timings
+    were requested, and appends the result to the segment log and search
+    index. Returns (segment_result, language, transcription seconds).
+    """
+    idx = segment_info['index']
+    word_timestamps = word_timestamps_mode == 'true'
+    start_time = time.time()
+    segments, info = file_engine.transcribe(
+        audio, beam_size=1, vad_filter=True, word_timestamps=word_timestamps, budget=budget
+    )
+
+    segments = list(segments)
+    transcription_parts = [seg.text for seg in segments]
+    all_words = extract_words(segments) if word_timestamps else []
+
+    transcription_text = " ".join(transcription_parts).strip()
+    if language is None:
+        language = info.language
+    transcription_time = time.time() - start_time
+
+    segment_result = {
+        'index': idx,
+        'start_time': segment_info['start_time'],
+        'end_time': segment_info['end_time'],
+        'transcription': transcription_text,
+        'audio_url': f'/audio-segment/{session_id}/{idx}',
+        'language': language,
+        'words': all_words if all_words else []
+    }
+    if not all_words:
+        # Phrase times let a re-decode of part of the segment cut the stored text (see WordTimingService._splice)
+        segment_result['phrases'] = [
+            {'start': round(seg.start, 3), 'end': round(seg.end, 3), 'text': seg.text} for seg in segments
+        ]
+    if info.budget and info.budget['hits']:
+        segment_result['decode_budget'] = info.budget
+    if word_timestamps and all_words:
+        corrected_text, aligned_words = llm_service.correct_and_align(
+            transcription_text,
+            all_words
+        )
+        segment_result['transcription_corrected'] = corrected_text
+        segment_result['words_corrected'] = aligned_words
+    if word_timestamps_mode == 'lazy' and transcription_text:
+        segment_result['words_pending'] = True
+    append_segment(session_dir, segment_result)
+    try:
+        search_index.index_segment(session_id, segment_result)
+    except Exception as e:
+        print(f"Error indexing segment {idx}: {e}")
+
+    return segment_result, language, transcription_time
+
+def complete_file_session(session_id, session_dir, total_duration, total_segments, words_pending):
+    """Writes the transcription files and final status. Returns the 'complete' event."""
+    save_transcription_files(session_dir, total_duration)
+
+    update_session_status(session_dir, {
+        'status': 'complete',
+        'session_id': session_id,
+        'total_segments': total_segments,
+        'percent_complete': 100,
+        'total_duration': total_duration,
+        'words_pending': words_pending,
+        'completed_at': time.time()
+    })
+    if words_pending:
+        word_timing_service.enqueue(session_id)
+
+    return {'type': 'complete', 'session_id': session_id, 'total_duration': total_duration, 'total_segments': total_segments, 'session_url': f'/session/{session_id}'}
+
+upload_ingestor = UploadIngestor(
+    SESSIONS_DIR, transcribe_session_segment, complete_file_session, foreground=word_timing_service.foreground,
+    new_session_id=new_session_id
+)
 
 @app.route('/')
 def index():
@@ -102,8 +207,12 @@ def transcribe_file():
         return jsonify({'error': 'No audio file provided'}), 400
 
     audio_file = request.files['audio']
-    word_timestamps = request.form.get('word_timestamps', 'false').lower() == 'true'
-    session_id = str(uuid.uuid4())
+    word_timestamps_mode = request.form.get('word_timestamps', 'false').lower()
+    try:
+        budget = parse_budget(request.form.get('budget'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    session_id = new_session_id()
     session_dir = SESSIONS_DIR / session_id
     session_dir.mkdir(exist_ok=True)
 
@@ -112,6 +221,10 @@ def transcribe_file():
     temp_path = str(audio_path)
 
     def generate_progress():
+        with word_timing_service.foreground():
+            yield from process_file()
+
+    def process_file():
         try:
             print(f"Processing file for session {session_id}")
 
@@ -136,8 +249,10 @@ def transcribe_file():
                 'started_at': time.time()
             })
 
-            results = []
             avg_rtf = 0.25
+            language = None
+            words_pending = 0
+            peak_writer = PeakWriter(session_dir)
 
             for segment_info in audio_segments:
                 idx = segment_info['index']
@@ -161,61 +276,24 @@ def transcribe_file():
                 yield f"data: {json.dumps({'type': 'progress', 'segment': idx, 'total_segments': total_segments, 'percent': percent_complete, 'estimated_remaining': estimated_remaining})}\n\n"
 
                 print(f"Transcribing segment {idx}...")
-                start_time = time.time()
-                segments, info = model.transcribe(str(segment_path), beam_size=1, vad_filter=True, word_timestamps=word_timestamps)
-
-                transcription_parts = []
-                all_words = []
-                for seg in segments:
-                    transcription_parts.append(seg.text)
-                    if word_timestamps and hasattr(seg, 'words') and seg.words:
-                        for word in seg.words:
-                            all_words.append({
-                                'word': word.word,
-                                'start': word.start,
-                                'end': word.end,
-                                'probability': word.probability
-                            })
-
-                transcription_text = " ".join(transcription_parts).strip()
-                transcription_time = time.time() - start_time
+                audio = decode_audio(str(segment_path))
+                peak_writer.add(audio)
+                segment_result, language, transcription_time = transcribe_session_segment(
+                    session_id, session_dir, segment_info, audio, word_timestamps_mode, language, budget
+                )
+                transcription_text = segment_result['transcription']
+                if segment_result.get('words_pending'):
+                    words_pending += 1
+
                 rtf = transcription_time / segment_duration if segment_duration > 0 else 0
                 avg_rtf = (avg_rtf * idx + rtf) / (idx + 1)
-
                 print(f"[Performance] Segment {idx}: {segment_duration:.2f}s audio in {transcription_time:.2f}s (RTF: {rtf:.2f}x)")
 
-                segment_result = {
-                    'index': idx,
-                    'start_time': segment_info['start_time'],
-                    'end_time': segment_info['end_time'],
-                    'transcription': transcription_text,
-                    'audio_url': f'/audio-segment/{session_id}/{idx}',
-                    'language': info.language if idx == 0 else results[0]['language'],
-                    'words': all_words if all_words else []
-                }
-                if word_timestamps and all_words:
-                    corrected_text, aligned_words = llm_service.correct_and_align(
-                        transcription_text,
-                        all_words
-                    )
-                    segment_result['transcription_corrected'] = corrected_text
-                    segment_result['words_corrected'] = aligned_words
-                results.append(segment_result)
-
                 yield f"data: {json.dumps({'type': 'segment_complete', 'segment': idx, 'transcription': transcription_text, 'start_time': segment_info['start_time'], 'end_time': segment_info['end_time']})}\n\n"
 
-            save_transcription_files(session_dir, results, total_duration)
-
-            update_session_status(session_dir, {
-                'status': 'complete',
-                'session_id': session_id,
-                'total_segments': total_segments,
-                'percent_complete': 100,
-                'total_duration': total_duration,
-                'completed_at': time.time()
-            })
-
-            yield f"data: {json.dumps({'type': 'complete', 'session_id': session_id, 'total_duration': total_duration, 'segments': results})}\n\n"
+            peak_writer.close()
+            complete_event = complete_file_session(session_id, session_dir, total_duration, total_segments, words_pending)
+            yield f"data: {json.dumps(complete_event)}\n\n"
 
         except Exception as e:
             print(f"Error processing file: {e}")
@@ -227,13 +305,86 @@ def transcribe_file():
 
     return Response(stream_with_context(generate_progress()), mimetype='text/event-stream')
 
+@app.route('/upload', methods=['POST'])
+def create_upload():
+    data = request.get_json(silent=True) or request.form
+    word_timestamps_mode = str(data.get('word_timestamps', 'false')).lower()
+    try:
+        total_bytes = int(data['total_bytes']) if data.get('total_bytes') else None
+    except ValueError:
+        return jsonify({'error': 'total_bytes must be an integer'}), 400
+    try:
+        budget = parse_budget(data.get('budget'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    upload = upload_ingestor.create(word_timestamps_mode, total_bytes, budget)
+    print(f"[Upload] Started upload for session {upload.session_id}")
+    return jsonify({
+        'session_id': upload.session_id,
+        'upload_url': f'/upload/{upload.session_id}',
+        'events_url': f'/upload/{upload.session_id}/events'
+    }), 201
+
+@app.route('/upload/<session_id>', methods=['GET'])
+def get_upload(session_id):
+    upload = upload_ingestor.get(session_id)
+    if upload is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    return jsonify(upload.info())
+
+@app.route('/upload/<session_id>', methods=['PUT'])
+def append_upload(session_id):
+    try:
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return jsonify({'error': 'offset must be an integer'}), 400
+
+    try:
+        received = upload_ingestor.append(session_id, offset, request.get_data())
+    except UploadError as e:
+        return jsonify({'error': str(e), 'received': e.received}), e.status_code
+    return jsonify({'received': received})
+
+@app.route('/upload/<session_id>/complete', methods=['POST'])
+def complete_upload(session_id):
+    try:
+        upload = upload_ingestor.finish(session_id)
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    return jsonify(upload.info())
+
+@app.route('/upload/<session_id>/events')
+def upload_events(session_id):
+    upload = upload_ingestor.get(session_id)
+    if upload is None:
+        return jsonify({'error': 'Upload not found'}), 404
+
+    try:
+        since = int(request.headers.get('Last-Event-ID', request.args.get('since', -1))) + 1
+    except ValueError:
+        since = 0
+
+    def generate_events():
+        for event in upload_ingestor.events(upload, since):
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            yield f"id: {event['id']}\ndata: {json.dumps(event)}\n\n"
+
+    return Response(stream_with_context(generate_events()), mimetype='text/event-stream')
+
 @app.route('/audio-segment/<session_id>/<int:segment_index>')
 def serve_audio_segment(session_id, segment_index):
     segment_path = SESSIONS_DIR / session_id / f"segment_{segment_index}.mp3"
 
     if not segment_path.exists():
+        status = get_session_status(SESSIONS_DIR / session_id) if (SESSIONS_DIR / session_id).exists() else None
+        if status and status.get('audio_evicted'):
+            return jsonify({'error': 'Audio was removed to stay within the storage quota'}), 410
         return jsonify({'error': 'Segment not found'}), 404
 
+    storage_compactor.touch(session_id)
     return send_file(segment_path, mimetype='audio/mpeg')
 
 @app.route('/transcribe-status/<session_id>')
@@ -258,18 +409,19 @@ def download_transcription(session_id, format='txt'):
         return jsonify({'error': 'Session not found'}), 404
 
     if format == 'json':
-        file_path = session_dir / 'transcription.json'
+        file_name = 'transcription.json'
         mimetype = 'application/json'
         download_name = f'transcription_{session_id}.json'
     else:
-        file_path = session_dir / 'transcription.txt'
+        file_name = 'transcription.txt'
         mimetype = 'text/plain'
         download_name = f'transcription_{session_id}.txt'
 
-    if not file_path.exists():
+    if session_file(session_dir, file_name) is None:
         return jsonify({'error': 'Transcription not found. Processing may not be complete.'}), 404
 
-    return send_file(file_path, mimetype=mimetype, as_attachment=True, download_name=download_name)
+    storage_compactor.touch(session_id)
+    return send_file(open_session_file(session_dir, file_name, 'rb'), mimetype=mimetype, as_attachment=True, download_name=download_name)
 
 @app.route('/sessions')
 def list_sessions():
@@ -310,17 +462,137 @@ def get_session(session_id):
     if not session_dir.exists():
         return jsonify({'error': 'Session not found'}), 404
 
-    transcription_file = session_dir / 'transcription.json'
-    if not transcription_file.exists():
-        return jsonify({'error': 'Transcription not found'}), 404
+    storage_compactor.touch(session_id)
+
+    if session_file(session_dir, 'transcription.json') is None:
+        if count_segments(session_dir) == 0:
+            return jsonify({'error': 'Transcription not found'}), 404
+
+        status = get_session_status(session_dir) or {}
+        return jsonify({
+            'status': status.get('status', 'processing'),
+            'total_duration': status.get('total_duration', 0),
+            'segments': list(iter_segments(session_dir))
+        })
 
     try:
-        with open(transcription_file, 'r') as f:
+        with open_session_file(session_dir, 'transcription.json') as f:
             data = json.load(f)
         return jsonify(data)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/session/<session_id>/words/<int:segment_index>')
+def get_segment_words(session_id, segment_index):
+    session_dir = SESSIONS_DIR / session_id
+
+    if not session_dir.exists():
+        return jsonify({'error': 'Session not found'}), 404
+
+    storage_compactor.touch(session_id)
+
+    try:
+        segment = word_timing_service.ensure_words(session_id, segment_index)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    if segment is None:
+        return jsonify({'error': 'Segment not found'}), 404
+
+    return jsonify(segment)
+
+@app.route('/session/<session_id>/words/<int:segment_index>/stream')
+def stream_segment_words(session_id, segment_index):
+    """Same as /words/<n>, streamed: corrected words arrive while the LLM is still generating."""
+    session_dir = SESSIONS_DIR / session_id
+
+    if not session_dir.exists():
+        return jsonify({'error': 'Session not found'}), 404
+
+    storage_compactor.touch(session_id)
+
+    def generate_events():
+        try:
+            for event in word_timing_service.stream_words(session_id, segment_index):
+                yield f"data: {json.dumps(event)}\n\n"
+        except Exception as e:
+            yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+
+    return Response(stream_with_context(generate_events()), mimetype='text/event-stream')
+
+@app.route('/session/<session_id>/retranscribe', methods=['POST'])
+def retranscribe_session_range(session_id):
+    session_dir = SESSIONS_DIR / session_id
+
+    if not session_dir.exists():
+        return jsonify({'error': 'Session not found'}), 404
+
+    status = get_session_status(session_dir) or {}
+    if status.get('status') != 'complete':
+        return jsonify({'error': 'Session is still being transcribed'}), 409
+    if status.get('audio_evicted'):
+        return jsonify({'error': 'Audio was removed to stay within the storage quota'}), 410
+
+    data = request.get_json(silent=True) or request.form
+    try:
+        start = float(data['start'])
+        end = float(data['end'])
+        beam_size = int(data.get('beam_size', 5))
+        temperature = float(data.get('temperature', 0.0))
+    except (KeyError, ValueError):
+        return jsonify({'error': 'start and end (seconds) are required; beam_size and temperature must be numbers'}), 400
+    if not 0 <= start < end:
+        return jsonify({'error': 'start must be before end'}), 400
+    try:
+        budget = parse_budget(data.get('budget'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    options = {
+        'beam_size': beam_size,
+        'temperature': temperature,
+        'vad_filter': str(data.get('vad_filter', 'true')).lower() == 'true',
+        'language': data.get('language') or None,
+        'initial_prompt': data.get('initial_prompt') or None,
+        'budget': budget
+    }
+
+    storage_compactor.touch(session_id)
+    try:
+        with word_timing_service.foreground():
+            segments = word_timing_service.retranscribe_range(session_id, start, end, options)
+    except Exception as e:
+        print(f"Error re-transcribing {session_id} [{start:.2f}, {end:.2f}): {e}")
+        return jsonify({'error': str(e)}), 500
+
+    if not segments:
+        return jsonify({'error': 'No segments in that range'}), 404
+
+    return jsonify({'session_id': session_id, 'start': start, 'end': end, 'segments': segments})
+
+@app.route('/session/<session_id>/peaks')
+def get_session_peaks(session_id):
+    session_dir = SESSIONS_DIR / session_id
+
+    if not session_dir.exists():
+        return jsonify({'error': 'Session not found'}), 404
+
+    try:
+        start = float(request.args.get('from', 0))
+        end = float(request.args['to']) if 'to' in request.args else None
+        resolution = float(request.args.get('resolution', 100))
+    except ValueError:
+        return jsonify({'error': 'from, to and resolution must be numbers'}), 400
+
+    try:
+        peaks = read_peaks(session_dir, start, end, resolution)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if peaks is None:
+        return jsonify({'error': 'Waveform data not found'}), 404
+
+    return jsonify(peaks)
+
 @app.route('/session/<session_id>', methods=['DELETE'])
 def delete_session(session_id):
     session_dir = SESSIONS_DIR / session_id
@@ -330,10 +602,29 @@ def delete_session(session_id):
 
     try:
         shutil.rmtree(session_dir)
+        search_index.remove_session(session_id)
+        storage_compactor.forget(session_id)
         return jsonify({'success': True, 'message': 'Session deleted'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/search')
+def search_transcripts():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'No search query provided'}), 400
+
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+        per_page = min(100, max(1, int(request.args.get('per_page', 20))))
+    except ValueError:
+        return jsonify({'error': 'page and per_page must be integers'}), 400
+
+    try:
+        return jsonify(search_index.search(query, page=page, per_page=per_page, kind=request.args.get('kind')))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/transcribe', methods=['POST'])
 def transcribe():
     if 'audio' not in request.files:
@@ -341,7 +632,7 @@ def transcribe():
 
     audio_file = request.files['audio']
 
-    session_id = str(uuid.uuid4())
+    session_id = new_session_id()
     session_dir = SESSIONS_DIR / session_id
     session_dir.mkdir(exist_ok=True)
 
@@ -352,7 +643,7 @@ def transcribe():
     def generate_segments():
         try:
             start_time = time.time()
-            segments, info = model.transcribe(temp_path, beam_size=1, vad_filter=True)
+            segments, info = file_engine.transcribe(temp_path, beam_size=1, vad_filter=True)
 
             yield f"data: {json.dumps({'type': 'metadata', 'language': info.language, 'duration': info.duration})}\n\n"
 
@@ -390,20 +681,38 @@ def transcribe_live():
     print(f"[Server] Chunk {chunk_index} size: {chunk_size} bytes, saved to {temp_path}")
 
     def generate_segments():
+        with word_timing_service.foreground():
+            yield from transcribe_chunk()
+
+    def transcribe_chunk():
         try:
             start_time = time.time()
+            audio = decode_audio(temp_path)
+
+            gate = silence_gate.check(session_id, audio) if silence_gate is not None else None
+            if gate is not None and not gate['speech']:
+                print(f"[Gate] Chunk {chunk_index} skipped: peak {gate['level_db']}dB, floor {gate['floor_db']}dB "
+                      f"({gate['skipped']}/{gate['chunks']} skipped in session, {time.time() - start_time:.3f}s)")
+                yield f"data: {json.dumps({'type': 'chunk_complete', 'chunk_index': chunk_index, 'skipped': True, 'gate': gate})}\n\n"
+                return
+
             print(f"[Server] Starting transcription for chunk {chunk_index}...")
-            segments, info = model.transcribe(temp_path, beam_size=1, vad_filter=True)
+            segments, info = live_engine.transcribe(audio, beam_size=1, vad_filter=True, budget={'interactive': True})
 
             if int(chunk_index) == 0:
                 print(f"[Server] Chunk {chunk_index} metadata: language={info.language}")
-                yield f"data: {json.dumps({'type': 'metadata', 'language': info.language})}\n\n"
+                yield f"data: {json.dumps({'type': 'metadata', 'language': info.language, 'two_pass': live_refiner is not None})}\n\n"
 
             segment_count = 0
+            drafts = []
             for segment in segments:
                 segment_count += 1
                 print(f"[Server] Chunk {chunk_index} segment {segment_count}: '{segment.text}'")
-                yield f"data: {json.dumps({'type': 'segment', 'start': segment.start, 'end': segment.end, 'text': segment.text})}\n\n"
+                drafts.append({'start': segment.start, 'end': segment.end, 'text': segment.text})
+                yield f"data: {json.dumps({'type': 'segment', 'chunk_index': int(chunk_index), 'start': segment.start, 'end': segment.end, 'text': segment.text})}\n\n"
+
+            if live_refiner is not None:
+                live_refiner.submit(session_id, int(chunk_index), temp_path, drafts, info.language)
 
             transcription_time = time.time() - start_time
             audio_duration = info.duration if hasattr(info, 'duration') else 3.0
@@ -411,7 +720,12 @@ def transcribe_live():
             print(f"[Performance] Chunk {chunk_index}: {audio_duration:.2f}s audio in {transcription_time:.2f}s (RTF: {rtf:.2f}x, {segment_count} segments)")
 
             print(f"[Server] Chunk {chunk_index} complete ({segment_count} segments)")
-            yield f"data: {json.dumps({'type': 'chunk_complete', 'chunk_index': chunk_index})}\n\n"
+            complete_event = {'type': 'chunk_complete', 'chunk_index': chunk_index}
+            if info.budget and info.budget['hits']:
+                complete_event['decode_budget'] = info.budget
+            if gate is not None:
+                complete_event['gate'] = gate
+            yield f"data: {json.dumps(complete_event)}\n\n"
 
         except Exception as e:
             print(f"[Server] Error transcribing chunk {chunk_index}: {e}")
@@ -419,9 +733,39 @@ def transcribe_live():
 
     return Response(stream_with_context(generate_segments()), mimetype='text/event-stream')
 
+@app.route('/live-events/<session_id>')
+def live_events(session_id):
+    if live_refiner is None:
+        return jsonify({'error': 'Two-pass live mode is not enabled'}), 404
+
+    events = live_refiner.subscribe(session_id)
+
+    def generate_events():
+        try:
+            while True:
+                try:
+                    event = events.get(timeout=15)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {json.dumps(event)}\n\n"
+        finally:
+            live_refiner.unsubscribe(session_id)
+
+    return Response(stream_with_context(generate_events()), mimetype='text/event-stream')
+
+def start_background_services(owns=None, compact_storage=True):
+    """Starts the background threads; prefork.py workers each start their own share."""
+    word_timing_service.start_background_fill(owns)
+    if compact_storage:
+        storage_compactor.start()
+    if live_refiner is not None:
+        live_refiner.start()
+
 if __name__ == '__main__':
     print("\n🎙️  Faster Whisper Real-time Transcription Server")
     print("=" * 50)
     print("Server starting on http://localhost:10000")
     print("Open your browser and start speaking!\n")
+    start_background_services()
     app.run(debug=True, host='0.0.0.0', port=10000, use_reloader=False)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""Append-only segment storage for transcription sessions"""
+
+import os
+import gzip
+import json
+import fcntl
+import shutil
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+SEGMENTS_LOG = 'segments.jsonl'
+COMPRESSED_SUFFIX = '.gz'
+LOCK_FILE = '.lock'
+
+
+@contextmanager
+def session_lock(session_dir: Path):
+    """
+    Holds the session's exclusive file lock. Everything that rewrites or
+    compresses a finished session's files takes it, across threads and
+    across processes (pre-fork workers, process_transcript.py). Not reentrant.
+    """
+    with open(session_dir / LOCK_FILE, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def session_file(session_dir: Path, name: str) -> Optional[Path]:
+    """Path of a session file, whether stored plain or compressed."""
+    for path in (session_dir / name, session_dir / (name + COMPRESSED_SUFFIX)):
+        if path.exists():
+            return path
+    return None
+
+
+def open_session_file(session_dir: Path, name: str, mode: str = 'r'):
+    """Opens a session file for reading, transparently decompressing cold files."""
+    path = session_file(session_dir, name)
+    if path is None:
+        raise FileNotFoundError(session_dir / name)
+    if path.suffix == COMPRESSED_SUFFIX:
+        return gzip.open(path, 'rt' if mode == 'r' else 'rb', encoding='utf-8' if mode == 'r' else None)
+    if mode == 'r':
+        return open(path, 'r', encoding='utf-8')
+    return open(path, mode)
+
+
+def compress_session_file(session_dir: Path, name: str) -> int:
+    """
+    Gzips a session file in place and returns the bytes saved. Call with
+    session_lock() held, or a concurrent rewrite may be unlinked.
+    """
+    path = session_dir / name
+    if not path.exists():
+        return 0
+
+    compressed = session_dir / (name + COMPRESSED_SUFFIX)
+    tmp_file = session_dir / (name + COMPRESSED_SUFFIX + '.tmp')
+    with open(path, 'rb') as src, gzip.open(tmp_file, 'wb', compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst)
+
+    saved = path.stat().st_size - tmp_file.stat().st_size
+    tmp_file.replace(compressed)
+    path.unlink()
+    return saved
+
+
+def drop_compressed(session_dir: Path, name: str) -> None:
+    """Removes the compressed copy after a plain file has been rewritten."""
+    compressed = session_dir / (name + COMPRESSED_SUFFIX)
+    if compressed.exists():
+        os.unlink(compressed)
+
+
+def update_session_status(session_dir: Path, status_data: Dict) -> None:
+    status_file = session_dir / 'status.json'
+    with open(status_file, 'w') as f:
+        json.dump(status_data, f, indent=2)
+
+
+def get_session_status(session_dir: Path) -> Optional[Dict]:
+    status_file = session_dir / 'status.json'
+    if not status_file.exists():
+        return None
+    with open(status_file, 'r') as f:
+        return json.load(f)
+
+
+def append_segment(session_dir: Path, segment_result: Dict) -> None:
+    """Append one finished segment to the session's JSONL log."""
+    with open(session_dir / SEGMENTS_LOG, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(segment_result, ensure_ascii=False))
+        f.write('\n')
+
+
+def iter_segments(session_dir: Path) -> Iterator[Dict]:
+    """Yield segments from the JSONL log one at a time, in write order."""
+    if session_file(session_dir, SEGMENTS_LOG) is None:
+        return
+
+    with open_session_file(session_dir, SEGMENTS_LOG) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def count_segments(session_dir: Path) -> int:
+    """Number of segments written so far."""
+    if session_file(session_dir, SEGMENTS_LOG) is None:
+        return 0
+
+    with open_session_file(session_dir, SEGMENTS_LOG, 'rb') as f:
+        return sum(1 for line in f if line.strip())
+
+
+def rewrite_segments(session_dir: Path, transform: Callable[[Dict], Dict]) -> None:
+    """
+    Rewrites the segment log through transform(), one segment at a time.
+    The new log replaces the old one atomically.
+    """
+    log_file = session_dir / SEGMENTS_LOG
+    tmp_file = log_file.with_suffix('.jsonl.tmp')
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        for segment in iter_segments(session_dir):
+            f.write(json.dumps(transform(segment), ensure_ascii=False))
+            f.write('\n')
+
+    tmp_file.replace(log_file)
+    drop_compressed(session_dir, SEGMENTS_LOG)
+
+
+def iter_full_text(texts: Iterable[str]) -> Iterator[str]:
+    """
+    Streaming equivalent of " ".join(texts).strip().
+    Yields pieces that concatenate to the joined, stripped text.
+    """
+    started = False
+    pending = ''
+
+    for text in texts:
+        piece = pending + (' ' if started else '') + text
+        if not started:
+            piece = piece.lstrip()
+
+        content = piece.rstrip()
+        if content:
+            yield content
+            started = True
+            pending = piece[len(content):]
+        else:
+            pending = piece if started else ''
+
+
+def write_transcription_files(session_dir: Path, total_duration: float) -> None:
+    """
+    Builds transcription.txt and transcription.json from the segment log.
+
+    Only one segment is held in memory at a time, so the cost is flat in
+    the length of the recording. The JSON layout matches what
+    json.dump(..., indent=2) produced for the in-memory results list, plus
+    full_transcription_corrected after the segments when any segment has
+    an LLM-corrected transcription.
+    """
+    txt_file = session_dir / 'transcription.txt'
+    with open(txt_file, 'w', encoding='utf-8') as f:
+        for piece in iter_full_text(seg['transcription'] for seg in iter_segments(session_dir)):
+            f.write(piece)
+
+    json_file = session_dir / 'transcription.json'
+    tmp_file = json_file.with_suffix('.json.tmp')
+    corrected = False
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        f.write('{\n')
+        f.write(f'  "total_duration": {json.dumps(total_duration)},\n')
+
+        f.write('  "full_transcription": "')
+        with open(txt_file, 'r', encoding='utf-8') as txt:
+            while True:
+                chunk = txt.read(65536)
+                if not chunk:
+                    break
+                f.write(json.dumps(chunk, ensure_ascii=False)[1:-1])
+        f.write('",\n')
+
+        f.write('  "segments": [')
+        first = True
+        for segment in iter_segments(session_dir):
+            f.write('\n' if first else ',\n')
+            first = False
+            corrected = corrected or 'transcription_corrected' in segment
+            body = json.dumps(segment, indent=2, ensure_ascii=False)
+            f.write('\n'.join('    ' + line for line in body.split('\n')))
+        f.write('\n  ]' if not first else ']')
+
+        if corrected:
+            f.write(',\n  "full_transcription_corrected": "')
+            texts = (seg.get('transcription_corrected', seg['transcription']) for seg in iter_segments(session_dir))
+            for piece in iter_full_text(texts):
+                f.write(json.dumps(piece, ensure_ascii=False)[1:-1])
+            f.write('"')
+        f.write('\n}')
+
+    tmp_file.replace(json_file)
+    drop_compressed(session_dir, 'transcription.txt')
+    drop_compressed(session_dir, 'transcription.json')
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Cheap energy/spectral silence gate in front of live inference"""
+
+import time
+import threading
+from typing import Dict
+
+import numpy as np
+
+from transcription_engine import SAMPLE_RATE
+
+# Voice pitch up to the main formants; mains hum sits below it
+SPEECH_BAND_HZ = (80, 4000)
+
+
+class SilenceGate:
+    """
+    Decides from the decoded PCM of a live chunk whether it can contain speech.
+
+    The chunk is cut into short frames. A frame is voiced when its level is
+    margin_db above the session's noise floor, enough of its energy lies in
+    the speech band and its spectrum is harmonic rather than flat like hiss
+    (spectral flatness at most max_flatness); a chunk with fewer than
+    min_voiced_ms of voiced frames, or whose level is steady (spread under
+    stationary_db, like a fan or a machine drone), is skipped without
+    running the model. Each session keeps its own noise floor, estimated
+    from the quietest frames of a chunk: it follows a quieter room quickly
+    and a louder one slowly. Chunks with speech can only lower it; steady
+    sound raises it even when it looks voiced. A session whose first chunk
+    holds speech starts at absolute_floor_db. The first chunk of a session
+    and the chunk after speech (trailing soft words) always pass.
+    """
+
+    FRAME_MS = 30
+    SESSION_TTL_SECONDS = 3600
+
+    def __init__(self, margin_db: float = 10.0, min_voiced_ms: float = 150.0, band_ratio: float = 0.5,
+                 max_flatness: float = 0.4, stationary_db: float = 4.0,
+                 absolute_floor_db: float = -70.0, max_floor_db: float = -35.0,
+                 fall_rate: float = 0.5, rise_rate: float = 0.2):
+        self.margin_db = margin_db
+        self.min_voiced_frames = max(1, int(min_voiced_ms / self.FRAME_MS))
+        self.band_ratio = band_ratio
+        self.max_flatness = max_flatness
+        self.stationary_db = stationary_db
+        self.absolute_floor_db = absolute_floor_db
+        self.max_floor_db = max_floor_db
+        self.fall_rate = fall_rate
+        self.rise_rate = rise_rate
+
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, Dict] = {}
+        self.stats = {'chunks': 0, 'skipped': 0}
+
+    def _frames(self, audio: np.ndarray) -> np.ndarray:
+        frame = SAMPLE_RATE * self.FRAME_MS // 1000
+        count = len(audio) // frame
+        return audio[:count * frame].reshape(count, frame)
+
+    def _voiced(self, frames: np.ndarray) -> np.ndarray:
+        spectrum = np.abs(np.fft.rfft(frames * np.hanning(frames.shape[1]), axis=1)) ** 2 + 1e-12
+        freqs = np.fft.rfftfreq(frames.shape[1], 1.0 / SAMPLE_RATE)
+        band = (freqs >= SPEECH_BAND_HZ[0]) & (freqs <= SPEECH_BAND_HZ[1])
+        total = spectrum.sum(axis=1)
+        in_band = spectrum[:, band].sum(axis=1) / total
+        flatness = np.exp(np.mean(np.log(spectrum), axis=1)) / (total / spectrum.shape[1])
+        return (in_band >= self.band_ratio) & (flatness <= self.max_flatness)
+
+    def check(self, session_id: str, audio: np.ndarray) -> Dict:
+        """
+        Returns {'speech': bool, 'level_db', 'floor_db', 'voiced_ms',
+        'skipped': chunks skipped so far in this session, 'chunks'}.
+        """
+        frames = self._frames(np.asarray(audio, dtype=np.float32))
+        if len(frames):
+            rms = np.sqrt(np.mean(frames ** 2, axis=1))
+            levels = 20 * np.log10(np.maximum(rms, 1e-7))
+            quiet_db = float(np.percentile(levels, 20))
+            stationary = float(np.percentile(levels, 90) - np.percentile(levels, 10)) < self.stationary_db
+        else:
+            levels = np.empty(0)
+            quiet_db = self.absolute_floor_db
+            stationary = True
+
+        now = time.time()
+        with self._lock:
+            for stale_id, stale in list(self._sessions.items()):
+                if now - stale['seen'] > self.SESSION_TTL_SECONDS:
+                    del self._sessions[stale_id]
+
+            state = self._sessions.get(session_id)
+            first = state is None
+            # A new session is judged against the lowest floor until its room is known
+            floor_db = self.absolute_floor_db if first else state['floor_db']
+
+        # Only loud frames pay for the FFT
+        loud = levels > floor_db + self.margin_db
+        voiced = 0
+        if loud.any():
+            voiced = int(self._voiced(frames[loud]).sum())
+        has_speech = voiced >= self.min_voiced_frames and not stationary
+
+        with self._lock:
+            if first:
+                seed_db = self.absolute_floor_db if has_speech else quiet_db
+                state = {'floor_db': min(max(seed_db, self.absolute_floor_db), self.max_floor_db),
+                         'chunks': 0, 'skipped': 0, 'hangover': False, 'seen': now}
+                self._sessions[session_id] = state
+            elif quiet_db < state['floor_db'] or not has_speech:
+                # The quiet frames of a speech chunk may still be speech, so they never raise the floor
+                rate = self.fall_rate if quiet_db < state['floor_db'] else self.rise_rate
+                state['floor_db'] = min(max(state['floor_db'] + rate * (quiet_db - state['floor_db']),
+                                            self.absolute_floor_db), self.max_floor_db)
+            speech = first or state['hangover'] or has_speech
+            state['hangover'] = has_speech
+            state['chunks'] += 1
+            state['seen'] = now
+            self.stats['chunks'] += 1
+            if not speech:
+                state['skipped'] += 1
+                self.stats['skipped'] += 1
+
+            return {
+                'speech': speech,
+                'level_db': round(float(levels.max()) if len(levels) else self.absolute_floor_db, 1),
+                'floor_db': round(floor_db, 1),
+                'voiced_ms': voiced * self.FRAME_MS,
+                'skipped': state['skipped'],
+                'chunks': state['chunks']
+            }
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+import os
+import json
+import time
+import sqlite3
+import subprocess
+import threading
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from session_store import compress_session_file, get_session_status, session_lock, update_session_status
+
+LIVE_ARCHIVE = 'live_audio.ogg'
+
+# Files that can be evicted under quota pressure; transcripts are always kept
+AUDIO_PATTERNS = ('segment_*.mp3', 'chunk_*.webm', 'original_audio.webm', LIVE_ARCHIVE)
+
+
+class StorageCompactor:
+    """
+    Background maintenance for data/sessions.
+
+    - Idle live sessions: chunk_N.webm files are merged into one Opus archive.
+    - Complete file sessions: original_audio.webm is dropped once every
+      segment_N.mp3 exists, since the segments cover the same audio.
+    - Cold sessions: transcripts and the segment log are gzipped.
+    - Quota: when the sessions directory is over quota, audio from the least
+      recently accessed sessions is evicted; transcripts are kept.
+
+    Reads are recorded in storage_access.db (SQLite), which every server
+    process writes to, so one compactor sees the sessions viewed through
+    all pre-fork workers; touches of a session are written at most once
+    per TOUCH_RESOLUTION_SECONDS per process. Per-session sizes are cached
+    in storage_index.json and only rescanned
+    when a session directory changes. Complete sessions with nothing left to
+    do are marked settled and skipped without a stat or status read until
+    they are accessed again or RESCAN_SECONDS pass, so each pass stays cheap
+    on hosts with many sessions.
+    """
+
+    LIVE_IDLE_SECONDS = 10 * 60
+    COLD_SECONDS = 7 * 24 * 3600
+    RESCAN_SECONDS = 3600
+    TOUCH_RESOLUTION_SECONDS = 60
+
+    def __init__(self, sessions_dir: Path, quota_bytes: Optional[int] = None, interval: float = 300.0):
+        self.sessions_dir = sessions_dir
+        self.quota_bytes = quota_bytes
+        self.interval = interval
+        self.index_path = sessions_dir.parent / 'storage_index.json'
+        self.access_path = sessions_dir.parent / 'storage_access.db'
+
+        self._lock = threading.Lock()
+        self._index: Dict[str, Dict] = self._load_index()
+        self._worker: Optional[threading.Thread] = None
+        # When this process last recorded each session's access
+        self._touched: Dict[str, float] = {}
+        self._accesses_merged = 0.0
+        self._access_initialized = False
+
+    def _access_db(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.access_path), timeout=30)
+        if not self._access_initialized:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS access (session_id TEXT PRIMARY KEY, last_accessed REAL NOT NULL)')
+            self._access_initialized = True
+        return conn
+
+    def _load_index(self) -> Dict[str, Dict]:
+        if not self.index_path.exists():
+            return {}
+        try:
+            with open(self.index_path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"[Storage] Could not read {self.index_path}: {e}")
+            return {}
+
+    def _save_index(self) -> None:
+        tmp_file = self.index_path.with_suffix('.json.tmp')
+        with self._lock:
+            data = json.dumps(self._index)
+        with open(tmp_file, 'w') as f:
+            f.write(data)
+        tmp_file.replace(self.index_path)
+
+    def touch(self, session_id: str) -> None:
+        """Record that a session was read, for LRU eviction and cold detection."""
+        now = time.time()
+        with self._lock:
+            entry = self._index.setdefault(session_id, {})
+            entry['last_accessed'] = now
+            # Reads often come before writes (word timings, re-decodes); look again next pass
+            entry.pop('settled', None)
+            if now - self._touched.get(session_id, 0) < self.TOUCH_RESOLUTION_SECONDS:
+                return
+            self._touched = {k: v for k, v in self._touched.items() if now - v < self.TOUCH_RESOLUTION_SECONDS}
+            self._touched[session_id] = now
+
+        try:
+            with closing(self._access_db()) as conn, conn:
+                conn.execute(
+                    'INSERT INTO access (session_id, last_accessed) VALUES (?, ?) '
+                    'ON CONFLICT(session_id) DO UPDATE SET last_accessed = MAX(last_accessed, excluded.last_accessed)',
+                    (session_id, now)
+                )
+        except sqlite3.Error as e:
+            print(f"[Storage] Could not record access to {session_id}: {e}")
+
+    def forget(self, session_id: str) -> None:
+        with self._lock:
+            self._index.pop(session_id, None)
+            self._touched.pop(session_id, None)
+        self._forget_accesses([session_id])
+
+    def _forget_accesses(self, session_ids: List[str]) -> None:
+        if not session_ids:
+            return
+        try:
+            with closing(self._access_db()) as conn, conn:
+                conn.executemany('DELETE FROM access WHERE session_id = ?', [(s,) for s in session_ids])
+        except sqlite3.Error as e:
+            print(f"[Storage] Could not drop access records: {e}")
+
+    def _merge_accesses(self) -> None:
+        """Takes in the reads other processes recorded since the last pass."""
+        # A touch stamped just before the last merge may have been committed after it
+        since = self._accesses_merged - self.TOUCH_RESOLUTION_SECONDS
+        try:
+            with closing(self._access_db()) as conn:
+                rows = conn.execute('SELECT session_id, last_accessed FROM access WHERE last_accessed > ?',
+                                    (since,)).fetchall()
+        except sqlite3.Error as e:
+            print(f"[Storage] Could not read access records: {e}")
+            return
+
+        with self._lock:
+            for session_id, last_accessed in rows:
+                entry = self._index.setdefault(session_id, {})
+                if last_accessed > entry.get('last_accessed', 0):
+                    entry['last_accessed'] = last_accessed
+                    entry.pop('settled', None)
+                self._accesses_merged = max(self._accesses_merged, last_accessed)
+
+    def _scan(self, session_dir: Path) -> Dict:
+        """Refresh the cached size of one session if its directory changed."""
+        stat = session_dir.stat()
+        with self._lock:
+            entry = self._index.setdefault(session_dir.name, {})
+            fresh = (entry.get('dir_mtime') == stat.st_mtime_ns
+                     and time.time() - entry.get('scanned_at', 0) < self.RESCAN_SECONDS)
+        if fresh:
+            return entry
+
+        total = 0
+        audio = 0
+        newest = 0.0
+        for path in session_dir.iterdir():
+            if not path.is_file():
+                continue
+            file_stat = path.stat()
+            total += file_stat.st_size
+            newest = max(newest, file_stat.st_mtime)
+            if any(path.match(pattern) for pattern in AUDIO_PATTERNS):
+                audio += file_stat.st_size
+
+        with self._lock:
+            entry.update({
+                'dir_mtime': stat.st_mtime_ns,
+                'scanned_at': time.time(),
+                'bytes': total,
+                'audio_bytes': audio,
+                'modified_at': newest
+            })
+            entry.setdefault('last_accessed', newest or stat.st_ctime)
+        return entry
+
+    def _rescan(self, session_dir: Path) -> Dict:
+        with self._lock:
+            self._index.get(session_dir.name, {}).pop('dir_mtime', None)
+        return self._scan(session_dir)
+
+    def merge_live_chunks(self, session_dir: Path) -> int:
+        """
+        Re-encodes an idle live session's chunks into one Opus file. A session
+        that was resumed after an earlier merge has its existing archive put
+        first, so the new chunks are appended to it rather than replacing it.
+        """
+        chunks = sorted(session_dir.glob('chunk_*.webm'), key=lambda p: int(p.stem.split('_')[1]))
+        if not chunks:
+            return 0
+
+        archive = session_dir / LIVE_ARCHIVE
+        inputs = ([archive] if archive.exists() else []) + chunks
+        list_file = session_dir / 'chunks.txt'
+        with open(list_file, 'w') as f:
+            for path in inputs:
+                f.write(f"file '{path.name}'\n")
+
+        # Written aside so a failed merge leaves the earlier archive in place
+        merged_file = session_dir / ('merging_' + LIVE_ARCHIVE)
+        cmd = [
+            'ffmpeg', '-f', 'concat', '-safe', '0', '-i', str(list_file),
+            '-ac', '1', '-ar', '16000', '-c:a', 'libopus', '-b:a', '24k', '-y',
+            str(merged_file)
+        ]
+        try:
+            result = subprocess.run(cmd, capture_output=True)
+            merged = result.returncode == 0 and merged_file.exists()
+        except OSError:
+            merged = False
+        finally:
+            list_file.unlink()
+
+        if not merged:
+            print(f"[Storage] Could not merge live chunks for {session_dir.name}")
+            if merged_file.exists():
+                merged_file.unlink()
+            return 0
+
+        before = sum(path.stat().st_size for path in inputs)
+        merged_file.replace(archive)
+        for chunk in chunks:
+            chunk.unlink()
+        return before - archive.stat().st_size
+
+    def drop_redundant_audio(self, session_dir: Path, status: Dict) -> int:
+        original = session_dir / 'original_audio.webm'
+        if not original.exists():
+            return 0
+
+        total_segments = status.get('total_segments', 0)
+        segment_files = [session_dir / f"segment_{i}.mp3" for i in range(total_segments)]
+        if not total_segments or not all(path.exists() for path in segment_files):
+            return 0
+
+        size = original.stat().st_size
+        original.unlink()
+        return size
+
+    def compress_cold(self, session_dir: Path) -> Optional[int]:
+        """Gzips the transcripts and segment log; None if the session became busy."""
+        saved = 0
+        # Word passes and re-decodes rewrite these files under the same lock
+        with session_lock(session_dir):
+            if self._is_busy(get_session_status(session_dir)):
+                return None
+            for name in ('transcription.json', 'transcription.txt', 'segments.jsonl'):
+                saved += compress_session_file(session_dir, name)
+        return saved
+
+    def evict_audio(self, session_dir: Path) -> int:
+        freed = 0
+        for pattern in AUDIO_PATTERNS:
+            for path in session_dir.glob(pattern):
+                freed += path.stat().st_size
+                path.unlink()
+
+        status = get_session_status(session_dir)
+        if status is not None:
+            status['audio_evicted'] = True
+            status['audio_evicted_at'] = time.time()
+            update_session_status(session_dir, status)
+        return freed
+
+    def _is_busy(self, status: Optional[Dict]) -> bool:
+        return bool(status) and (status.get('status') in ('uploading', 'splitting', 'processing') or status.get('words_pending'))
+
+    def run_once(self) -> Dict:
+        """One compaction pass. Returns counters for logging."""
+        now = time.time()
+        stats = {'merged': 0, 'dropped': 0, 'compressed': 0, 'evicted': 0, 'bytes_saved': 0}
+        entries: List[tuple] = []
+        self._merge_accesses()
+
+        session_ids = set()
+        for session_dir in self.sessions_dir.iterdir():
+            with self._lock:
+                entry = self._index.get(session_dir.name)
+            if entry and entry.get('settled') and now - entry.get('scanned_at', 0) < self.RESCAN_SECONDS:
+                cold = now - entry.get('last_accessed', now) > self.COLD_SECONDS
+                if not cold or entry.get('compressed'):
+                    session_ids.add(session_dir.name)
+                    entries.append((session_dir, entry, False))
+                    continue
+
+            if not session_dir.is_dir():
+                continue
+            session_ids.add(session_dir.name)
+
+            try:
+                entry = self._scan(session_dir)
+                status = get_session_status(session_dir)
+                idle = now - entry.get('modified_at', now) > self.LIVE_IDLE_SECONDS
+                changed = False
+
+                if status is None and idle and any(session_dir.glob('chunk_*.webm')):
+                    saved = self.merge_live_chunks(session_dir)
+                    if saved:
+                        stats['merged'] += 1
+                        stats['bytes_saved'] += saved
+                        changed = True
+
+                if status and status.get('status') == 'complete':
+                    saved = self.drop_redundant_audio(session_dir, status)
+                    if saved:
+                        stats['dropped'] += 1
+                        stats['bytes_saved'] += saved
+                        changed = True
+
+                    cold = now - entry.get('last_accessed', now) > self.COLD_SECONDS
+                    if cold and not self._is_busy(status) and (session_dir / 'transcription.json').exists():
+                        saved = self.compress_cold(session_dir)
+                        if saved is not None:
+                            stats['bytes_saved'] += saved
+                            stats['compressed'] += 1
+                            changed = True
+
+                if changed:
+                    entry = self._rescan(session_dir)
+                busy = self._is_busy(status)
+                with self._lock:
+                    entry['settled'] = bool(status) and status.get('status') == 'complete' and not busy
+                    entry['compressed'] = not (session_dir / 'transcription.json').exists()
+                entries.append((session_dir, entry, busy))
+            except Exception as e:
+                print(f"[Storage] Error compacting {session_dir.name}: {e}")
+
+        with self._lock:
+            gone = [session_id for session_id in self._index if session_id not in session_ids]
+            for session_id in gone:
+                del self._index[session_id]
+        self._forget_accesses(gone)
+
+        if self.quota_bytes:
+            used = sum(entry.get('bytes', 0) for _, entry, _ in entries)
+            candidates = sorted(
+                (item for item in entries if item[1].get('audio_bytes') and not item[2]
+                 and now - item[1].get('modified_at', now) > self.LIVE_IDLE_SECONDS),
+                key=lambda item: item[1].get('last_accessed', 0)
+            )
+            for session_dir, entry, _ in candidates:
+                if used <= self.quota_bytes:
+                    break
+                try:
+                    freed = self.evict_audio(session_dir)
+                except Exception as e:
+                    print(f"[Storage] Error evicting audio from {session_dir.name}: {e}")
+                    continue
+                used -= freed
+                stats['evicted'] += 1
+                stats['bytes_saved'] += freed
+                self._rescan(session_dir)
+
+        self._save_index()
+        return stats
+
+    def start(self) -> None:
+        if self._worker is not None:
+            return
+        self._worker = threading.Thread(target=self._compact_loop, daemon=True)
+        self._worker.start()
+
+    def _compact_loop(self) -> None:
+        while True:
+            try:
+                stats = self.run_once()
+                if stats['bytes_saved']:
+                    print(f"[Storage] Compaction pass: {stats}")
+            except Exception as e:
+                print(f"[Storage] Compaction pass failed: {e}")
+            time.sleep(self.interval)
+
+
+def quota_from_env() -> Optional[int]:
+    """STORAGE_QUOTA_GB sets the audio eviction threshold; unset means no quota."""
+    value = os.environ.get('STORAGE_QUOTA_GB')
+    if not value:
+        return None
+    return int(float(value) * 1024 ** 3)
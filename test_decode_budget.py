@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Test script to verify decode budgets tighten under load and stop runaway decoding.
+"""
+
+from collections import namedtuple
+
+from decode_budget import BudgetGuard, apply_to_options, budget_for_load, parse_budget
+
+FakeSegment = namedtuple('FakeSegment', ['seek', 'start', 'end', 'text', 'compression_ratio', 'temperature', 'tokens'],
+                         defaults=[[]])
+
+LIVE = {'interactive': True}
+
+def test_decode_budget():
+    print("Testing Decode Budgets")
+    print("=" * 60)
+
+    print("\nTest 1: Limits tighten as the backlog grows; only live requests get a deadline")
+    idle = budget_for_load(0, 2, LIVE)
+    busy = budget_for_load(2, 2, LIVE)
+    overloaded = budget_for_load(5, 2, LIVE)
+    print(f"  {idle['level']} / {busy['level']} / {overloaded['level']}")
+    assert (idle['level'], busy['level'], overloaded['level']) == ('normal', 'busy', 'overloaded')
+    assert overloaded['max_fallbacks'] < busy['max_fallbacks'] < idle['max_fallbacks']
+    stored = budget_for_load(5, 2)
+    assert stored['level'] == 'overloaded' and stored['max_fallbacks'] == 0
+    assert overloaded['max_new_tokens'] < stored['max_new_tokens'] < 448
+    assert stored['max_rtf'] is None and stored['abort_after_bad_windows'] is None
+    assert budget_for_load(0, 2)['max_new_tokens'] is None
+
+    print("\nTest 2: Per-request overrides only tighten")
+    assert budget_for_load(0, 1, {'max_fallbacks': 1})['max_fallbacks'] == 1
+    assert budget_for_load(5, 1, {**LIVE, 'max_fallbacks': 4})['max_fallbacks'] == 0
+    assert budget_for_load(0, 1, {'max_rtf': 2.0})['max_rtf'] == 2.0
+    options = apply_to_options(busy, {'beam_size': 1})
+    assert options['temperature'] == [0.0, 0.2, 0.4] and options['max_new_tokens'] == 160
+    assert parse_budget('{"max_rtf": 2, "max_new_tokens": null}') == {'max_rtf': 2, 'max_new_tokens': None}
+    assert parse_budget('') is None
+    for bad in ('[1]', '{"interactive": true}', '{"max_rtf": "fast"}', '{"max_fallbacks": -1}'):
+        try:
+            parse_budget(bad)
+        except ValueError:
+            continue
+        raise AssertionError(f'{bad} was accepted')
+
+    print("\nTest 3: Looping windows are dropped, then the request is aborted")
+    def windows():
+        yield FakeSegment(0, 0.0, 5.0, 'a normal sentence here', 1.2, 0.0)
+        yield FakeSegment(3000, 30.0, 35.0, 'thank you ' * 20, 1.4, 0.0)
+        yield FakeSegment(6000, 60.0, 65.0, 'la la la la', 4.5, 0.0)
+        yield FakeSegment(9000, 90.0, 95.0, 'never decoded', 1.2, 0.0)
+    guard = BudgetGuard(idle, 120.0)
+    kept = [seg.text for seg in guard.guard(windows())]
+    print(f"  {guard.report}")
+    assert kept == ['a normal sentence here']
+    assert [hit['reason'] for hit in guard.report['hits']] == ['repetition', 'compression_ratio']
+    assert guard.report['aborted']
+    # A stored transcript only loses the looping windows
+    guard = BudgetGuard(stored, 120.0)
+    kept = [seg.text for seg in guard.guard(windows())]
+    assert kept == ['a normal sentence here', 'never decoded'] and not guard.report['aborted']
+
+    print("\nTest 4: Past the deadline, decoding stops after the current segment")
+    expired = BudgetGuard({**idle, 'min_deadline_seconds': 0.0, 'max_rtf': 0.0}, 60.0)
+    kept = list(expired.guard(windows()))
+    assert len(kept) == 1 and expired.report['hits'][0]['reason'] == 'deadline'
+    assert len(list(BudgetGuard({**stored, 'min_deadline_seconds': 0.0}, 60.0).guard(windows()))) == 2
+    # A stored request that loops from the start still stops at its own deadline
+    looping = BudgetGuard(budget_for_load(0, 1, {'max_rtf': 0.0, 'min_deadline_seconds': 0.0}), 60.0)
+    assert list(looping.guard(list(windows())[1:])) == []
+    assert [hit['reason'] for hit in looping.report['hits']] == ['repetition', 'deadline'] and looping.report['aborted']
+
+    print("\nTest 5: Windows cut off at the token cap are reported")
+    capped = BudgetGuard({**idle, 'max_new_tokens': 10}, 60.0)
+    cut = [FakeSegment(0, 0.0, 5.0, 'one two', 1.2, 0.0, list(range(6))),
+           FakeSegment(0, 5.0, 9.0, 'three four', 1.2, 0.0, list(range(4))),
+           FakeSegment(3000, 30.0, 32.0, 'five', 1.2, 0.0, list(range(3)))]
+    assert len(list(capped.guard(cut))) == 3
+    print(f"  {capped.report['hits']}")
+    assert [(hit['reason'], hit['start']) for hit in capped.report['hits']] == [('max_new_tokens', 0.0)]
+    print("  ✓ All budget checks passed")
+
+    print("\n" + "=" * 60)
+    print("Testing complete!")
+
+if __name__ == '__main__':
+    test_decode_budget()
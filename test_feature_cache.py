@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Test script to verify re-decodes reuse cached mel features and encoder outputs.
+"""
+
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+from faster_whisper.transcribe import Segment, Word
+
+from feature_cache import FeatureCache
+from model_profile import ModelPool
+from transcription_engine import FasterWhisperEngine, SAMPLE_RATE
+
+class FakeExtractor:
+    def __init__(self):
+        self.mel_filters = np.zeros((80, 201), dtype=np.float32)
+        self.calls = 0
+
+    def __call__(self, waveform, padding=160, chunk_length=None):
+        self.calls += 1
+        return np.tile(waveform[:3000], (80, 1)).astype(np.float32)
+
+class FakeWhisperModel:
+    """Calls the extractor and encoder the way WhisperModel.transcribe does."""
+
+    def __init__(self, *args, **kwargs):
+        self.feature_extractor = FakeExtractor()
+        self.encode_calls = 0
+
+    def encode(self, features):
+        import ctranslate2
+        self.encode_calls += 1
+        return ctranslate2.StorageView.from_array(np.ascontiguousarray(features[None, :4, :8] * 2))
+
+    def transcribe(self, audio, word_timestamps=False, **kwargs):
+        features = self.feature_extractor(audio)
+        encoded = np.array(self.encode(features))
+        duration = len(audio) / SAMPLE_RATE
+        words = [Word(0.0, duration, ' window', 0.9)] if word_timestamps else None
+        segment = Segment(0, 0, 0.0, duration, f' {encoded.sum():.1f}', [], 0.0, 1.0, 0.0, words, 0.0)
+        return iter([segment]), SimpleNamespace(language='en', language_probability=1.0, duration=duration)
+
+def test_feature_cache():
+    print("Testing Feature Cache")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sessions_dir = Path(tmp)
+        session_dir = sessions_dir / 'session-a'
+        session_dir.mkdir()
+
+        cache = FeatureCache(sessions_dir, max_bytes=10 * 1024 ** 2)
+        pool = ModelPool('fake', {'replicas': 1}, model_factory=FakeWhisperModel)
+        attach = lambda model: cache.attach(model, 'fake/int8', session_dir)
+        audio = np.linspace(0, 1, 16000, dtype=np.float32)
+
+        print("\nTest 1: Second decode skips feature extraction and the encoder")
+        first, _ = pool.transcribe(audio, replica_context=attach)
+        first = list(first)
+        second, _ = pool.transcribe(audio, replica_context=attach)
+        second = list(second)
+        model = pool._replicas.get()
+        print(f"  extractor calls={model.feature_extractor.calls} encode calls={model.encode_calls} {cache.stats}")
+        assert first == second
+        assert model.feature_extractor.calls == 1 and model.encode_calls == 1
+        assert cache.stats['hits'] == 2
+
+        print("\nTest 2: The replica is restored after the transcription")
+        assert isinstance(model.feature_extractor, FakeExtractor) and 'encode' not in vars(model)
+        pool._replicas.put(model)
+
+        print("\nTest 3: A result dropped before it is read gives the replica back")
+        unread, _ = pool.transcribe(audio, replica_context=attach)
+        assert pool._replicas.qsize() == 0
+        del unread
+        assert pool._replicas.qsize() == 1
+        started, _ = pool.transcribe(audio)
+        next(started)
+        started.close()
+        assert pool._replicas.qsize() == 1
+
+        print("\nTest 4: Least recently used entries are evicted over the cap")
+        small = FeatureCache(sessions_dir, max_bytes=1)
+        small.store(session_dir, 'extra', np.zeros(1000, dtype=np.float32))
+        assert not list((session_dir / 'features').glob('*.npy'))
+
+        print("\nTest 5: A second word-timestamp pass over stored audio skips the encoder")
+        engine = FasterWhisperEngine('fake', {'replicas': 1}, model_factory=FakeWhisperModel, feature_cache=cache)
+        stored = np.linspace(-1, 1, SAMPLE_RATE * 70, dtype=np.float32)
+
+        def word_pass(audio, **options):
+            segments, _ = engine.transcribe(audio, cache_dir=session_dir, word_timestamps=True, **options)
+            return [(w.start, w.end) for seg in segments for w in seg.words]
+
+        def encode_calls():
+            replica = engine.pool._replicas.get()
+            engine.pool._replicas.put(replica)
+            return replica.encode_calls
+
+        first = word_pass(stored)
+        assert first == [(0.0, 30.0), (30.0, 60.0), (60.0, 70.0)] and encode_calls() == 3
+        assert word_pass(stored, beam_size=1, language='de') == first
+        # A /retranscribe clip starting on a window boundary
+        assert word_pass(stored[30 * SAMPLE_RATE:]) == [(0.0, 30.0), (30.0, 40.0)]
+        print(f"  encode calls={encode_calls()} {cache.stats}")
+        assert encode_calls() == 3
+        print("  ✓ All feature cache checks passed")
+
+    print("\n" + "=" * 60)
+    print("Testing complete!")
+
+if __name__ == '__main__':
+    test_feature_cache()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Test script to verify pre-fork workers transcribe through the single
+inference process, and that workers no longer hold a copy of the model.
+"""
+
+import os
+import time
+import tempfile
+import threading
+import multiprocessing
+
+import numpy as np
+
+from inference_service import InferenceServer, remote_engines
+from prefork import memory_mb
+from transcription_engine import MockEngine, SAMPLE_RATE, TranscriptionInfo
+
+MODEL_MB = 200
+
+class ReportingEngine(MockEngine):
+    """Fills in its budget report as the segments are read, like FasterWhisperEngine."""
+
+    def __init__(self):
+        super().__init__(rtf=0.0)
+        self.closed = 0
+
+    def transcribe(self, audio, **options):
+        if options.get('language') == 'xx':
+            raise ValueError('unsupported language xx')
+        segments, info = super().transcribe(audio, **options)
+        report = {'level': 'normal', 'hits': [], 'aborted': False}
+
+        def reported():
+            try:
+                yield from segments
+                report['hits'].append({'reason': 'max_new_tokens'})
+            finally:
+                self.closed += 1
+
+        return reported(), TranscriptionInfo(info.language, info.language_probability, info.duration, report)
+
+def serve_mock(path, ready):
+    mock = MockEngine(rtf=0.0, model_mb=MODEL_MB)
+    server = InferenceServer({'live': mock, 'file': mock, 'draft': None}, path)
+    ready.set()
+    server.serve_forever()
+
+def run_worker(path, done, stop):
+    """A worker's engine use: remote when `path` is set, else its own model as before."""
+    engine = remote_engines(path)['file'] if path else MockEngine(rtf=0.0, model_mb=MODEL_MB)
+    segments, _ = engine.transcribe(np.zeros(5 * SAMPLE_RATE, dtype=np.float32), word_timestamps=True)
+    assert list(segments)
+    done.set()
+    stop.wait()
+
+def test_inference_service():
+    print("Testing Inference Service")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'engines.sock')
+        local = ReportingEngine()
+        server = InferenceServer({'live': local, 'file': local, 'draft': None}, path)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        engines = remote_engines(path)
+        assert engines['draft'] is None and engines['file'].name == 'mock'
+        remote = engines['file']
+        audio = np.zeros(12 * SAMPLE_RATE, dtype=np.float32)
+
+        print("\nTest 1: Remote segments match the local engine, and the budget report is completed")
+        segments, info = remote.transcribe(audio, word_timestamps=True)
+        segments = list(segments)
+        expected, _ = MockEngine(rtf=0.0).transcribe(audio, word_timestamps=True)
+        assert segments == list(expected) and info.duration == 12.0
+        assert info.budget['hits'] == [{'reason': 'max_new_tokens'}]
+        assert remote.backlog() == 0
+        batch = remote.transcribe_batch([audio[:SAMPLE_RATE * 2], audio])
+        assert [info.duration for _, info in batch] == [2.0, 12.0]
+
+        print("\nTest 2: Errors raised in the inference process reach the worker")
+        try:
+            remote.transcribe(audio, language='xx')
+        except ValueError as e:
+            print(f"  {e}")
+        else:
+            raise AssertionError('the error was lost')
+
+        print("\nTest 3: A worker that stops reading ends the decode")
+        local.rtf = 0.01
+        segments, _ = remote.transcribe(np.zeros(600 * SAMPLE_RATE, dtype=np.float32))
+        next(segments)
+        closed = local.closed
+        started = time.time()
+        segments.close()
+        while local.closed == closed and time.time() - started < 5:
+            time.sleep(0.01)
+        local.rtf = 0.0
+        # Decoding all 600 s would take 6 s
+        print(f"  decode stopped {time.time() - started:.2f}s after the worker closed its segments")
+        assert local.closed == closed + 1 and time.time() - started < 1
+
+        print("\nTest 4: Workers no longer hold a copy of the model")
+        context = multiprocessing.get_context('spawn')
+        shared_path = os.path.join(tmp, 'shared.sock')
+        ready, stop = context.Event(), context.Event()
+        inference = context.Process(target=serve_mock, args=(shared_path, ready), daemon=True)
+        inference.start()
+        assert ready.wait(60)
+        workers = []
+        for worker_path in (shared_path, shared_path, None):
+            done = context.Event()
+            process = context.Process(target=run_worker, args=(worker_path, done, stop), daemon=True)
+            process.start()
+            workers.append((process, done))
+        try:
+            assert all(done.wait(60) for _, done in workers)
+            inference_memory = memory_mb(inference.pid)
+            if inference_memory is None:
+                print("  /proc/<pid>/smaps_rollup unavailable, skipping the memory check")
+            else:
+                shared = [memory_mb(process.pid)['rss'] for process, _ in workers[:2]]
+                standalone = memory_mb(workers[2][0].pid)['rss']
+                print(f"  inference rss {inference_memory['rss']:.0f} MB, workers rss "
+                      f"{' / '.join(f'{rss:.0f}' for rss in shared)} MB, own-model worker rss {standalone:.0f} MB")
+                assert inference_memory['rss'] > MODEL_MB
+                assert all(rss < standalone - MODEL_MB * 0.75 for rss in shared)
+        finally:
+            stop.set()
+            for process, _ in workers:
+                process.join(10)
+            inference.terminate()
+            inference.join(10)
+        print("  ✓ All inference service checks passed")
+
+    print("\n" + "=" * 60)
+    print("Testing complete!")
+
+if __name__ == '__main__':
+    test_inference_service()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the live refiner keeps a session's queue across event
+stream reconnects, forgets sessions nobody listens to, and waits for a free
+replica rather than a globally idle server.
+"""
+
+from live_refiner import LiveRefiner
+from transcription_engine import MockEngine
+
+def test_live_refiner():
+    print("Testing Live Refiner Session Expiry")
+    print("=" * 60)
+
+    refiner = LiveRefiner(MockEngine(rtf=0.0), has_headroom=lambda: True)
+
+    print("\nTest 1: Chunks are queued per session")
+    refiner.submit('listened', 0, '/tmp/chunk_0.webm', [])
+    refiner.subscribe('listened')
+    for index in range(3):
+        refiner.submit('unheard', index, f'/tmp/chunk_{index}.webm', [])
+    assert len(refiner._jobs['unheard']) == 3 and 'unheard' in refiner._subscribers
+
+    print("\nTest 2: Idle sessions without a subscriber are expired")
+    for session_id in refiner._seen:
+        refiner._seen[session_id] -= refiner.IDLE_SESSION_SECONDS + 1
+    refiner.submit('new', 0, '/tmp/chunk_0.webm', [])
+    print(f"  sessions left: {sorted(refiner._seen)}, {refiner.stats}")
+    assert 'unheard' not in refiner._jobs and 'unheard' not in refiner._subscribers
+    assert 'listened' in refiner._subscribers and 'new' in refiner._jobs
+    assert refiner.stats['dropped'] == 3
+
+    print("\nTest 3: A dropped event stream keeps its queued chunks until the session goes idle")
+    events = refiner._subscribers['listened']
+    refiner.subscribe('listened')
+    refiner.unsubscribe('listened')
+    assert refiner._subscribed['listened'] == 1, "the reconnected stream is still open"
+    refiner.unsubscribe('listened')
+    assert 'listened' not in refiner._subscribed and len(refiner._jobs['listened']) == 1
+    assert refiner.subscribe('listened') is events
+    refiner.unsubscribe('listened')
+    refiner._seen['listened'] -= refiner.IDLE_SESSION_SECONDS + 1
+    refiner.submit('new', 1, '/tmp/chunk_1.webm', [])
+    assert 'listened' not in refiner._seen and 'listened' not in refiner._jobs
+
+    print("\nTest 4: Headroom follows the refining engine's replicas")
+    class BusyEngine(MockEngine):
+        waiting = 1
+        def backlog(self):
+            return self.waiting
+    engine = BusyEngine(rtf=0.0)
+    gated = LiveRefiner(engine)
+    assert not gated.has_headroom()
+    engine.waiting = 0
+    gated.cpu_count = float('inf')
+    assert gated.has_headroom()
+    print("  ✓ All refiner checks passed")
+
+    print("\n" + "=" * 60)
+    print("Testing complete!")
+
+if __name__ == '__main__':
+    test_live_refiner()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Test script to verify pre-fork workers keep each session's requests on one process.
+"""
+
+import os
+
+from prefork import new_session_id, owns_session, request_session_id, session_worker
+
+def test_prefork():
+    print("Testing Pre-fork Session Affinity")
+    print("=" * 60)
+
+    print("\nTest 1: Requests are keyed by the session in their path or query")
+    assert request_session_id(b'PUT /upload/abc?offset=10 HTTP/1.1') == 'abc'
+    assert request_session_id(b'GET /session/abc/words/3/stream HTTP/1.1') == 'abc'
+    assert request_session_id(b'POST /transcribe-live?session_id=1700000000 HTTP/1.1') == '1700000000'
+    assert request_session_id(b'GET /sessions HTTP/1.1') is None
+    assert request_session_id(b'POST /upload HTTP/1.1') is None
+    assert request_session_id(b'garbage') is None
+
+    print("\nTest 2: New sessions hash to the worker that created them")
+    saved = {key: os.environ.get(key) for key in ('PREFORK_WORKERS', 'PREFORK_WORKER_INDEX')}
+    try:
+        os.environ['PREFORK_WORKERS'] = '4'
+        for index in range(4):
+            os.environ['PREFORK_WORKER_INDEX'] = str(index)
+            session_id = new_session_id()
+            assert session_worker(session_id, 4) == index and owns_session(session_id)
+            print(f"  worker {index}: {session_id}")
+
+        os.environ['PREFORK_WORKERS'] = '1'
+        assert owns_session(new_session_id())
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+    print("  ✓ All affinity checks passed")
+
+    print("\n" + "=" * 60)
+    print("Testing complete!")
+
+if __name__ == '__main__':
+    test_prefork()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Test script to verify transcript search hits map to sessions, segments and word times.
+"""
+
+import tempfile
+from pathlib import Path
+
+from search_index import SearchIndex
+
+def test_search_index():
+    print("Testing Transcript Search Index")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = SearchIndex(Path(tmp) / 'search.db')
+
+        index.index_segment('session-a', {
+            'index': 1,
+            'start_time': 300.0,
+            'end_time': 600.0,
+            'transcription': 'we should go to the store today',
+            'words': [
+                {'word': ' we', 'start': 0.0, 'end': 0.2},
+                {'word': ' should', 'start': 0.2, 'end': 0.5},
+                {'word': ' go', 'start': 0.5, 'end': 0.7},
+                {'word': ' to', 'start': 0.7, 'end': 0.8},
+                {'word': ' the', 'start': 0.8, 'end': 0.9},
+                {'word': ' store', 'start': 0.9, 'end': 1.3},
+                {'word': ' today', 'start': 1.3, 'end': 1.7},
+            ],
+            'transcription_corrected': 'We should go to the store today.',
+            'words_corrected': []
+        })
+        index.index_segment('session-b', {
+            'index': 0,
+            'start_time': 0.0,
+            'end_time': 300.0,
+            'transcription': 'nothing relevant here'
+        })
+
+        print("\nTest 1: Hit maps to session, segment and absolute word time")
+        results = index.search('store', kind='raw')
+        hit = results['results'][0]
+        print(f"  {hit['session_id']} #{hit['segment_index']} @ {hit['time']:.2f}s: {hit['snippet']}")
+        assert results['total'] == 1
+        assert hit['session_id'] == 'session-a' and hit['segment_index'] == 1
+        assert abs(hit['time'] - 300.9) < 1e-6
+
+        print("\nTest 2: Raw and corrected text are both searchable")
+        assert index.search('store')['total'] == 2
+
+        print("\nTest 3: Re-indexing a segment replaces its rows")
+        index.index_segment('session-a', {'index': 1, 'transcription': 'completely different'})
+        assert index.search('store')['total'] == 0
+        assert index.search('different')['total'] == 1
+
+        print("\nTest 4: Punctuation in queries is ignored")
+        assert index.search('"(*')['total'] == 0
+
+        print("\nTest 5: Removing a session drops its rows")
+        index.remove_session('session-b')
+        assert index.search('relevant')['total'] == 0
+        print("  ✓ All search checks passed")
+
+    print("\n" + "=" * 60)
+    print("Testing complete!")
+
+if __name__ == '__main__':
+    test_search_index()
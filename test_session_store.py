@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Test script to verify streamed transcription files match the in-memory format,
+carry LLM corrections stored in the segment log, and that cold-file compression
+waits for a writer holding the session lock.
+"""
+
+import json
+import time
+import tempfile
+import threading
+from pathlib import Path
+
+from session_store import (
+    append_segment, compress_session_file, count_segments, rewrite_segments,
+    session_file, session_lock, write_transcription_files
+)
+
+def test_session_store():
+    print("Testing Segment Log Persistence")
+    print("=" * 60)
+
+    segments = [
+        {'index': 0, 'transcription': 'Hello there.', 'words': [{'word': ' Hello', 'start': 0.0, 'end': 0.4}]},
+        {'index': 1, 'transcription': '', 'words': []},
+        {'index': 2, 'transcription': 'Café "quoted"\ntext', 'words': []},
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        session_dir = Path(tmp)
+        for segment in segments:
+            append_segment(session_dir, segment)
+
+        print(f"\nSegments in log: {count_segments(session_dir)}")
+        assert count_segments(session_dir) == len(segments)
+
+        write_transcription_files(session_dir, 612.5)
+
+        full_text = " ".join(seg['transcription'] for seg in segments).strip()
+        expected_json = json.dumps({
+            'total_duration': 612.5,
+            'full_transcription': full_text,
+            'segments': segments
+        }, indent=2, ensure_ascii=False)
+
+        assert (session_dir / 'transcription.txt').read_text(encoding='utf-8') == full_text
+        assert (session_dir / 'transcription.json').read_text(encoding='utf-8') == expected_json
+        print("  ✓ transcription.txt and transcription.json match the previous format")
+
+        print("\nCorrections in the segment log survive a rebuild")
+        corrected = lambda seg: {**seg, 'transcription_corrected': seg['transcription'].upper()} if seg['index'] == 0 else seg
+        rewrite_segments(session_dir, corrected)
+        write_transcription_files(session_dir, 612.5)
+        data = json.loads((session_dir / 'transcription.json').read_text(encoding='utf-8'))
+        assert data['segments'][0]['transcription_corrected'] == 'HELLO THERE.'
+        assert data['full_transcription_corrected'] == 'HELLO THERE.  Café "quoted"\ntext'
+        assert list(data) == ['total_duration', 'full_transcription', 'segments', 'full_transcription_corrected']
+        print("  ✓ full_transcription_corrected is rebuilt from the corrected segments")
+
+        print("\nCompression waits for a writer holding the session lock")
+        def compress():
+            with session_lock(session_dir):
+                compress_session_file(session_dir, 'transcription.json')
+
+        with session_lock(session_dir):
+            compressor = threading.Thread(target=compress)
+            compressor.start()
+            time.sleep(0.2)
+            assert (session_dir / 'transcription.json').exists()
+            write_transcription_files(session_dir, 612.5)
+        compressor.join()
+        assert session_file(session_dir, 'transcription.json').name == 'transcription.json.gz'
+        print("  ✓ transcription.json was compressed only after the rewrite finished")
+
+    print("\n" + "=" * 60)
+    print("Testing complete!")
+
+if __name__ == '__main__':
+    test_session_store()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the live silence gate skips silent chunks and adapts to each room.
+"""
+
+import numpy as np
+
+from silence_gate import SilenceGate
+from transcription_engine import SAMPLE_RATE
+
+rng = np.random.default_rng(0)
+
+def noise(db, seconds=3.0):
+    return (rng.standard_normal(int(seconds * SAMPLE_RATE)) * 10 ** (db / 20)).astype(np.float32)
+
+def fan(db, seconds=3.0):
+    """Noise band-limited to the speech band, which only the noise floor can tell from speech."""
+    spectrum = np.fft.rfft(rng.standard_normal(int(seconds * SAMPLE_RATE)))
+    freqs = np.fft.rfftfreq(int(seconds * SAMPLE_RATE), 1.0 / SAMPLE_RATE)
+    spectrum[(freqs < 300) | (freqs > 3400)] = 0
+    signal = np.fft.irfft(spectrum, int(seconds * SAMPLE_RATE))
+    return (signal * 10 ** (db / 20) / np.sqrt(np.mean(signal ** 2))).astype(np.float32)
+
+def hum(db, seconds=3.0, hz=50):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (np.sqrt(2) * 10 ** (db / 20) * np.sin(2 * np.pi * hz * t)).astype(np.float32)
+
+def voice(db, seconds=3.0, background=-60, pitch=150, pauses=True):
+    """Harmonics of a voice, syllable-modulated, over background noise."""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    tone = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 16))
+    if pauses:
+        syllables = np.clip(np.sin(2 * np.pi * 4 * t), 0, None)
+    else:
+        # Run-on speech: louder and softer syllables, never quiet
+        syllables = 0.3 + np.abs(np.sin(2 * np.pi * 4 * t))
+    signal = tone * syllables
+    signal *= 10 ** (db / 20) / np.sqrt(np.mean(signal ** 2))
+    return (signal + noise(background, seconds)).astype(np.float32)
+
+def test_silence_gate():
+    print("Testing Silence Gate")
+    print("=" * 60)
+
+    gate = SilenceGate()
+
+    print("\nTest 1: Silent chunks are skipped, speech passes")
+    results = [gate.check('quiet', chunk) for chunk in
+               [noise(-60), noise(-60), noise(-60), voice(-25), noise(-60), noise(-60)]]
+    print(f"  {[r['speech'] for r in results]}")
+    # First chunk always passes; so does the chunk after speech
+    assert [r['speech'] for r in results] == [True, False, False, True, True, False]
+    assert results[-1]['skipped'] == 3 and results[-1]['chunks'] == 6
+
+    print("\nTest 2: Hum and hiss are loud but not speech; a low voice is")
+    gate.check('hum', hum(-60))
+    assert not gate.check('hum', hum(-25))['speech']
+    assert not gate.check('hum', noise(-25))['speech']
+    assert gate.check('hum', voice(-25, pitch=95))['speech']
+
+    print("\nTest 3: The floor follows a louder room, so its fan noise is skipped")
+    results = [gate.check('fan', fan(db)) for db in [-70, -70] + [-45] * 12]
+    passed = [r['speech'] for r in results[2:]]
+    print(f"  floor {results[0]['floor_db']} -> {results[-1]['floor_db']} dB, fan chunks passed: {sum(passed)}")
+    assert not any(passed)
+    assert results[-1]['floor_db'] > -50
+    assert gate.check('fan', voice(-20, background=-45))['speech']
+
+    print("\nTest 4: Continuous speech doesn't drag the floor up, even from the first chunk")
+    results = [gate.check('talk', chunk) for chunk in [noise(-60), noise(-60)] + [voice(-28, pauses=False) for _ in range(15)]]
+    print(f"  floor {results[2]['floor_db']} -> {results[-1]['floor_db']} dB")
+    assert all(r['speech'] for r in results[2:]) and results[-1]['floor_db'] < -50
+    results = [gate.check('talk-first', voice(-28, pauses=False)) for _ in range(15)]
+    assert all(r['speech'] for r in results) and results[-1]['floor_db'] < -50
+
+    print("\nTest 5: Steady sound far above the floor is skipped, even when it is harmonic")
+    gate.check('steady', noise(-60))
+    t = np.arange(3 * SAMPLE_RATE) / SAMPLE_RATE
+    drone = sum(np.sin(2 * np.pi * 120 * k * t) / k for k in range(1, 16))
+    drone = (drone * 10 ** (-30 / 20) / np.sqrt(np.mean(drone ** 2))).astype(np.float32)
+    results = [gate.check('steady', chunk) for chunk in [fan(-30), fan(-30), drone, drone]]
+    print(f"  {[r['speech'] for r in results]}, {[r['voiced_ms'] for r in results]} ms voiced")
+    assert not any(r['speech'] for r in results) and all(r['voiced_ms'] for r in results[2:])
+    assert gate.check('steady', voice(-20, background=-30))['speech']
+
+    print("\nTest 6: Sessions keep their own floor")
+    assert gate.check('quiet', voice(-35))['speech']
+    assert gate.stats['skipped'] >= 4
+    print(f"  {gate.stats}")
+    print("  ✓ All gate checks passed")
+
+    print("\n" + "=" * 60)
+    print("Testing complete!")
+
+if __name__ == '__main__':
+    test_silence_gate()
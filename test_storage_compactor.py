@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Test script to verify quota eviction only removes audio, skips busy sessions,
+goes least recently used first, that settled sessions are not re-read until
+they are accessed through any server process, and that merging a resumed live
+session's chunks keeps its earlier archive.
+"""
+
+import os
+import time
+import tempfile
+from pathlib import Path
+
+import storage_compactor
+from session_store import get_session_status, update_session_status
+from storage_compactor import StorageCompactor
+
+AUDIO_BYTES = 100_000
+
+def make_session(sessions_dir, session_id, status='complete'):
+    session_dir = sessions_dir / session_id
+    session_dir.mkdir()
+    (session_dir / 'segment_0.mp3').write_bytes(b'\0' * AUDIO_BYTES)
+    (session_dir / 'transcription.txt').write_text('hello there')
+    (session_dir / 'transcription.json').write_text('{"full_transcription": "hello there"}')
+    (session_dir / 'segments.jsonl').write_text('{"index": 0, "transcription": "hello there"}\n')
+    update_session_status(session_dir, {'status': status, 'total_segments': 1})
+    # Idle long enough to be an eviction candidate
+    old = time.time() - StorageCompactor.LIVE_IDLE_SECONDS - 60
+    for path in session_dir.iterdir():
+        os.utime(path, (old, old))
+    return session_dir
+
+def test_storage_compactor():
+    print("Testing Storage Compactor")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sessions_dir = Path(tmp) / 'sessions'
+        sessions_dir.mkdir()
+        dirs = {name: make_session(sessions_dir, name) for name in ('oldest', 'older', 'recent')}
+        dirs['busy'] = make_session(sessions_dir, 'busy', status='processing')
+
+        # Room for two sessions' audio plus every transcript
+        compactor = StorageCompactor(sessions_dir, quota_bytes=int(2.5 * AUDIO_BYTES))
+        now = time.time()
+        for offset, name in enumerate(['busy', 'oldest', 'older', 'recent']):
+            compactor.touch(name)
+            compactor._index[name]['last_accessed'] = now - 1000 + offset * 100
+
+        print("\nTest 1: Least recently used audio is evicted first, down to the quota")
+        stats = compactor.run_once()
+        evicted = sorted(name for name, d in dirs.items() if not (d / 'segment_0.mp3').exists())
+        print(f"  {stats}, evicted: {evicted}")
+        assert evicted == ['older', 'oldest'] and stats['evicted'] == 2
+
+        print("\nTest 2: Transcripts are kept and busy sessions are never touched")
+        for name, session_dir in dirs.items():
+            assert (session_dir / 'transcription.json').exists() and (session_dir / 'segments.jsonl').exists()
+        assert get_session_status(dirs['oldest'])['audio_evicted']
+        assert not get_session_status(dirs['busy']).get('audio_evicted')
+
+        print("\nTest 3: Settled sessions are skipped until they are accessed again")
+        reads = []
+        read_status = storage_compactor.get_session_status
+        storage_compactor.get_session_status = lambda session_dir: reads.append(session_dir.name) or read_status(session_dir)
+        try:
+            compactor.run_once()
+            assert reads == ['busy'], reads
+            reads.clear()
+            compactor.touch('recent')
+            compactor.run_once()
+            assert sorted(reads) == ['busy', 'recent'], reads
+
+            print("\nTest 4: Reads served by another worker process count too")
+            reads.clear()
+            other_worker = StorageCompactor(sessions_dir)
+            other_worker.touch('older')
+            compactor.run_once()
+            assert sorted(reads) == ['busy', 'older'], reads
+            assert compactor._index['older']['last_accessed'] == other_worker._index['older']['last_accessed']
+        finally:
+            storage_compactor.get_session_status = read_status
+
+        print("\nTest 5: Resumed live sessions append to their archive")
+        live_dir = sessions_dir / 'live'
+        live_dir.mkdir()
+        (live_dir / storage_compactor.LIVE_ARCHIVE).write_bytes(b'\1' * 1000)
+        for index in (10, 11):
+            (live_dir / f'chunk_{index}.webm').write_bytes(b'\2' * 500)
+        concat_lists = []
+
+        def fake_ffmpeg(cmd, **kwargs):
+            concat_lists.append(Path(cmd[cmd.index('-i') + 1]).read_text().split('\n'))
+            Path(cmd[-1]).write_bytes(b'\3' * 1200)
+            return type('Result', (), {'returncode': 0})()
+
+        run = storage_compactor.subprocess.run
+        storage_compactor.subprocess.run = fake_ffmpeg
+        try:
+            saved = compactor.merge_live_chunks(live_dir)
+        finally:
+            storage_compactor.subprocess.run = run
+        print(f"  concat list: {concat_lists[0]}")
+        assert concat_lists[0][:3] == [f"file '{storage_compactor.LIVE_ARCHIVE}'", "file 'chunk_10.webm'", "file 'chunk_11.webm'"]
+        assert saved == 800 and not any(live_dir.glob('chunk_*.webm'))
+        assert sorted(p.name for p in live_dir.iterdir()) == [storage_compactor.LIVE_ARCHIVE]
+        print("  ✓ All storage checks passed")
+
+    print("\n" + "=" * 60)
+    print("Testing complete!")
+
+if __name__ == '__main__':
+    test_storage_compactor()
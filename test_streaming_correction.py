@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Test script to verify streaming LLM correction with incremental word alignment,
+using a local fake of the Anthropic streaming client.
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+
+from llm_service import LLMService
+
+class FakeStream:
+    def __init__(self, text, chunk_size, delay=0.0):
+        self.text = text
+        self.chunk_size = chunk_size
+        self.delay = delay
+
+    @property
+    def text_stream(self):
+        for i in range(0, len(self.text), self.chunk_size):
+            time.sleep(self.delay)
+            yield self.text[i:i + self.chunk_size]
+
+class FakeStreamingClient:
+    """Streams back the prompt's transcript with `fix` applied, a few characters at a time."""
+
+    def __init__(self, fix, chunk_size=5, delay=0.0):
+        self.fix = fix
+        self.chunk_size = chunk_size
+        self.delay = delay
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        self.messages = self
+
+    @contextmanager
+    def stream(self, **kwargs):
+        prompt = kwargs['messages'][0]['content']
+        transcript = prompt.split('Original transcript:\n', 1)[1].split('\n\nReturn ONLY', 1)[0]
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            yield FakeStream(self.fix(transcript), self.chunk_size, self.delay)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+def make_words(count):
+    return [
+        {'word': f' w{i}' if i % 7 else ' um', 'start': i * 0.5, 'end': i * 0.5 + 0.4, 'probability': 0.9}
+        for i in range(count)
+    ]
+
+def test_streaming_correction():
+    print("Testing Streaming Correction")
+    print("=" * 60)
+
+    service = LLMService()
+    drop_fillers = lambda text: ' '.join(w for w in text.split() if w != 'um') + '.'
+
+    print("\nTest 1: Corrected words are emitted before generation ends")
+    service.client = FakeStreamingClient(drop_fillers)
+    words = make_words(40)
+    text = ''.join(w['word'] for w in words).strip()
+    events = list(service.stream_correct_and_align(text, words))
+    batches = [e for e in events if e['type'] == 'words']
+    done = events[-1]
+    print(f"  {len(batches)} word batches, corrected: {done['corrected_text'][:40]}...")
+    assert len(batches) > 1 and done['type'] == 'done'
+    assert [w for b in batches for w in b['words']] == done['words']
+    expected = [w for w in words if w['word'] != ' um']
+    assert [w['word'].rstrip('.') for w in done['words']] == [w['word'].strip() for w in expected]
+    assert [w['start'] for w in done['words']] == [w['start'] for w in expected]
+
+    print("\nTest 2: Long segments are corrected as overlapping windows in parallel")
+    service.client = FakeStreamingClient(drop_fillers)
+    words = make_words(500)
+    text = ''.join(w['word'] for w in words).strip()
+    done = list(service.stream_correct_and_align(text, words, window_words=120, overlap_words=20))[-1]
+    got = [w['word'].rstrip('.') for w in done['words']]
+    print(f"  {service.client.calls} windows, up to {service.client.max_active} at once, {len(got)} words")
+    assert service.client.calls == 5
+    assert got == [w['word'].strip() for w in words if w['word'] != ' um']
+    starts = [w['start'] for w in done['words']]
+    assert starts == sorted(starts)
+    # The text is stitched from each window's output, not rebuilt from the words
+    assert done['corrected_text'].split() == [w['word'] for w in done['words']]
+    service.client = FakeStreamingClient(lambda text: text.replace(' w10 ', ' w10.\n\n', 1))
+    done = list(service.stream_correct_and_align(text, words, window_words=120, overlap_words=20))[-1]
+    assert 'w10.\n\nw11' in done['corrected_text'] and done['corrected_text'].count('w200 ') == 1
+
+    print("\nTest 3: A stream that breaks off keeps the rest of the original words")
+    class BreakingClient(FakeStreamingClient):
+        @contextmanager
+        def stream(self, **kwargs):
+            def text_stream():
+                yield 'um w1 w2 w3 w4 w5 w6 '
+                raise RuntimeError('connection reset')
+            yield type('Stream', (), {'text_stream': text_stream()})()
+    service.client = BreakingClient(None)
+    words = make_words(20)
+    done = list(service.stream_correct_and_align(''.join(w['word'] for w in words).strip(), words))[-1]
+    assert [w['word'] for w in done['words']] == [w['word'].strip() for w in words]
+    assert done['corrected_text'].split() == [w['word'].strip() for w in words]
+
+    print("\nTest 4: A reader that stops early ends the window streams")
+    service.client = FakeStreamingClient(drop_fillers, delay=0.005)
+    words = make_words(500)
+    events = service.stream_correct_and_align(''.join(w['word'] for w in words).strip(), words,
+                                              window_words=120, overlap_words=20, max_parallel=2)
+    assert next(events)['type'] == 'words'
+    events.close()
+    time.sleep(0.2)
+    print(f"  {service.client.calls} of 5 windows started, {service.client.active} still streaming")
+    assert service.client.calls <= 3 and service.client.active == 0
+
+    print("\nTest 5: Without streaming, a long segment is corrected in one call with its layout")
+    class FakeClient:
+        def __init__(self):
+            self.calls = 0
+            self.messages = self
+        def create(self, **kwargs):
+            self.calls += 1
+            transcript = kwargs['messages'][0]['content'].split('Original transcript:\n', 1)[1].split('\n\nReturn ONLY', 1)[0]
+            half = transcript.split(' ')
+            text = ' '.join(half[:150]) + '.\n\n' + ' '.join(half[150:]) + '.'
+            return type('Response', (), {'content': [type('Block', (), {'text': text})()]})()
+    service.client = FakeClient()
+    words = make_words(300)
+    corrected, aligned = service.correct_and_align(''.join(w['word'] for w in words).strip(), words)
+    assert service.client.calls == 1 and '.\n\n' in corrected
+    assert len(aligned) == 300 and [w['start'] for w in aligned] == [w['start'] for w in words]
+    print("  ✓ All streaming checks passed")
+
+    print("\n" + "=" * 60)
+    print("Testing complete!")
+
+if __name__ == '__main__':
+    test_streaming_correction()
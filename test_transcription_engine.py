@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the mock transcription engine is deterministic and word-timed,
+that batching falls back to one clip at a time without faster-whisper internals,
+and that an engine missing transcribe() can't be constructed.
+"""
+
+import numpy as np
+
+from transcription_engine import (
+    FasterWhisperEngine, MockEngine, Segment, TranscriptionEngine, TranscriptionInfo, load_engines
+)
+from word_timing_service import extract_words
+
+def test_mock_engine():
+    print("Testing Mock Transcription Engine")
+    print("=" * 60)
+
+    engine = MockEngine(rtf=0.0)
+    audio = np.zeros(16000 * 12, dtype=np.float32)
+
+    print("\nTest 1: Segments cover the whole clip")
+    segments, info = engine.transcribe(audio, language='fr', word_timestamps=True)
+    segments = list(segments)
+    print(f"  {len(segments)} segments, language={info.language}, duration={info.duration:.1f}s")
+    assert info.language == 'fr' and abs(info.duration - 12.0) < 1e-6
+    assert segments[0].start == 0.0 and abs(segments[-1].end - 12.0) < 1e-6
+
+    print("\nTest 2: Word timings fall inside their segment")
+    for seg in segments:
+        assert seg.text == ''.join(w.word for w in seg.words)
+        assert all(seg.start <= w.start < w.end <= seg.end + 0.01 for w in seg.words)
+    assert len(extract_words(segments)) == sum(len(seg.words) for seg in segments)
+
+    print("\nTest 3: Same audio gives the same output; words only when asked")
+    again, _ = engine.transcribe(audio)
+    again = list(again)
+    assert [seg.text for seg in again] == [seg.text for seg in segments]
+    assert all(seg.words is None for seg in again)
+
+    print("\nTest 4: Mock profile shares one engine across tiers")
+    engines = load_engines({'engine': 'mock', 'mock_rtf': 0.0, 'live_draft_model': None})
+    assert engines['live'] is engines['file'] and engines['draft'] is None
+
+    print("\nTest 5: Engines whose model lacks the batching internals transcribe clips one at a time")
+    class BareWhisperModel:
+        """Only the public WhisperModel.transcribe API, as after an incompatible upgrade."""
+        def __init__(self, *args, **kwargs):
+            self.calls = 0
+        def transcribe(self, audio, **kwargs):
+            self.calls += 1
+            duration = len(audio) / 16000
+            return iter([Segment(0.0, duration, ' hello', None)]), TranscriptionInfo('en', 1.0, duration)
+    engine = FasterWhisperEngine('fake', {'replicas': 1}, model_factory=BareWhisperModel)
+    assert not engine.batching
+    clips = [np.zeros(16000 * 2, dtype=np.float32), np.zeros(16000 * 3, dtype=np.float32)]
+    for _ in range(2):
+        results = engine.transcribe_batch(clips, beam_size=1)
+        assert [[seg.text for seg in segments] for segments, _ in results] == [[' hello'], [' hello']]
+        assert [info.duration for _, info in results] == [2.0, 3.0]
+    assert engine.pool._replicas.get().calls == 4
+
+    print("\nTest 6: An incomplete engine fails when it is constructed")
+    class BatchOnlyEngine(TranscriptionEngine):
+        def transcribe_batch(self, audios, **options):
+            return []
+    try:
+        BatchOnlyEngine()
+    except TypeError as e:
+        print(f"  {e}")
+    else:
+        raise AssertionError('an engine without transcribe() was constructed')
+    print("  ✓ All mock engine checks passed")
+
+    print("\n" + "=" * 60)
+    print("Testing complete!")
+
+if __name__ == '__main__':
+    test_mock_engine()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Test script to verify chunked uploads are transcribed segment by segment as
+they arrive, only hold off background work while a segment is transcribed, and
+end in error rather than complete when the client abandons them.
+"""
+
+import io
+import sys
+import time
+import wave
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+from session_store import get_session_status
+from transcription_engine import MockEngine, SAMPLE_RATE
+from upload_ingest import UploadIngestor
+
+# Stands in for ffmpeg: passes a WAV stream's PCM through from stdin (or a file) to stdout
+WAV_TO_PCM = """
+import sys, wave
+source = sys.stdin.buffer if sys.argv[1] == 'pipe:0' else open(sys.argv[1], 'rb')
+with wave.open(source, 'rb') as f:
+    while True:
+        frames = f.readframes(4096)
+        if not frames:
+            break
+        sys.stdout.buffer.write(frames)
+"""
+
+class WavIngestor(UploadIngestor):
+    """Decodes WAV in a subprocess of its own, so the test runs where ffmpeg isn't installed."""
+
+    def _decoder(self, source):
+        import subprocess
+        return subprocess.Popen(
+            [sys.executable, '-c', WAV_TO_PCM, source],
+            stdin=subprocess.PIPE if source == 'pipe:0' else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+
+    def _save_segment(self, path, pcm):
+        with wave.open(str(path), 'wb') as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(SAMPLE_RATE)
+            f.writeframes(pcm)
+
+def wav_bytes(seconds):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(np.zeros(int(seconds * SAMPLE_RATE), dtype=np.int16).tobytes())
+    return buffer.getvalue()
+
+def test_upload_ingest():
+    print("Testing Chunked Upload Ingest")
+    print("=" * 60)
+
+    engine = MockEngine(rtf=0.0)
+    foreground = {'active': 0, 'entered': 0}
+    lock = threading.Lock()
+
+    @contextmanager
+    def mark_foreground():
+        with lock:
+            foreground['active'] += 1
+            foreground['entered'] += 1
+        try:
+            yield
+        finally:
+            with lock:
+                foreground['active'] -= 1
+
+    budgets = []
+
+    def transcribe_segment(session_id, session_dir, segment_info, audio, mode, language, budget=None):
+        budgets.append(budget)
+        start = time.time()
+        segments, info = engine.transcribe(audio, language=language)
+        text = ''.join(seg.text for seg in segments).strip()
+        return {**segment_info, 'transcription': text}, info.language, time.time() - start
+
+    def complete_session(session_id, session_dir, total_duration, total_segments, words_pending):
+        return {'type': 'complete', 'session_id': session_id, 'total_duration': total_duration,
+                'total_segments': total_segments}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ingestor = WavIngestor(Path(tmp), transcribe_segment, complete_session, segment_seconds=2,
+                               foreground=mark_foreground)
+        data = wav_bytes(5.0)
+        upload = ingestor.create(total_bytes=len(data), budget={'max_rtf': 2.0})
+
+        print("\nTest 1: The first segment is transcribed before the upload finishes")
+        first_part = 44 + 3 * SAMPLE_RATE * 2
+        for offset in range(0, first_part, 20000):
+            ingestor.append(upload.session_id, offset, data[offset:min(offset + 20000, first_part)])
+        events = ingestor.events(upload)
+        seen = []
+        while not any(e and e['type'] == 'segment_complete' for e in seen):
+            seen.append(next(events))
+        assert not upload.finished
+
+        print("\nTest 2: Background work isn't held off while the upload idles")
+        time.sleep(0.2)
+        assert foreground['active'] == 0
+
+        ingestor.append(upload.session_id, first_part, data[first_part:])
+        ingestor.finish(upload.session_id)
+        seen.extend(events)
+        seen = [e for e in seen if e]
+        segments = [e for e in seen if e['type'] == 'segment_complete']
+        print(f"  {[(e['start_time'], e['end_time']) for e in segments]}, foreground entered {foreground['entered']}x")
+        assert [(e['start_time'], e['end_time']) for e in segments] == [(0.0, 2.0), (2.0, 4.0), (4.0, 5.0)]
+        assert all(e['transcription'] for e in segments)
+        assert seen[-1]['type'] == 'complete' and seen[-1]['total_duration'] == 5.0
+        assert foreground['entered'] == 3 and foreground['active'] == 0
+        assert budgets == [{'max_rtf': 2.0}] * 3
+        assert (Path(tmp) / upload.session_id / 'original_audio.webm').read_bytes() == data
+
+        print("\nTest 3: An abandoned upload times out as an error, not a truncated transcript")
+        ingestor.IDLE_TIMEOUT_SECONDS = 0.3
+        abandoned = ingestor.create(total_bytes=len(data))
+        ingestor.append(abandoned.session_id, 0, data[:first_part])
+        events = [e for e in ingestor.events(abandoned, keepalive=0.2) if e]
+        status = get_session_status(Path(tmp) / abandoned.session_id)
+        print(f"  last event: {events[-1]}, status: {status['status']}")
+        assert events[-1]['type'] == 'error' and 'timed out' in events[-1]['message']
+        assert status['status'] == 'error' and not any(e['type'] == 'complete' for e in events)
+        print("  ✓ All upload checks passed")
+
+    print("\n" + "=" * 60)
+    print("Testing complete!")
+
+if __name__ == '__main__':
+    test_upload_ingest()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Test script to verify waveform peak reads stay within MAX_BUCKETS by moving
+to coarser levels instead of rejecting long sessions.
+"""
+
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+import waveform_peaks
+from waveform_peaks import PeakWriter, read_peaks
+from transcription_engine import SAMPLE_RATE
+
+SESSION_SECONDS = 600
+
+def test_waveform_peaks():
+    print("Testing Waveform Peaks")
+    print("=" * 60)
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        session_dir = Path(tmp)
+        writer = PeakWriter(session_dir)
+        for _ in range(SESSION_SECONDS // 60):
+            writer.add((rng.standard_normal(60 * SAMPLE_RATE) * 0.1).astype(np.float32))
+        writer.close()
+
+        print("\nTest 1: A short range is served at the requested resolution")
+        peaks = read_peaks(session_dir, 10.0, 20.0)
+        assert peaks['level'] == 0 and len(peaks['peaks']) == 1000
+
+        print("\nTest 2: The whole session at the default resolution falls back to a coarser level")
+        peaks = read_peaks(session_dir)
+        print(f"  level {peaks['level']}, {peaks['resolution']} buckets/s, {len(peaks['peaks'])} buckets")
+        assert peaks['level'] > 0 and len(peaks['peaks']) <= waveform_peaks.MAX_BUCKETS
+        assert peaks['from'] == 0.0 and peaks['to'] == SESSION_SECONDS
+
+        print("\nTest 3: Past the coarsest level the range is cut short")
+        limit = waveform_peaks.MAX_BUCKETS
+        waveform_peaks.MAX_BUCKETS = 16
+        try:
+            peaks = read_peaks(session_dir)
+        finally:
+            waveform_peaks.MAX_BUCKETS = limit
+        print(f"  served {peaks['from']}-{peaks['to']} s")
+        assert peaks['level'] == waveform_peaks.NUM_LEVELS - 1 and len(peaks['peaks']) == 16
+        assert peaks['to'] < SESSION_SECONDS
+
+        print("\nTest 4: A resolution that isn't positive is rejected")
+        try:
+            read_peaks(session_dir, resolution=0)
+        except ValueError as e:
+            print(f"  {e}")
+        else:
+            raise AssertionError('resolution 0 was accepted')
+        print("  ✓ All peak checks passed")
+
+    print("\n" + "=" * 60)
+    print("Testing complete!")
+
+if __name__ == '__main__':
+    test_waveform_peaks()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Test script to verify lazy word timings are filled in, persisted in batches and
+spliced over re-decoded ranges without losing other segments' corrections,
+using the mock engine.
+"""
+
+import json
+import time
+import wave
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from llm_service import LLMService
+from session_store import append_segment, get_session_status, iter_segments, rewrite_segments, update_session_status
+from transcription_engine import MockEngine, SAMPLE_RATE
+from word_timing_service import WordTimingService
+
+SEGMENT_SECONDS = 10.0
+
+def write_wav(path, seconds):
+    """A WAV under the stored segment's .mp3 name; the decoder goes by content."""
+    with wave.open(str(path), 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(np.zeros(int(seconds * SAMPLE_RATE), dtype=np.int16).tobytes())
+
+def make_session(sessions_dir, session_id, count, words_pending=True):
+    session_dir = sessions_dir / session_id
+    session_dir.mkdir()
+    engine = MockEngine(rtf=0.0)
+    for index in range(count):
+        write_wav(session_dir / f'segment_{index}.mp3', SEGMENT_SECONDS)
+        audio = np.zeros(int(SEGMENT_SECONDS * SAMPLE_RATE), dtype=np.float32)
+        segments, _ = engine.transcribe(audio, word_timestamps=not words_pending)
+        segments = list(segments)
+        segment = {
+            'index': index,
+            'start_time': index * SEGMENT_SECONDS,
+            'end_time': (index + 1) * SEGMENT_SECONDS,
+            'transcription': ''.join(seg.text for seg in segments).strip(),
+            'language': 'en'
+        }
+        if words_pending:
+            segment['words_pending'] = True
+            segment['phrases'] = [{'start': seg.start, 'end': seg.end, 'text': seg.text} for seg in segments]
+        else:
+            segment['words'] = [
+                {'word': w.word, 'start': w.start, 'end': w.end, 'probability': w.probability}
+                for seg in segments for w in seg.words
+            ]
+        append_segment(session_dir, segment)
+    update_session_status(session_dir, {
+        'status': 'complete', 'total_duration': count * SEGMENT_SECONDS, 'words_pending': count if words_pending else 0
+    })
+    return session_dir
+
+def test_word_timing_service():
+    print("Testing Word Timing Service")
+    print("=" * 60)
+
+    llm_service = LLMService()
+    llm_service.client = None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sessions_dir = Path(tmp)
+        service = WordTimingService(MockEngine(rtf=0.0), sessions_dir, llm_service)
+        service.is_idle = lambda: True
+        persists = []
+        persist = service._persist
+        service._persist = lambda session_dir, updates: persists.append(sorted(updates)) or persist(session_dir, updates)
+
+        print("\nTest 1: A viewed segment gets its words on demand")
+        session_dir = make_session(sessions_dir, 'viewed', 3)
+        segment = service.ensure_words('viewed', 1)
+        assert segment['words'] and 'words_pending' not in segment
+        assert persists == [[1]] and get_session_status(session_dir)['words_pending'] == 2
+        assert service.ensure_words('viewed', 7) is None
+        assert not service._named_locks, "locks of finished requests are dropped"
+
+        print("\nTest 2: A streamed segment is saved even if the client leaves early")
+        stream = service.stream_words('viewed', 0)
+        assert next(stream)['type'] == 'words_raw'
+        stream.close()
+        deadline = time.time() + 10
+        while get_session_status(session_dir)['words_pending'] != 1 and time.time() < deadline:
+            time.sleep(0.05)
+        saved = next(seg for seg in iter_segments(session_dir) if seg['index'] == 0)
+        assert saved['words'] and saved['words_corrected'] and 'words_pending' not in saved
+        events = list(service.stream_words('viewed', 0))
+        assert [e['type'] for e in events] == ['complete'] and events[0]['segment'] == saved
+
+        print("\nTest 3: Background fill-in writes back in batches")
+        fill_dir = sessions_dir / 'fill'
+        fill_dir.mkdir()
+        service = WordTimingService(MockEngine(rtf=0.0), fill_dir, llm_service)
+        service.is_idle = lambda: True
+        service.PERSIST_BATCH = 4
+        persists.clear()
+        persist_batch = service._persist
+        service._persist = lambda session_dir, updates: persists.append(sorted(updates)) or persist_batch(session_dir, updates)
+        session_dir = make_session(fill_dir, 'filled', 10)
+        service.start_background_fill()
+        deadline = time.time() + 10
+        while get_session_status(session_dir)['words_pending'] and time.time() < deadline:
+            time.sleep(0.05)
+        print(f"  persisted batches: {persists}")
+        assert persists == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+        assert all(seg['words'] for seg in iter_segments(session_dir))
+        time.sleep(0.1)
+        assert not service._named_locks and not service._unpersisted
+
+        print("\nTest 4: A re-decoded range is spliced over the old words")
+        session_dir = make_session(service.sessions_dir, 'spliced', 2, words_pending=False)
+        old = list(iter_segments(session_dir))
+        old_words = old[0]['words']
+        # Both edges fall inside a word: 1.0 s in word 2, 13.0 s in segment 1's word 7
+        inside_start = next(w for w in old_words if w['start'] < 1.0 < w['end'])
+        inside_end = next(w for w in old[1]['words'] if w['start'] < 3.0 < w['end'])
+        updated = service.retranscribe_range('spliced', 1.0, 13.0, {'language': 'en'})
+        assert [seg['index'] for seg in updated] == [0, 1]
+
+        first, second = updated
+        words = first['words']
+        starts = [w['start'] for w in words]
+        print(f"  segment 0: {len(old_words)} -> {len(words)} words, widened to {inside_start['start']}s")
+        assert starts == sorted(starts)
+        before = [w for w in old_words if w['start'] < inside_start['start']]
+        assert words[:len(before)] == before
+        assert words[len(before)]['start'] == inside_start['start']
+        # Nothing of segment 0 after 1.0 s survives; segment 1 keeps its words after the widened end
+        assert words[-1]['end'] <= SEGMENT_SECONDS + 0.01
+        after = [w for w in old[1]['words'] if w['start'] > inside_end['start']]
+        assert second['words'][-len(after):] == after
+        new_words = second['words'][:-len(after)]
+        assert new_words[0]['start'] == 0.0 and new_words[-1]['end'] <= inside_end['end'] + 0.01
+        for seg in updated:
+            assert seg['transcription'] == ''.join(w['word'] for w in seg['words']).strip()
+
+        stored = list(iter_segments(session_dir))
+        assert [seg['words'] for seg in stored] == [seg['words'] for seg in updated]
+        text = (session_dir / 'transcription.txt').read_text(encoding='utf-8')
+        assert text == ' '.join(seg['transcription'] for seg in updated).strip()
+
+        print("\nTest 5: Corrections stored by process_transcript.py survive a re-decode elsewhere")
+        rewrite_segments(session_dir, lambda seg: {**seg, 'transcription_corrected': 'Corrected.'} if seg['index'] == 1 else seg)
+        service.retranscribe_range('spliced', 0.0, 2.0, {'language': 'en'})
+        with open(session_dir / 'transcription.json', encoding='utf-8') as f:
+            data = json.load(f)
+        assert data['segments'][1]['transcription_corrected'] == 'Corrected.'
+        assert data['full_transcription_corrected'].endswith('Corrected.')
+
+        print("\nTest 6: A segment without words is re-decoded only around the range, cut at phrase times")
+        session_dir = make_session(service.sessions_dir, 'phrased', 1)
+        old = next(iter_segments(session_dir))
+        clips = []
+        transcribe = service.engine.transcribe
+        service.engine.transcribe = lambda audio, **options: clips.append(len(audio) / SAMPLE_RATE) or transcribe(audio, **options)
+        # 6-8 s lies in the second 5 s phrase; it widens to 5-10 s and decodes from 5 s - pad
+        [updated] = service.retranscribe_range('phrased', 6.0, 8.0, {'language': 'en'})
+        service.engine.transcribe = transcribe
+        print(f"  decoded {clips} s of a {SEGMENT_SECONDS} s segment")
+        assert clips == [SEGMENT_SECONDS - 5.0 + service.PHRASE_PAD_SECONDS]
+        assert updated['phrases'][0] == old['phrases'][0]
+        assert all(phrase['start'] >= 5.0 for phrase in updated['phrases'][1:])
+        assert updated['transcription'].startswith(old['phrases'][0]['text'].strip())
+        stored = next(iter_segments(session_dir))
+        assert stored['words_pending'] and not stored.get('words') and stored['phrases'] == updated['phrases']
+        assert get_session_status(session_dir)['words_pending'] == 1
+        # An engine caching fixed windows gets the whole windows covering the range instead
+        service.engine.cache_window_seconds = 4.0
+        clips.clear()
+        service.engine.transcribe = lambda audio, **options: clips.append(len(audio) / SAMPLE_RATE) or transcribe(audio, **options)
+        service.retranscribe_range('phrased', 6.0, 8.0, {'language': 'en'})
+        service.engine.transcribe = transcribe
+        assert clips == [SEGMENT_SECONDS - 4.0]
+        print("  ✓ All word timing checks passed")
+
+    print("\n" + "=" * 60)
+    print("Testing complete!")
+
+if __name__ == '__main__':
+    test_word_timing_service()
@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+"""Transcription engines used by server.py: faster-whisper and a deterministic mock"""
+
+import os
+import time
+import inspect
+import zlib
+from abc import ABC, abstractmethod
+from dataclasses import replace
+from math import ceil
+from pathlib import Path
+from collections import namedtuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from decode_budget import BudgetGuard, apply_to_options, budget_for_load
+from feature_cache import WINDOW_SECONDS
+from model_profile import ModelPool
+
+SAMPLE_RATE = 16000
+
+# Model name -> local model directory, filled in by a process that resolved the
+# names ahead of time (see prefork.py) so replicas skip the download lookup
+MODEL_PATHS: Dict[str, str] = {}
+
+Word = namedtuple('Word', ['start', 'end', 'word', 'probability'])
+Segment = namedtuple('Segment', ['start', 'end', 'text', 'words'])
+# budget is the decode budget report (see decode_budget.BudgetGuard), when the engine enforces one
+TranscriptionInfo = namedtuple('TranscriptionInfo', ['language', 'language_probability', 'duration', 'budget'],
+                               defaults=(None,))
+
+
+def decode_audio(audio, sampling_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Decodes a file path or file object to mono float32 PCM."""
+    from faster_whisper import decode_audio as fw_decode_audio
+    return fw_decode_audio(audio, sampling_rate=sampling_rate)
+
+
+class TranscriptionEngine(ABC):
+    """
+    Interface every route transcribes through.
+
+    transcribe() takes a path, file object or 16 kHz float32 array plus
+    faster-whisper style options and returns (segments, info). cache_dir
+    names the session directory whose feature cache may be used for stored
+    audio; engines without a cache ignore it. Engines with one set
+    cache_window_seconds and decode cached audio in fixed windows of that
+    length from its start, so a clip cut from stored audio should start on
+    a window boundary to reuse them. budget holds per-request
+    limits (see decode_budget.DEFAULT_BUDGET) that can only tighten the
+    defaults, and {'interactive': True} for live requests (see
+    decode_budget.budget_for_load). Segments are produced lazily; each has
+    start, end, text and words (None unless word_timestamps=True). info has
+    language, language_probability and duration. Subclasses must implement
+    transcribe(); an engine without it can't be constructed.
+    """
+
+    name = 'engine'
+    cache_window_seconds: Optional[float] = None
+
+    @abstractmethod
+    def transcribe(self, audio, **options) -> Tuple[Iterable[Segment], TranscriptionInfo]:
+        """Transcribes one clip; see the class docstring for the arguments and result."""
+
+    def backlog(self) -> int:
+        """Requests a new request would wait behind; engines without a queue never make one wait."""
+        return 0
+
+    def transcribe_batch(self, audios: List, **options) -> List[Tuple[List[Segment], TranscriptionInfo]]:
+        """Transcribes several independent clips with the same options."""
+        results = []
+        for audio in audios:
+            segments, info = self.transcribe(audio, **options)
+            results.append((list(segments), info))
+        return results
+
+
+# WhisperModel internals FasterWhisperEngine._transcribe_batch calls, with the
+# parameters it passes (faster-whisper 1.2)
+BATCH_INTERNALS = {
+    'encode': {'features'},
+    'get_prompt': {'tokenizer', 'previous_tokens'},
+    '_split_segments_by_timestamps': {'tokenizer', 'tokens', 'time_offset', 'segment_size',
+                                      'segment_duration', 'seek'},
+}
+
+
+def batching_supported(model) -> bool:
+    """Checks once whether `model` has the faster-whisper internals the batched path calls"""
+    try:
+        from faster_whisper.audio import pad_or_trim  # noqa: F401
+        from faster_whisper.tokenizer import Tokenizer  # noqa: F401
+        from faster_whisper.transcribe import get_suppressed_tokens  # noqa: F401
+        from faster_whisper.vad import VadOptions, get_speech_timestamps  # noqa: F401
+    except ImportError:
+        return False
+    for name, params in BATCH_INTERNALS.items():
+        method = getattr(model, name, None)
+        if method is None:
+            return False
+        try:
+            if not params <= set(inspect.signature(method).parameters):
+                return False
+        except (TypeError, ValueError):
+            return False
+    return all(hasattr(model, attr) for attr in ('model', 'feature_extractor', 'hf_tokenizer',
+                                                 'max_length', 'frames_per_second'))
+
+
+class FasterWhisperEngine(TranscriptionEngine):
+    name = 'faster-whisper'
+
+    def __init__(self, model_name: str, config: Dict, model_factory=None, feature_cache=None):
+        self.model_name = model_name
+        self.pool = ModelPool(MODEL_PATHS.get(model_name, model_name), config, model_factory)
+        self.feature_cache = feature_cache
+        self.cache_key = f"{model_name}_{config.get('compute_type', 'int8')}"
+        if feature_cache is not None:
+            self.cache_window_seconds = WINDOW_SECONDS
+        with self.pool.checkout() as model:
+            self.batching = batching_supported(model)
+        if not self.batching:
+            print("[Batch] faster-whisper internals unavailable, live windows are transcribed one at a time")
+
+    def backlog(self) -> int:
+        return self.pool.backlog()
+
+    def _budget(self, overrides: Optional[Dict]) -> Dict:
+        return budget_for_load(self.pool.backlog(), self.pool.capacity, overrides)
+
+    def transcribe(self, audio, cache_dir=None, budget=None, **options):
+        budget = self._budget(budget)
+        options = apply_to_options(budget, options)
+        if cache_dir is not None and self.feature_cache is not None:
+            segments, info = self._transcribe_windows(audio, Path(cache_dir), **options)
+        else:
+            segments, info = self.pool.transcribe(audio, **options)
+        guard = BudgetGuard(budget, info.duration)
+
+        def convert() -> Iterator[Segment]:
+            try:
+                for seg in guard.guard(segments):
+                    words = None
+                    if seg.words:
+                        words = [Word(w.start, w.end, w.word, w.probability) for w in seg.words]
+                    yield Segment(seg.start, seg.end, seg.text, words)
+            finally:
+                # Releases the replica even when the guard stopped decoding early
+                segments.close()
+                if guard.report['hits']:
+                    print(f"[Budget] {budget['level']} budget hit: {guard.report}")
+
+        return convert(), TranscriptionInfo(info.language, info.language_probability, info.duration, guard.report)
+
+    def _transcribe_windows(self, audio, cache_dir: Path, vad_filter=False, **options):
+        """
+        Transcribes stored audio window by window through the feature cache.
+
+        The audio is cut into fixed WINDOW_SECONDS windows from its start and
+        each window is decoded on its own, so its features and encoder
+        output depend only on its PCM and a later re-decode of the same
+        window (other decode options, word timestamps, a /retranscribe clip
+        starting on a window boundary) reuses them. With vad_filter, windows
+        without speech are skipped; speech inside a window is not cut out,
+        which would change the window's features. The language is detected
+        on the first window and kept for the rest. Windows don't carry
+        decoding context over, and a word spoken across a window boundary
+        may be split.
+        """
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+        pcm = audio if isinstance(audio, np.ndarray) else decode_audio(audio)
+        window = WINDOW_SECONDS * SAMPLE_RATE
+        starts = [
+            start for start in range(0, len(pcm), window)
+            if not vad_filter or get_speech_timestamps(pcm[start:start + window], VadOptions())
+        ]
+        duration = len(pcm) / SAMPLE_RATE
+        if not starts:
+            return (segment for segment in ()), TranscriptionInfo(options.get('language') or 'en', 0.0, duration)
+
+        replica_context = lambda model: self.feature_cache.attach(model, self.cache_key, cache_dir)
+        first, info = self.pool.transcribe(pcm[starts[0]:starts[0] + window], replica_context=replica_context, **options)
+        options['language'] = options.get('language') or info.language
+
+        def windows():
+            for start in starts:
+                segments = first if start == starts[0] else self.pool.transcribe(
+                    pcm[start:start + window], replica_context=replica_context, **options)[0]
+                offset = start / SAMPLE_RATE
+                try:
+                    for seg in segments:
+                        words = [replace(w, start=w.start + offset, end=w.end + offset) for w in seg.words or []]
+                        yield replace(seg, seek=seg.seek + start // self.SAMPLES_PER_FRAME, start=seg.start + offset,
+                                      end=seg.end + offset, words=words or seg.words)
+                finally:
+                    segments.close()
+
+        return windows(), TranscriptionInfo(options['language'], info.language_probability, duration)
+
+    # Matches WhisperModel.transcribe's defaults for dropping silent windows
+    NO_SPEECH_THRESHOLD = 0.6
+    LOG_PROB_THRESHOLD = -1.0
+    COMPRESSION_RATIO_THRESHOLD = 2.4
+    MAX_BATCH_SECONDS = 30.0
+    # Mel frames are 10 ms; segment seeks count them
+    SAMPLES_PER_FRAME = 160
+
+    def transcribe_batch(self, audios, **options):
+        """
+        Encodes and decodes short clips as one batch on a single replica (see
+        _transcribe_batch). The batched path uses private faster-whisper
+        internals (requirements.txt pins the versions they match); when the
+        probe at construction doesn't find them, clips are transcribed one at
+        a time.
+        """
+        if self.batching:
+            return self._transcribe_batch(audios, **options)
+        return super().transcribe_batch(audios, **options)
+
+    def _transcribe_batch(self, audios, language=None, beam_size=5, vad_filter=False, budget=None, **options):
+        """
+        Encodes and decodes short clips as one batch on a single replica.
+
+        Each clip is padded to a 30 s window, languages are detected per clip
+        from the shared encoder output, and every clip gets its own prompt, so
+        clips from different sessions don't influence each other. Clips the
+        batched path doesn't cover (longer than 30 s, or word timestamps
+        requested) go through transcribe() one at a time. The batch decodes
+        at the first temperature, sampling like faster-whisper when it is
+        above zero (beam_size is then ignored); clips that fail faster-whisper's
+        compression-ratio or log-probability checks are re-decoded one at a
+        time through transcribe() with the remaining fallback temperatures the
+        budget allows. The budget's max_new_tokens and loop checks apply to
+        every clip.
+        """
+        from faster_whisper.audio import pad_or_trim
+        from faster_whisper.tokenizer import Tokenizer
+        from faster_whisper.transcribe import get_suppressed_tokens
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+        arrays = [audio if isinstance(audio, np.ndarray) else decode_audio(audio) for audio in audios]
+        results = [None] * len(arrays)
+        batch = []
+        for i, pcm in enumerate(arrays):
+            duration = len(pcm) / SAMPLE_RATE
+            if duration > self.MAX_BATCH_SECONDS or options.get('word_timestamps'):
+                segments, info = self.transcribe(pcm, language=language, beam_size=beam_size,
+                                                 vad_filter=vad_filter, budget=budget, **options)
+                results[i] = (list(segments), info)
+            elif vad_filter and not get_speech_timestamps(pcm, VadOptions()):
+                results[i] = ([], TranscriptionInfo(language or 'en', 0.0, duration))
+            else:
+                batch.append(i)
+
+        if not batch:
+            return results
+
+        overrides = budget
+        budget = self._budget(overrides)
+        temperatures = apply_to_options(budget, options)['temperature']
+        retry = []
+        with self.pool.checkout() as model:
+            features = np.stack([pad_or_trim(model.feature_extractor(arrays[i])[..., :-1]) for i in batch])
+            encoder_output = model.encode(features)
+
+            if language or not model.model.is_multilingual:
+                languages = [(language or 'en', 1.0)] * len(batch)
+            else:
+                languages = [(top[0][0][2:-2], top[0][1]) for top in model.model.detect_language(encoder_output)]
+
+            tokenizers = [
+                Tokenizer(model.hf_tokenizer, model.model.is_multilingual, task='transcribe', language=lang)
+                for lang, _ in languages
+            ]
+            prompts = [model.get_prompt(tokenizer, previous_tokens=[]) for tokenizer in tokenizers]
+            temperature = temperatures[0]
+            # CTranslate2 only samples with beam_size 1 and an unrestricted top-k
+            if temperature > 0:
+                search = {'beam_size': 1, 'sampling_topk': 0, 'sampling_temperature': temperature}
+            else:
+                search = {'beam_size': beam_size}
+
+            max_length = model.max_length
+            if budget['max_new_tokens'] is not None:
+                max_length = min(max_length, len(prompts[0]) + budget['max_new_tokens'])
+
+            outputs = model.model.generate(
+                encoder_output,
+                prompts,
+                max_length=max_length,
+                suppress_blank=True,
+                suppress_tokens=get_suppressed_tokens(tokenizers[0], [-1]),
+                return_scores=True,
+                return_no_speech_prob=True,
+                **search
+            )
+
+            for slot, i in enumerate(batch):
+                duration = len(arrays[i]) / SAMPLE_RATE
+                tokenizer = tokenizers[slot]
+                output = outputs[slot]
+                tokens = output.sequences_ids[0]
+                guard = BudgetGuard(budget, duration)
+                info = TranscriptionInfo(languages[slot][0], languages[slot][1], duration, guard.report)
+
+                avg_logprob = output.scores[0] * len(tokens) / (len(tokens) + 1)
+                if output.no_speech_prob > self.NO_SPEECH_THRESHOLD and avg_logprob < self.LOG_PROB_THRESHOLD:
+                    results[i] = ([], info)
+                    continue
+                text_bytes = tokenizer.decode(tokens).encode('utf-8')
+                compression_ratio = len(text_bytes) / len(zlib.compress(text_bytes)) if text_bytes else 0.0
+                if len(temperatures) > 1 and (compression_ratio > self.COMPRESSION_RATIO_THRESHOLD or
+                                              avg_logprob < self.LOG_PROB_THRESHOLD):
+                    retry.append(i)
+                    continue
+                guard.check_tokens(len(tokens), Segment(0.0, round(duration, 3), '', None))
+
+                subsegments, _, _ = model._split_segments_by_timestamps(
+                    tokenizer=tokenizer,
+                    tokens=tokens,
+                    time_offset=0.0,
+                    segment_size=int(ceil(duration) * model.frames_per_second),
+                    segment_duration=duration,
+                    seek=0
+                )
+                segments = []
+                for sub in subsegments:
+                    text = tokenizer.decode(sub['tokens'])
+                    if text.strip():
+                        segments.append(Segment(round(sub['start'], 3), round(min(sub['end'], duration), 3), text, None))
+                results[i] = (list(guard.guard(segments)), info)
+
+        # Fallback re-decodes run after the replica is back in the pool
+        for i in retry:
+            segments, info = self.transcribe(arrays[i], language=language, beam_size=beam_size, vad_filter=vad_filter,
+                                             budget=overrides, **{**options, 'temperature': temperatures[1:]})
+            results[i] = (list(segments), info)
+
+        return results
+
+
+class MockEngine(TranscriptionEngine):
+    """
+    Deterministic stand-in for the model.
+
+    Produces plausible segments and word timings for the real audio duration
+    and sleeps so that inference takes `rtf` x the audio length. The same
+    audio length always yields the same text, so pipeline benchmarks and load
+    tests are reproducible on machines without model weights. `model_mb`
+    holds that much memory as a stand-in for the weights, for checking the
+    memory of multi-process setups.
+    """
+
+    name = 'mock'
+
+    VOCABULARY = (
+        'the quick brown fox jumps over a lazy dog while we talk about '
+        'transcription latency storage search and the weather today'
+    ).split()
+    WORDS_PER_SECOND = 2.5
+    SEGMENT_SECONDS = 5.0
+
+    def __init__(self, rtf: float = 0.05, language: str = 'en', model_mb: float = 0.0):
+        self.rtf = rtf
+        self.language = language
+        # Filled, so the pages are resident like loaded weights
+        self.weights = np.ones(int(model_mb * 1024 ** 2), dtype=np.uint8)
+
+    def _duration(self, audio) -> float:
+        if not isinstance(audio, np.ndarray):
+            audio = decode_audio(audio)
+        return len(audio) / SAMPLE_RATE
+
+    def _segments(self, duration: float, word_timestamps: bool, rtf: float) -> Iterator[Segment]:
+        start = 0.0
+        word_index = zlib.crc32(f'{duration:.2f}'.encode())
+        while start < duration:
+            end = min(start + self.SEGMENT_SECONDS, duration)
+            time.sleep((end - start) * rtf)
+
+            count = max(1, int((end - start) * self.WORDS_PER_SECOND))
+            step = (end - start) / count
+            words = []
+            for i in range(count):
+                token = self.VOCABULARY[word_index % len(self.VOCABULARY)]
+                word_index = (word_index * 1103515245 + 12345) % (2 ** 31)
+                word_start = start + i * step
+                words.append(Word(round(word_start, 2), round(word_start + step * 0.8, 2), ' ' + token, 0.9))
+
+            text = ''.join(w.word for w in words)
+            yield Segment(start, end, text, words if word_timestamps else None)
+            start = end
+
+    def transcribe(self, audio, cache_dir=None, budget=None, **options):
+        duration = self._duration(audio)
+        language = options.get('language') or self.language
+        segments = self._segments(duration, options.get('word_timestamps', False), self.rtf)
+        return segments, TranscriptionInfo(language, 1.0, duration)
+
+    def transcribe_batch(self, audios, cache_dir=None, budget=None, **options):
+        """A batch costs as much as its longest clip, like a padded batched encode."""
+        durations = [self._duration(audio) for audio in audios]
+        time.sleep(max(durations, default=0.0) * self.rtf)
+        language = options.get('language') or self.language
+        word_timestamps = options.get('word_timestamps', False)
+        return [
+            (list(self._segments(duration, word_timestamps, 0.0)), TranscriptionInfo(language, 1.0, duration))
+            for duration in durations
+        ]
+
+
+def _engine_key(config: Dict) -> tuple:
+    return tuple(config.get(key) for key in ('compute_type', 'cpu_threads', 'replicas', 'chunk_length'))
+
+
+def load_engines(profile: Dict, feature_cache=None) -> Dict[str, Optional[TranscriptionEngine]]:
+    """
+    Builds the 'live' and 'file' engines (shared when their configs match)
+    and the 'draft' engine for two-pass live mode, if configured.
+    TRANSCRIPTION_ENGINE=mock (or "engine": "mock" in the profile) swaps
+    every tier for MockEngine with MOCK_RTF / "mock_rtf" as its speed and
+    MOCK_MODEL_MB of stand-in weights.
+    """
+    engine_name = os.environ.get('TRANSCRIPTION_ENGINE') or profile.get('engine', 'faster-whisper')
+
+    if engine_name == 'mock':
+        rtf = float(os.environ.get('MOCK_RTF') or profile.get('mock_rtf', 0.05))
+        mock = MockEngine(rtf=rtf, model_mb=float(os.environ.get('MOCK_MODEL_MB', 0)))
+        return {'live': mock, 'file': mock, 'draft': mock if profile.get('live_draft_model') else None}
+
+    engines = {}
+    by_key = {}
+    for workload in ('live', 'file'):
+        config = profile[workload]
+        key = _engine_key(config)
+        if key not in by_key:
+            by_key[key] = FasterWhisperEngine(profile['model'], config, feature_cache=feature_cache)
+        engines[workload] = by_key[key]
+
+    engines['draft'] = None
+    if profile.get('live_draft_model'):
+        engines['draft'] = FasterWhisperEngine(profile['live_draft_model'], profile['live'], feature_cache=feature_cache)
+    return engines
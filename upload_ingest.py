@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""Chunked, resumable uploads that are transcribed while they arrive"""
+
+import time
+import uuid
+import threading
+import subprocess
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from session_store import update_session_status
+from transcription_engine import SAMPLE_RATE, decode_audio
+from waveform_peaks import PeakWriter
+
+UPLOAD_FILE = 'original_audio.webm'
+
+
+class UploadError(Exception):
+    def __init__(self, message: str, status_code: int = 400, received: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.received = received
+
+
+class Upload:
+    def __init__(self, session_id: str, session_dir: Path, word_timestamps_mode: str, total_bytes: Optional[int],
+                 budget: Optional[Dict] = None):
+        self.session_id = session_id
+        self.session_dir = session_dir
+        self.path = session_dir / UPLOAD_FILE
+        self.word_timestamps_mode = word_timestamps_mode
+        # Decode budget overrides every segment is transcribed under
+        self.budget = budget
+        self.total_bytes = total_bytes
+        self.received = 0
+        self.finished = False
+        self.done = False
+        # Set when feeding the decoder failed (e.g. the client went away); the upload ends in error
+        self.error: Optional[UploadError] = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        # Every event is kept so a reconnecting client can replay from its last id
+        self.events: List[Dict] = []
+        self.cond = threading.Condition()
+
+    def info(self) -> Dict:
+        with self.cond:
+            return {
+                'session_id': self.session_id,
+                'received': self.received,
+                'total_bytes': self.total_bytes,
+                'finished': self.finished,
+                'done': self.done
+            }
+
+
+class UploadIngestor:
+    """
+    Accepts an upload as byte-offset chunks and transcribes it as it arrives.
+
+    Chunks are appended to original_audio.webm and, at the same time, piped
+    through one ffmpeg process that decodes to 16 kHz PCM. Each time a full
+    segment of PCM is available it is stored as segment_N.mp3 and handed to
+    `transcribe_segment`, so the first text arrives after one segment of
+    audio instead of after the whole upload. The total duration is only
+    known once the decoder reaches the end of the stream.
+
+    Containers that can't be decoded from a pipe (e.g. MP4 with the index at
+    the end) fall back to decoding the stored file once the upload finishes.
+    """
+
+    IDLE_TIMEOUT_SECONDS = 3600
+    PIPE_BLOCK = 64 * 1024
+
+    def __init__(self, sessions_dir: Path, transcribe_segment: Callable, complete_session: Callable,
+                 segment_seconds: int = 300, foreground: Optional[Callable] = None,
+                 new_session_id: Optional[Callable[[], str]] = None):
+        self.sessions_dir = sessions_dir
+        self.transcribe_segment = transcribe_segment
+        self.complete_session = complete_session
+        self.segment_seconds = segment_seconds
+        self.foreground = foreground or nullcontext
+        self.new_session_id = new_session_id or (lambda: str(uuid.uuid4()))
+
+        self._lock = threading.Lock()
+        self._uploads: Dict[str, Upload] = {}
+
+    def create(self, word_timestamps_mode: str = 'false', total_bytes: Optional[int] = None,
+               budget: Optional[Dict] = None) -> Upload:
+        session_id = self.new_session_id()
+        session_dir = self.sessions_dir / session_id
+        session_dir.mkdir(exist_ok=True)
+        upload = Upload(session_id, session_dir, word_timestamps_mode, total_bytes, budget)
+        upload.path.touch()
+
+        update_session_status(session_dir, {
+            'status': 'uploading',
+            'session_id': session_id,
+            'started_at': upload.created_at
+        })
+
+        with self._lock:
+            for stale_id, stale in list(self._uploads.items()):
+                if stale.done and time.time() - stale.updated_at > self.IDLE_TIMEOUT_SECONDS:
+                    del self._uploads[stale_id]
+            self._uploads[session_id] = upload
+        threading.Thread(target=self._run, args=(upload,), daemon=True).start()
+        return upload
+
+    def get(self, session_id: str) -> Optional[Upload]:
+        with self._lock:
+            return self._uploads.get(session_id)
+
+    def append(self, session_id: str, offset: int, data: bytes) -> int:
+        """Writes a chunk at `offset`, which must equal the bytes received so far."""
+        upload = self.get(session_id)
+        if upload is None:
+            raise UploadError('Upload not found', 404)
+
+        with upload.cond:
+            if upload.finished:
+                raise UploadError('Upload already finished', 409, upload.received)
+            if offset != upload.received:
+                raise UploadError(f'Expected offset {upload.received}', 409, upload.received)
+            with open(upload.path, 'ab') as f:
+                f.write(data)
+            upload.received += len(data)
+            upload.updated_at = time.time()
+            upload.cond.notify_all()
+            return upload.received
+
+    def finish(self, session_id: str) -> Upload:
+        upload = self.get(session_id)
+        if upload is None:
+            raise UploadError('Upload not found', 404)
+        with upload.cond:
+            upload.finished = True
+            upload.cond.notify_all()
+        return upload
+
+    def events(self, upload: Upload, since: int = 0, keepalive: float = 15.0) -> Iterator[Optional[Dict]]:
+        """Yields events from index `since` on, and None as a keepalive while waiting."""
+        position = since
+        while True:
+            with upload.cond:
+                deadline = time.time() + keepalive
+                while position >= len(upload.events) and not upload.done and time.time() < deadline:
+                    upload.cond.wait(timeout=deadline - time.time())
+                pending = upload.events[position:]
+                done = upload.done
+            if not pending and not done:
+                yield None
+            for event in pending:
+                yield event
+            position += len(pending)
+            if done and position >= len(upload.events):
+                return
+
+    def _emit(self, upload: Upload, event: Dict, done: bool = False) -> None:
+        with upload.cond:
+            event = {**event, 'id': len(upload.events)}
+            upload.events.append(event)
+            upload.done = upload.done or done
+            upload.cond.notify_all()
+
+    def _feed(self, upload: Upload, stdin) -> None:
+        """Tails the upload file into the decoder until the client finishes."""
+        fed = 0
+        try:
+            with open(upload.path, 'rb') as f:
+                while True:
+                    with upload.cond:
+                        while fed >= upload.received and not upload.finished:
+                            if not upload.cond.wait(timeout=self._idle_poll_seconds()) and \
+                                    time.time() - upload.updated_at > self.IDLE_TIMEOUT_SECONDS:
+                                raise UploadError('Upload timed out')
+                        available = upload.received
+                        finished = upload.finished
+                    if fed >= available and finished:
+                        break
+                    f.seek(fed)
+                    while fed < available:
+                        block = f.read(min(self.PIPE_BLOCK, available - fed))
+                        stdin.write(block)
+                        fed += len(block)
+        except UploadError as e:
+            # Closing stdin below makes the decoder flush what it has; _run must not complete on that
+            upload.error = e
+        except BrokenPipeError:
+            pass
+        finally:
+            try:
+                stdin.close()
+            except OSError:
+                pass
+
+    def _idle_poll_seconds(self) -> float:
+        return min(60, self.IDLE_TIMEOUT_SECONDS)
+
+    def _wait_until_finished(self, upload: Upload) -> None:
+        with upload.cond:
+            while not upload.finished:
+                if not upload.cond.wait(timeout=self._idle_poll_seconds()) and \
+                        time.time() - upload.updated_at > self.IDLE_TIMEOUT_SECONDS:
+                    raise UploadError('Upload timed out')
+
+    def _decoder(self, source: str) -> subprocess.Popen:
+        return subprocess.Popen(
+            ['ffmpeg', '-v', 'error', '-i', source, '-f', 's16le', '-ac', '1', '-ar', str(SAMPLE_RATE), 'pipe:1'],
+            stdin=subprocess.PIPE if source == 'pipe:0' else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+
+    def _save_segment(self, path: Path, pcm: bytes) -> None:
+        cmd = [
+            'ffmpeg', '-f', 's16le', '-ac', '1', '-ar', str(SAMPLE_RATE), '-i', 'pipe:0',
+            '-acodec', 'libmp3lame', '-y', str(path)
+        ]
+        result = subprocess.run(cmd, input=pcm, capture_output=True)
+        if result.returncode != 0:
+            raise RuntimeError(f'Could not encode {path.name}')
+
+    def _run(self, upload: Upload) -> None:
+        state = {'index': 0, 'samples': 0, 'language': None, 'words_pending': 0}
+        try:
+            peak_writer = PeakWriter(upload.session_dir)
+            self._emit(upload, {'type': 'started', 'session_id': upload.session_id, 'streaming': True,
+                                'total_segments': None, 'total_duration': None})
+
+            decoder = self._decoder('pipe:0')
+            feeder = threading.Thread(target=self._feed, args=(upload, decoder.stdin), daemon=True)
+            feeder.start()
+            returncode = self._consume(upload, decoder, state, peak_writer)
+            feeder.join()
+            if upload.error is not None:
+                raise upload.error
+            if returncode != 0 and state['index'] > 0:
+                raise RuntimeError('Audio stream ended with a decoding error')
+
+            if state['index'] == 0:
+                # Nothing decoded from the pipe; decode the finished file instead
+                self._wait_until_finished(upload)
+                print(f"[Upload] {upload.session_id}: stream not decodable, decoding stored file")
+                self._consume(upload, self._decoder(str(upload.path)), state, peak_writer)
+            if state['index'] == 0:
+                raise RuntimeError('No audio could be decoded from the upload')
+
+            peak_writer.close()
+            total_duration = state['samples'] / SAMPLE_RATE
+            complete_event = self.complete_session(
+                upload.session_id, upload.session_dir, total_duration, state['index'], state['words_pending']
+            )
+            self._emit(upload, complete_event, done=True)
+            print(f"[Upload] {upload.session_id}: {state['index']} segments, {total_duration:.2f}s")
+        except Exception as e:
+            print(f"[Upload] Error processing upload {upload.session_id}: {e}")
+            update_session_status(upload.session_dir, {'status': 'error', 'error': str(e)})
+            self._emit(upload, {'type': 'error', 'message': str(e)}, done=True)
+
+    def _consume(self, upload: Upload, decoder: subprocess.Popen, state: Dict, peak_writer: PeakWriter) -> int:
+        segment_bytes = self.segment_seconds * SAMPLE_RATE * 2
+        try:
+            while True:
+                pcm = decoder.stdout.read(segment_bytes)
+                if not pcm:
+                    break
+                self._process(upload, pcm, state, peak_writer)
+        finally:
+            decoder.stdout.close()
+        return decoder.wait()
+
+    def _process(self, upload: Upload, pcm: bytes, state: Dict, peak_writer: PeakWriter) -> None:
+        idx = state['index']
+        start_time = state['samples'] / SAMPLE_RATE
+        samples = len(pcm) // 2
+        end_time = (state['samples'] + samples) / SAMPLE_RATE
+
+        update_session_status(upload.session_dir, {
+            'status': 'processing',
+            'session_id': upload.session_id,
+            'current_segment': idx,
+            'upload_received': upload.received,
+            'upload_total_bytes': upload.total_bytes,
+            'started_at': upload.created_at
+        })
+        if upload.total_bytes:
+            percent = min(99, int(upload.received / upload.total_bytes * 100))
+            self._emit(upload, {'type': 'progress', 'segment': idx, 'percent': percent,
+                                'received': upload.received, 'total_bytes': upload.total_bytes})
+
+        segment_path = upload.session_dir / f"segment_{idx}.mp3"
+        self._save_segment(segment_path, pcm)
+        # Transcribe what was stored, like the file route, so later re-decodes hit the feature cache
+        audio = decode_audio(str(segment_path))
+        peak_writer.add(np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0)
+
+        segment_info = {'index': idx, 'start_time': start_time, 'end_time': end_time}
+        # Only while transcribing: a slow upload must not hold background work off while it idles
+        with self.foreground():
+            segment_result, state['language'], transcription_time = self.transcribe_segment(
+                upload.session_id, upload.session_dir, segment_info, audio, upload.word_timestamps_mode,
+                state['language'], upload.budget
+            )
+        if segment_result.get('words_pending'):
+            state['words_pending'] += 1
+        print(f"[Performance] Upload segment {idx}: {end_time - start_time:.2f}s audio in {transcription_time:.2f}s")
+
+        state['index'] += 1
+        state['samples'] += samples
+        self._emit(upload, {'type': 'segment_complete', 'segment': idx, 'transcription': segment_result['transcription'],
+                            'start_time': start_time, 'end_time': end_time})
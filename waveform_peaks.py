@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""Multi-resolution waveform peak/RMS data for session audio"""
+
+import json
+import math
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+PEAKS_DIR = 'peaks'
+SAMPLE_RATE = 16000
+
+# Level 0 is 100 buckets per second; each level above is 4x coarser
+BASE_BUCKET_SAMPLES = 160
+LEVEL_FACTOR = 4
+NUM_LEVELS = 6
+
+# Peak and RMS are stored as interleaved uint8 pairs scaled to 0..255
+SCALE = 255
+
+# Most buckets one read_peaks() call returns; a few screens' worth of pixels
+MAX_BUCKETS = 8192
+
+
+def bucket_samples(level: int) -> int:
+    return BASE_BUCKET_SAMPLES * LEVEL_FACTOR ** level
+
+
+class PeakWriter:
+    """
+    Appends peak/RMS buckets for every level as PCM arrives.
+
+    Samples that don't fill a whole bucket are carried over to the next
+    call, so audio can be fed in arbitrary pieces (e.g. one 5-minute
+    transcription segment at a time) and bucket boundaries stay aligned.
+    """
+
+    def __init__(self, session_dir: Path, sample_rate: int = SAMPLE_RATE):
+        self.dir = session_dir / PEAKS_DIR
+        self.dir.mkdir(exist_ok=True)
+        self.sample_rate = sample_rate
+        self.total_samples = 0
+        self._carry = [np.zeros(0, dtype=np.float32) for _ in range(NUM_LEVELS)]
+        self._files = [open(self.dir / f'level_{level}.bin', 'wb') for level in range(NUM_LEVELS)]
+
+    def _write(self, level: int, samples: np.ndarray) -> None:
+        size = bucket_samples(level)
+        count = len(samples) // size
+        if count == 0:
+            return
+
+        buckets = samples[:count * size].reshape(count, size)
+        peaks = np.abs(buckets).max(axis=1)
+        rms = np.sqrt(np.mean(np.square(buckets, dtype=np.float32), axis=1))
+
+        pairs = np.empty((count, 2), dtype=np.uint8)
+        pairs[:, 0] = np.clip(peaks * SCALE, 0, SCALE)
+        pairs[:, 1] = np.clip(rms * SCALE, 0, SCALE)
+        self._files[level].write(pairs.tobytes())
+
+    def add(self, pcm: np.ndarray) -> None:
+        pcm = np.asarray(pcm, dtype=np.float32)
+        self.total_samples += len(pcm)
+
+        for level in range(NUM_LEVELS):
+            samples = np.concatenate([self._carry[level], pcm]) if len(self._carry[level]) else pcm
+            size = bucket_samples(level)
+            used = (len(samples) // size) * size
+            self._write(level, samples[:used])
+            self._carry[level] = samples[used:].copy()
+
+    def close(self) -> None:
+        """Flushes partial trailing buckets and writes the metadata file."""
+        levels = []
+        for level in range(NUM_LEVELS):
+            carry = self._carry[level]
+            if len(carry):
+                size = bucket_samples(level)
+                self._write(level, np.pad(carry, (0, size - len(carry))))
+                self._carry[level] = np.zeros(0, dtype=np.float32)
+            self._files[level].close()
+
+            size = bucket_samples(level)
+            levels.append({
+                'level': level,
+                'samples_per_bucket': size,
+                'buckets_per_second': self.sample_rate / size,
+                'buckets': math.ceil(self.total_samples / size)
+            })
+
+        with open(self.dir / 'meta.json', 'w') as f:
+            json.dump({
+                'sample_rate': self.sample_rate,
+                'duration': self.total_samples / self.sample_rate,
+                'scale': SCALE,
+                'levels': levels
+            }, f, indent=2)
+
+
+def read_peaks(session_dir: Path, start: float = 0.0, end: Optional[float] = None,
+               resolution: float = 100.0) -> Optional[Dict]:
+    """
+    Returns peak/RMS buckets for [start, end) seconds from the coarsest level
+    that still has at least `resolution` buckets per second. Only the
+    requested byte range of that level is read. Resolutions above the finest
+    level are clamped to it. A range that would return more than MAX_BUCKETS
+    buckets at that level is served from the finest coarser level that fits,
+    and past the coarsest level the range is cut short at MAX_BUCKETS; the
+    returned 'resolution' and 'to' say what was served. A resolution that
+    isn't positive raises ValueError.
+    """
+    if not math.isfinite(resolution) or resolution <= 0:
+        raise ValueError('resolution must be a positive number')
+    if not math.isfinite(start) or (end is not None and not math.isfinite(end)):
+        raise ValueError('from and to must be finite')
+
+    meta_file = session_dir / PEAKS_DIR / 'meta.json'
+    if not meta_file.exists():
+        return None
+
+    with open(meta_file, 'r') as f:
+        meta = json.load(f)
+
+    duration = meta['duration']
+    end = duration if end is None else min(end, duration)
+    start = max(0.0, min(start, end))
+
+    # Finest first; start from the coarsest level that meets the resolution
+    levels = meta['levels']
+    position = 0
+    for i, level in enumerate(levels):
+        if level['buckets_per_second'] >= resolution:
+            position = i
+
+    for chosen in levels[position:]:
+        bps = chosen['buckets_per_second']
+        first = int(math.floor(start * bps))
+        last = min(chosen['buckets'], int(math.ceil(end * bps)))
+        count = max(0, last - first)
+        if count <= MAX_BUCKETS:
+            break
+    count = min(count, MAX_BUCKETS)
+
+    with open(session_dir / PEAKS_DIR / f"level_{chosen['level']}.bin", 'rb') as f:
+        f.seek(first * 2)
+        data = np.frombuffer(f.read(count * 2), dtype=np.uint8).reshape(-1, 2)
+
+    return {
+        'from': first / bps,
+        'to': (first + len(data)) / bps,
+        'duration': duration,
+        'level': chosen['level'],
+        'resolution': bps,
+        'scale': meta['scale'],
+        'peaks': data[:, 0].tolist(),
+        'rms': data[:, 1].tolist()
+    }
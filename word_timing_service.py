@@ -0,0 +1,486 @@
+#!/usr/bin/env python3
+import os
+import math
+import time
+import queue
+import threading
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+from session_store import (
+    get_session_status, iter_segments, rewrite_segments, session_lock,
+    update_session_status, write_transcription_files
+)
+from transcription_engine import SAMPLE_RATE, decode_audio
+
+
+def extract_words(segments) -> List[Dict]:
+    """Flatten faster-whisper segment words into plain dicts."""
+    words = []
+    for seg in segments:
+        if getattr(seg, 'words', None):
+            for word in seg.words:
+                words.append({
+                    'word': word.word,
+                    'start': word.start,
+                    'end': word.end,
+                    'probability': word.probability
+                })
+    return words
+
+
+class WordTimingService:
+    """
+    Computes word timestamps for segments transcribed in lazy mode.
+
+    Segments stored with 'words_pending' get their word timings (and the LLM
+    correction that depends on them) the first time they are requested, or
+    from a background job when the host is idle. It also re-decodes time
+    ranges of finished sessions, splicing the new words into the stored ones.
+    """
+
+    IDLE_POLL_SECONDS = 5.0
+    # Background fill-in persists this many segments per rewrite of the session files
+    PERSIST_BATCH = 8
+    # Audio decoded either side of a range cut at phrase boundaries
+    PHRASE_PAD_SECONDS = 0.3
+
+    def __init__(self, engine, sessions_dir: Path, llm_service, search_index=None, idle_load_ratio: float = 0.5):
+        self.engine = engine
+        self.sessions_dir = sessions_dir
+        self.llm_service = llm_service
+        self.search_index = search_index
+        self.idle_load_ratio = idle_load_ratio
+        self.cpu_count = os.cpu_count() or 1
+
+        self._lock = threading.Lock()
+        self._named_locks: Dict[tuple, list] = {}
+        # Segments filled in the background but not yet written back, by session
+        self._unpersisted: Dict[str, Dict[int, Dict]] = {}
+        self._foreground = 0
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+
+    @contextmanager
+    def foreground(self):
+        """Marks a user-facing transcription as running so background work waits."""
+        with self._lock:
+            self._foreground += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._foreground -= 1
+
+    def is_idle(self) -> bool:
+        with self._lock:
+            if self._foreground > 0:
+                return False
+        try:
+            load = os.getloadavg()[0]
+        except OSError:
+            return True
+        return load < self.cpu_count * self.idle_load_ratio
+
+    @contextmanager
+    def _named_lock(self, *key):
+        """Holds the lock for `key`; locks nobody holds or waits for are dropped."""
+        with self._lock:
+            entry = self._named_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._named_locks[key]
+
+    def _find_segment(self, session_dir: Path, segment_index: int) -> Optional[Dict]:
+        for segment in iter_segments(session_dir):
+            if segment['index'] == segment_index:
+                return segment
+        return None
+
+    def _segment_words(self, session_dir: Path, segment: Dict) -> List[Dict]:
+        segment_path = session_dir / f"segment_{segment['index']}.mp3"
+        start_time = time.time()
+        segments, _ = self.engine.transcribe(
+            str(segment_path),
+            cache_dir=session_dir,
+            beam_size=1,
+            vad_filter=True,
+            word_timestamps=True,
+            language=segment.get('language')
+        )
+        words = extract_words(segments)
+        print(f"[Performance] Word timings for segment {segment['index']}: {time.time() - start_time:.2f}s")
+        return words
+
+    def _compute(self, session_dir: Path, segment: Dict) -> Dict:
+        words = self._segment_words(session_dir, segment)
+        fields = {'words': words}
+        if words:
+            corrected_text, aligned_words = self.llm_service.correct_and_align(
+                segment['transcription'],
+                words
+            )
+            fields['transcription_corrected'] = corrected_text
+            fields['words_corrected'] = aligned_words
+        return fields
+
+    def _persist(self, session_dir: Path, updates: Dict[int, Dict]) -> int:
+        remaining = 0
+
+        def transform(segment):
+            nonlocal remaining
+            if segment['index'] in updates:
+                segment = {k: v for k, v in segment.items() if k != 'words_pending'}
+                segment.update(updates[segment['index']])
+            if segment.get('words_pending'):
+                remaining += 1
+            return segment
+
+        # The storage compactor may be gzipping these files from another process
+        with session_lock(session_dir):
+            rewrite_segments(session_dir, transform)
+
+            status = get_session_status(session_dir) or {}
+            status['words_pending'] = remaining
+            update_session_status(session_dir, status)
+            write_transcription_files(session_dir, status.get('total_duration', 0))
+        return remaining
+
+    def ensure_words(self, session_id: str, segment_index: int) -> Optional[Dict]:
+        """
+        Returns the segment with word timings, computing and persisting them
+        first if they are still pending. Returns None if the segment is unknown.
+        """
+        with self._named_lock(session_id, segment_index):
+            segment = self._fill(session_id, segment_index)
+        # Write back together with anything the background fill-in is holding
+        self._flush(session_id)
+        return segment
+
+    def _filled(self, session_id: str, segment_index: int) -> Optional[Dict]:
+        with self._lock:
+            return self._unpersisted.get(session_id, {}).get(segment_index)
+
+    def _fill(self, session_id: str, segment_index: int) -> Optional[Dict]:
+        """
+        Computes the word timings of a pending segment and holds the result
+        for the next _flush(). Call with the segment's lock held.
+        """
+        session_dir = self.sessions_dir / session_id
+        segment = self._find_segment(session_dir, segment_index)
+        if segment is None or not segment.get('words_pending'):
+            return segment
+        filled = self._filled(session_id, segment_index)
+        if filled is not None:
+            return filled
+
+        # The segment log is still being appended to until the session completes
+        status = get_session_status(session_dir) or {}
+        if status.get('status') != 'complete':
+            return segment
+
+        segment = {k: v for k, v in segment.items() if k != 'words_pending'}
+        segment.update(self._compute(session_dir, segment))
+        with self._lock:
+            self._unpersisted.setdefault(session_id, {})[segment_index] = segment
+        return segment
+
+    def _flush(self, session_id: str) -> None:
+        """Writes the held segments of a session back in one rewrite and indexes them."""
+        with self._named_lock(session_id):
+            with self._lock:
+                updates = dict(self._unpersisted.get(session_id, {}))
+            if not updates:
+                return
+            session_dir = self.sessions_dir / session_id
+            try:
+                if session_dir.exists():
+                    self._persist(session_dir, updates)
+            finally:
+                # Held until written, so a reader always finds one of the two copies
+                with self._lock:
+                    held = self._unpersisted.get(session_id, {})
+                    for segment_index in updates:
+                        held.pop(segment_index, None)
+                    if not held:
+                        self._unpersisted.pop(session_id, None)
+
+        if self.search_index is not None:
+            for segment in updates.values():
+                self.search_index.index_segment(session_id, segment)
+
+    def stream_words(self, session_id: str, segment_index: int) -> Iterator[Dict]:
+        """
+        Like ensure_words(), but yields progress events while the timings
+        are computed: 'words_raw' with the decoded words, 'words' batches of
+        corrected words as the LLM correction streams in, and finally
+        'complete' with the persisted segment ('error' if it is unknown).
+
+        The work runs on a thread of its own that this generator only
+        observes, so a client that disconnects midway doesn't throw away the
+        decode or the correction already paid for: they are still persisted.
+        """
+        events: "queue.Queue[Dict]" = queue.Queue()
+        threading.Thread(target=self._stream_fill, args=(session_id, segment_index, events), daemon=True).start()
+        while True:
+            event = events.get()
+            yield event
+            if event['type'] in ('complete', 'error'):
+                return
+
+    def _stream_fill(self, session_id: str, segment_index: int, events: "queue.Queue[Dict]") -> None:
+        session_dir = self.sessions_dir / session_id
+        try:
+            with self._named_lock(session_id, segment_index):
+                segment = self._find_segment(session_dir, segment_index)
+                if segment is None:
+                    events.put({'type': 'error', 'message': 'Segment not found'})
+                    return
+
+                status = get_session_status(session_dir) or {}
+                if not segment.get('words_pending') or status.get('status') != 'complete':
+                    events.put({'type': 'complete', 'segment': segment})
+                    return
+                filled = self._filled(session_id, segment_index)
+                if filled is not None:
+                    events.put({'type': 'complete', 'segment': filled})
+                    return
+
+                words = self._segment_words(session_dir, segment)
+                events.put({'type': 'words_raw', 'words': words})
+
+                fields = {'words': words}
+                if words:
+                    for event in self.llm_service.stream_correct_and_align(segment['transcription'], words):
+                        if event['type'] == 'words':
+                            events.put(event)
+                        else:
+                            fields['transcription_corrected'] = event['corrected_text']
+                            fields['words_corrected'] = event['words']
+
+                segment = {k: v for k, v in segment.items() if k != 'words_pending'}
+                segment.update(fields)
+                with self._lock:
+                    self._unpersisted.setdefault(session_id, {})[segment_index] = segment
+            self._flush(session_id)
+            events.put({'type': 'complete', 'segment': segment})
+        except Exception as e:
+            print(f"[WordTiming] Error streaming words for segment {segment_index} of session {session_id}: {e}")
+            events.put({'type': 'error', 'message': str(e)})
+
+    def _splice(self, session_dir: Path, segment: Dict, start: float, end: float, options: Dict) -> Dict:
+        """
+        Re-decodes [start, end) seconds (relative to the segment) and splices
+        the new words over the old ones in that range. Range edges that fall
+        inside an old word are widened to the word boundary so no word is cut.
+        The decoded clip may extend past the range (see _clip); only new words
+        inside it are kept. Segments without word timings are spliced by
+        phrase (see _splice_phrases).
+        """
+        old_words = segment.get('words') or []
+        if not old_words:
+            return self._splice_phrases(session_dir, segment, start, end, options)
+
+        for word in old_words:
+            if word['start'] < start < word['end']:
+                start = word['start']
+            if word['start'] < end < word['end']:
+                end = word['end']
+
+        audio = decode_audio(str(session_dir / f"segment_{segment['index']}.mp3"))
+        clip_start, clip_end = self._clip(start, end, len(audio) / SAMPLE_RATE)
+        clip = audio[int(clip_start * SAMPLE_RATE):int(clip_end * SAMPLE_RATE)]
+        segments, info = self.engine.transcribe(clip, cache_dir=session_dir, word_timestamps=True, **options)
+
+        inside = lambda word: start <= (word['start'] + word['end']) / 2 < end
+        new_words = [
+            {**word, 'start': round(word['start'] + clip_start, 3), 'end': round(word['end'] + clip_start, 3)}
+            for word in extract_words(segments)
+        ]
+        new_words = [word for word in new_words if inside(word)]
+        before = [word for word in old_words if not inside(word) and word['start'] < start]
+        after = [word for word in old_words if not inside(word) and word['start'] >= start]
+        words = before + new_words + after
+
+        fields = {'transcription': ''.join(word['word'] for word in words).strip(), 'words': words}
+        self._note_decode(fields, info, options)
+        if words:
+            corrected_text, aligned_words = self.llm_service.correct_and_align(fields['transcription'], words)
+            fields['transcription_corrected'] = corrected_text
+            fields['words_corrected'] = aligned_words
+        return fields
+
+    def _splice_phrases(self, session_dir: Path, segment: Dict, start: float, end: float, options: Dict) -> Dict:
+        """
+        Splices a re-decode into a segment stored without word timings, using
+        the decoder phrase times stored with it: the range widens to whole
+        phrases, a little more audio is decoded for context (see _clip), and
+        the new words inside the range replace the phrases there. Segments
+        stored before phrase times were kept are one phrase, re-decoded in
+        full. The segment stays without words (and keeps a pending word pass).
+        """
+        audio = decode_audio(str(session_dir / f"segment_{segment['index']}.mp3"))
+        duration = len(audio) / SAMPLE_RATE
+        phrases = segment.get('phrases')
+        if phrases is None:
+            phrases = [{'start': 0.0, 'end': duration, 'text': segment.get('transcription', '')}]
+
+        for phrase in phrases:
+            if phrase['start'] < start < phrase['end']:
+                start = phrase['start']
+            if phrase['start'] < end < phrase['end']:
+                end = phrase['end']
+
+        clip_start, clip_end = self._clip(start, end, duration, self.PHRASE_PAD_SECONDS)
+        clip = audio[int(clip_start * SAMPLE_RATE):int(clip_end * SAMPLE_RATE)]
+        segments, info = self.engine.transcribe(clip, cache_dir=session_dir, word_timestamps=True, **options)
+
+        inside = lambda item: start <= (item['start'] + item['end']) / 2 < end
+        new_phrases = []
+        for seg in segments:
+            words = [
+                {**word, 'start': round(word['start'] + clip_start, 3), 'end': round(word['end'] + clip_start, 3)}
+                for word in extract_words([seg])
+            ]
+            words = [word for word in words if inside(word)]
+            if words:
+                new_phrases.append({'start': words[0]['start'], 'end': words[-1]['end'],
+                                    'text': ''.join(word['word'] for word in words)})
+
+        before = [phrase for phrase in phrases if not inside(phrase) and phrase['start'] < start]
+        after = [phrase for phrase in phrases if not inside(phrase) and phrase['start'] >= start]
+        phrases = before + new_phrases + after
+
+        text = ' '.join(phrase['text'].strip() for phrase in phrases if phrase['text'].strip())
+        fields = {'transcription': text, 'phrases': phrases}
+        self._note_decode(fields, info, options)
+        if segment.get('words_pending'):
+            fields['words_pending'] = True
+        if 'transcription_corrected' in segment:
+            fields['transcription_corrected'] = self.llm_service.correct_transcript(text)
+        return fields
+
+    def _clip(self, start: float, end: float, duration: float, pad: float = 0.0):
+        """
+        The part of a segment to decode for [start, end): whole cache windows
+        of the segment when the engine caches them (so the re-decode reuses
+        their encoder outputs), otherwise the range plus `pad` either side.
+        """
+        window = self.engine.cache_window_seconds
+        if window:
+            return math.floor(start / window) * window, min(duration, math.ceil(end / window) * window)
+        return max(0.0, start - pad), min(duration, end + pad)
+
+    @staticmethod
+    def _note_decode(fields: Dict, info, options: Dict) -> None:
+        if info.budget and info.budget['hits']:
+            fields['decode_budget'] = info.budget
+        if options.get('language'):
+            fields['language'] = options['language']
+
+    def retranscribe_range(self, session_id: str, start: float, end: float, options: Dict) -> List[Dict]:
+        """
+        Re-decodes [start, end) seconds of a complete session with the given
+        decode options and splices the result into the stored segments, the
+        transcription files and the search index. Only the stored segments
+        overlapping the range are decoded and re-corrected. Returns the
+        updated segments.
+        """
+        session_dir = self.sessions_dir / session_id
+        touched = [
+            seg for seg in iter_segments(session_dir)
+            if seg['start_time'] < end and seg['end_time'] > start
+        ]
+
+        with ExitStack() as stack:
+            for seg in touched:
+                stack.enter_context(self._named_lock(session_id, seg['index']))
+            # Background results for these segments would overwrite the splice
+            self._flush(session_id)
+
+            updates = {}
+            for seg in touched:
+                seg_start = max(start, seg['start_time']) - seg['start_time']
+                seg_end = min(end, seg['end_time']) - seg['start_time']
+                updates[seg['index']] = self._splice(session_dir, seg, seg_start, seg_end, options)
+
+            with self._named_lock(session_id):
+                self._persist(session_dir, updates)
+
+        updated = []
+        for seg in touched:
+            seg = {k: v for k, v in seg.items() if k != 'words_pending'}
+            seg.update(updates[seg['index']])
+            if self.search_index is not None:
+                self.search_index.index_segment(session_id, seg)
+            updated.append(seg)
+        return updated
+
+    def enqueue(self, session_id: str) -> None:
+        """Schedule a session for background fill-in."""
+        self._queue.put(session_id)
+
+    def start_background_fill(self, owns: Optional[Callable[[str], bool]] = None) -> None:
+        """
+        Queue sessions with pending word timings and start the idle-time worker.
+        `owns`, if given, limits the startup scan to the sessions it accepts.
+        """
+        if self._worker is not None:
+            return
+
+        for session_dir in self.sessions_dir.iterdir():
+            if not session_dir.is_dir() or (owns is not None and not owns(session_dir.name)):
+                continue
+            try:
+                status = get_session_status(session_dir)
+            except Exception:
+                continue
+            if status and status.get('words_pending'):
+                self._queue.put(session_dir.name)
+
+        self._worker = threading.Thread(target=self._fill_loop, daemon=True)
+        self._worker.start()
+
+    def _wait_for_idle(self) -> None:
+        while not self.is_idle():
+            time.sleep(self.IDLE_POLL_SECONDS)
+
+    def _fill_loop(self) -> None:
+        while True:
+            session_id = self._queue.get()
+            session_dir = self.sessions_dir / session_id
+            if not session_dir.exists():
+                continue
+
+            pending = [seg['index'] for seg in iter_segments(session_dir) if seg.get('words_pending')]
+            for segment_index in pending:
+                if not self.is_idle():
+                    # Don't sit on finished segments while waiting
+                    self._flush_quietly(session_id)
+                    self._wait_for_idle()
+                if not session_dir.exists():
+                    break
+                try:
+                    with self._named_lock(session_id, segment_index):
+                        self._fill(session_id, segment_index)
+                    print(f"[WordTiming] Filled in segment {segment_index} of session {session_id}")
+                except Exception as e:
+                    print(f"[WordTiming] Error filling segment {segment_index} of session {session_id}: {e}")
+                with self._lock:
+                    held = len(self._unpersisted.get(session_id, {}))
+                if held >= self.PERSIST_BATCH:
+                    self._flush_quietly(session_id)
+            self._flush_quietly(session_id)
+
+    def _flush_quietly(self, session_id: str) -> None:
+        try:
+            self._flush(session_id)
+        except Exception as e:
+            print(f"[WordTiming] Error saving word timings of session {session_id}: {e}")